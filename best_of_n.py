@@ -0,0 +1,213 @@
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+# 项目根目录，generate/ 和 driver/ 以模块方式导入
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+GENERATE_DIR = os.path.join(ROOT_DIR, "generate")
+DRIVER_DIR = os.path.join(ROOT_DIR, "driver")
+sys.path.insert(0, GENERATE_DIR)
+sys.path.insert(0, DRIVER_DIR)
+
+from config import CONFIG
+from generate import describe_devices, build_messages, create_client, request_completion, parse_response, load_config
+from driver import compile_candidate, run_candidate, run_smoke_stages
+from process_runner import load_memory_limit
+from smoke_inputs import SMOKE_STAGES
+from timeouts import compute_timeout
+from prescreen import prescreen
+from hardware_monitor import HardwareMonitor
+from llm_metrics import summarize_calls
+
+def sample_temperatures(n, low=0.2, high=1.0):
+    """在 [low, high] 上均匀取 n 个温度，n=1 时与 generate.py 一致取 low"""
+    if n == 1:
+        return [low]
+    return [round(low + (high - low) * i / (n - 1), 2) for i in range(n)]
+
+def sample_candidates(client, model, task, devices_info, n, max_workers=8):
+    """并发采样 n 个候选实现，返回 [{index, temperature, framework, code, llm_call}]"""
+    messages = build_messages(task, devices_info)
+
+    def sample(index, temperature):
+        try:
+            response, llm_call = request_completion(client, model, messages, temperature)
+            framework, code = parse_response(response)
+        except Exception as e:
+            print(f"候选 {index} 请求失败: {e}")
+            framework, code, llm_call = None, None, getattr(e, "llm_call", None)
+        return {"index": index, "temperature": temperature, "framework": framework, "code": code,
+                "llm_call": llm_call}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(sample, i, t) for i, t in enumerate(sample_temperatures(n))]
+        return [f.result() for f in futures]
+
+def screen_all(candidates, task_type):
+    """完整编译前去重并做语法检查：重复的候选记录 duplicate_of，语法错误的候选不再编译"""
+    metadata = [{"task_type": task_type, "framework": c["framework"], "code": c["code"]} for c in candidates]
+    for candidate, result in zip(candidates, prescreen(metadata)):
+        if candidate["code"] is None:
+            continue
+        if result["duplicate_of"] is not None:
+            candidate["stage"] = "duplicate"
+            candidate["duplicate_of"] = result["duplicate_of"]
+        elif result["syntax_ok"] is False:
+            candidate["stage"] = "syntax_error"
+            candidate["compile_error"] = result["error"]
+
+def resolve_duplicates(candidates):
+    """重复的候选沿用第一次出现的候选的阶段和时间，通过率仍按全部候选计算"""
+    for candidate in candidates:
+        if candidate.get("duplicate_of") is not None:
+            original = candidates[candidate["duplicate_of"]]
+            for field in ("stage", "binary", "time_ms", "times_ms"):
+                if field in original:
+                    candidate[field] = original[field]
+
+def compile_all(candidates, task_type, hardware, max_workers=4):
+    """并行编译所有候选，编译成功的候选记录可执行文件所在目录；已被筛掉的候选跳过"""
+    def build(candidate):
+        if candidate["code"] is None:
+            candidate["stage"] = "no_code"
+            return candidate
+        if candidate.get("stage") in ("duplicate", "syntax_error"):
+            return candidate
+        metadata = {"task_type": task_type, "framework": candidate["framework"],
+                    "code": candidate["code"], "hardware": hardware}
+        temp_dir = tempfile.mkdtemp()
+        binary_path, compile_error = compile_candidate(metadata, DRIVER_DIR, temp_dir)
+        candidate["temp_dir"] = temp_dir
+        candidate["binary"] = binary_path
+        candidate["stage"] = "compiled" if binary_path else "compile_error"
+        return candidate
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(build, candidates))
+
+def candidate_memory_limit(framework, config_path, limit_mode="rlimit"):
+    """与 driver.py 一致：读取 input.json 中的内存上限，CUDA 和 MPI 在 rlimit 方式下不限制"""
+    memory_limit = load_memory_limit({}, config_path)
+    if limit_mode == "rlimit" and framework in ("CUDA", "MPI"):
+        return None
+    return memory_limit
+
+def verify_stage(candidates, task_type, config_path, stages=SMOKE_STAGES):
+    """在各级生成的小输入上依次验证已编译的候选，全部通过的进入 verified
+
+    任务没有生成器、一级小输入都无法生成时标记为 smoke_skipped（仍进入基准测试，但不算验证通过）。
+    """
+    for candidate in candidates:
+        if candidate["stage"] != "compiled":
+            continue
+        memory_limit = candidate_memory_limit(candidate["framework"], config_path)
+        outcomes, failed = run_smoke_stages(candidate["binary"], task_type, DRIVER_DIR, candidate["temp_dir"],
+                                            stages, memory_limit, framework=candidate["framework"])
+        candidate["smoke"] = outcomes
+        if failed is not None:
+            candidate["stage"] = f"smoke_{failed['failed_stage']}:{outcomes[failed['failed_stage']]}"
+        elif not outcomes:
+            print(f"任务 {task_type} 没有可生成的小输入，候选 {candidate['index']} 未经小输入验证")
+            candidate["stage"] = "smoke_skipped"
+        else:
+            candidate["stage"] = "verified"
+
+def run_stage(candidates, task_type, dataset, from_stages, to_stage, config_path, repeat=1):
+    """串行运行处于 from_stages 的候选，验证通过的进入 to_stage；超时和内存上限与 driver.py 一致"""
+    for candidate in candidates:
+        if candidate["stage"] not in from_stages:
+            continue
+        timeout, _ = compute_timeout(task_type, dataset, candidate["framework"])
+        memory_limit = candidate_memory_limit(candidate["framework"], config_path)
+        times = []
+        for _ in range(repeat):
+            result = run_candidate(candidate["binary"], task_type, DRIVER_DIR, candidate["temp_dir"],
+                                   HardwareMonitor(), dataset, timeout, memory_limit=memory_limit)
+            if result["status"] != "success" or not result["verified"]:
+                candidate["stage"] = f"{candidate['stage']}:{result['status']}" if result["status"] != "success" \
+                    else f"{candidate['stage']}:verify_failed"
+                break
+            times.append(result["time_ms"])
+        else:
+            candidate["stage"] = to_stage
+            candidate["times_ms"] = times
+            candidate["time_ms"] = statistics.median(times)
+
+def summarize(candidates):
+    """汇总一组候选：最佳结果、中位数和通过率"""
+    passed = [c for c in candidates if c["stage"] == "benchmarked"]
+    times = [c["time_ms"] for c in passed]
+    best = min(passed, key=lambda c: c["time_ms"]) if passed else None
+    return {
+        "n": len(candidates),
+        "unique": sum(1 for c in candidates if c["code"] is not None and c.get("duplicate_of") is None),
+        "syntax_errors": sum(1 for c in candidates if c["stage"] == "syntax_error"),
+        "compiled": sum(1 for c in candidates if c.get("binary")),
+        "smoke_skipped": sum(1 for c in candidates if c.get("smoke") == {}),
+        "passed": len(passed),
+        "pass_rate": len(passed) / len(candidates) if candidates else 0.0,
+        "best_ms": best["time_ms"] if best else None,
+        "median_ms": statistics.median(times) if times else None,
+        "best_index": best["index"] if best else None,
+        "best_framework": best["framework"] if best else None,
+        "best_code": best["code"] if best else None,
+        "stages": {c["index"]: c["stage"] for c in candidates},
+        "duplicates": {c["index"]: c["duplicate_of"] for c in candidates if c.get("duplicate_of") is not None},
+        "llm_calls": {c["index"]: c["llm_call"] for c in candidates},
+    }
+
+def best_of_n(config_path, model, n=8, smoke_stages=SMOKE_STAGES, dataset="data.txt", repeat=1):
+    """对每个任务采样 n 个候选：编译 -> 小输入验证 -> 基准测试，返回 (每个任务的汇总, 模型调用汇总)"""
+    config = load_config(config_path)
+    devices_info = describe_devices(config["hardware"])
+    client = create_client()
+
+    summaries = []
+    calls = []
+    for task in config["tasks"]:
+        task_type = task["type"]
+        print(f"任务 {task_type}: 采样 {n} 个候选")
+        candidates = sample_candidates(client, model, task, devices_info, n)
+        calls.extend(c["llm_call"] for c in candidates)
+        screen_all(candidates, task_type)
+        compile_all(candidates, task_type, config["hardware"])
+
+        verify_stage(candidates, task_type, config_path, smoke_stages)
+        run_stage(candidates, task_type, dataset, ("verified", "smoke_skipped"), "benchmarked", config_path, repeat)
+        resolve_duplicates(candidates)
+
+        summary = dict(summarize(candidates), task_type=task_type, model=model)
+        for c in candidates:
+            if c.get("temp_dir"):
+                shutil.rmtree(c["temp_dir"], ignore_errors=True)
+        summaries.append(summary)
+        print(f"任务 {task_type}: 通过率 {summary['pass_rate']:.0%}，"
+              f"最佳 {summary['best_ms']}ms，中位数 {summary['median_ms']}ms")
+    return summaries, summarize_calls(calls)
+
+def main():
+    parser = argparse.ArgumentParser(description="Best-of-N 候选生成与基准测试选择")
+    parser.add_argument("--input", default=os.path.join(GENERATE_DIR, "input.json"))
+    parser.add_argument("--model", default=CONFIG["model"])
+    parser.add_argument("-n", type=int, default=8, help="每个任务的候选数量")
+    parser.add_argument("--smoke-stages", default=",".join(SMOKE_STAGES),
+                        help="逗号分隔的小输入验证级别（task.json sizes 中的规模，默认 tiny,medium）")
+    parser.add_argument("--dataset", default="data.txt")
+    parser.add_argument("--repeat", type=int, default=1, help="每个候选的基准测试次数")
+    parser.add_argument("--output", default="best_of_n.json")
+    args = parser.parse_args()
+
+    smoke_stages = tuple(s for s in args.smoke_stages.split(",") if s)
+    summaries, llm_summary = best_of_n(args.input, args.model, args.n, smoke_stages, args.dataset, args.repeat)
+    with open(args.output, "w") as f:
+        json.dump({"model": args.model, "n": args.n, "tasks": summaries, "llm_summary": llm_summary},
+                  f, indent=2, ensure_ascii=False)
+    print(f"结果已保存到 {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,12 @@ import psutil
 import torch
 import json
 import os
-from openai import OpenAI  # 引入 OpenAI 类
+import sys
+from cost_model import FrameworkCostModel
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "generate"))
+from llm_metrics import timed_completion
+from llm_client import create_client
 
 # OpenAI API 配置
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')  # 替换为实际的 OpenAI API 密钥
@@ -28,8 +33,8 @@ def get_hardware_profile():
             
     return info
 
-def query_llm_framework(hardware, task_desc):
-    """调用 OpenAI 的大模型决策"""
+def query_llm_framework(hardware, task_desc, base_url=None):
+    """调用 OpenAI 的大模型决策，base_url 为空时依次使用 LLM_BASE_URL 和 DashScope 地址"""
     system_prompt = """
 你是一个硬件感知的并行计算框架决策系统。
 当前分析目标：为计算任务选择最佳计算框架，从这些框架中选择："Serial","OpenMP","CUDA",
@@ -54,10 +59,7 @@ def query_llm_framework(hardware, task_desc):
         "content": user_prompt_content
     }
 
-    client = OpenAI(
-        api_key=os.getenv('DASHSCOPE_API_KEY'),
-        base_url="https://dashscope.aliyuncs.com/compatible-mode/v1"
-    )
+    client = create_client("dashscope", base_url)
 
 
     messages = [
@@ -65,20 +67,38 @@ def query_llm_framework(hardware, task_desc):
         user_prompt
     ]
 
-    completion = client.chat.completions.create(
-        model="llama-4-scout-17b-16e-instruct",  
-        messages=messages,
+    output_text, llm_call = timed_completion(
+        client, "llama-4-scout-17b-16e-instruct",
+        messages,
         temperature=0.2,
         max_tokens=2500,
         stop=["\n```\n"]
     )
 
     # 提取返回的 JSON 格式字符串
-    output_text = completion.choices[0].message.content.strip()
     try:
-        return json.loads(output_text)
+        result = json.loads(output_text.strip())
     except json.JSONDecodeError:
-        return {"framework": "Fallback", "reason": "返回内容不符合 JSON 格式"}
+        result = {"framework": "Fallback", "reason": "返回内容不符合 JSON 格式"}
+    result["llm_call"] = llm_call
+    return result
+
+def select_framework(hardware, task_desc, task_type, input_bytes, min_confidence=0.6, model=None, base_url=None):
+    """优先使用本地代价模型选择框架，置信度不足时才调用大模型"""
+    model = model or FrameworkCostModel.from_history()
+    prediction = model.predict(hardware, task_type, input_bytes)
+    if prediction["framework"] is not None and prediction["confidence"] >= min_confidence:
+        return dict(prediction, source="cost_model")
+
+    result = query_llm_framework(hardware, task_desc, base_url)
+    if result.get("framework") == "Fallback" and prediction["framework"] is not None:
+        # LLM 返回格式错误时退回代价模型的低置信度结果
+        return dict(prediction, source="cost_model")
+    result["source"] = "llm"
+    # 保留代价模型对 LLM 所选框架的运行时间估计（如果有）
+    result["expected_runtime_us"] = prediction["candidates"].get(result.get("framework"))
+    result["confidence"] = prediction["confidence"]
+    return result
 
 if __name__ == "__main__":
     # 示例用法
@@ -86,6 +106,7 @@ if __name__ == "__main__":
     task_desc = "一个大小为1GB的图进行BFS"
     print("硬件指纹：", json.dumps(hardware, indent=2))
     
-    result = query_llm_framework(hardware, task_desc)
+    result = select_framework(hardware, task_desc, "graph_bfs", 1024**3)
     print("推荐框架：", result['framework'])
-    print("推荐依据：", result['reason'])
\ No newline at end of file
+    print("推荐依据：", result['reason'])
+    print("决策来源：", result['source'])
\ No newline at end of file
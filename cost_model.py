@@ -0,0 +1,118 @@
+import os
+import json
+import math
+
+from regression import run_condition
+
+# 历史记录默认位置（由 driver.py 在每次运行后追加）
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+HISTORY_FILE = os.path.join(ROOT_DIR, "driver", "history.jsonl")
+
+FRAMEWORKS = ["Serial", "OpenMP", "CUDA"]
+# 默认只用默认编译配置、不做 NUMA 放置的单进程运行训练，见 regression.run_condition
+DEFAULT_CONDITION = ("default", "none", None)
+
+def load_history(history_file=HISTORY_FILE, condition=DEFAULT_CONDITION):
+    """读取已验证通过、运行条件为 condition 的历史运行记录（condition 为 None 时不筛选）
+
+    O3、NUMA 绑定或多进程的运行时间与默认条件不可比，混在一起会影响框架的排名。
+    """
+    records = []
+    if not os.path.exists(history_file):
+        return records
+    with open(history_file, "r") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if condition is not None and run_condition(record) != condition:
+                continue
+            if record["status"] == "success" and record["verified"] and record["time_ms"] is not None \
+                    and record.get("input_bytes"):
+                records.append(record)
+    return records
+
+def features(input_bytes, cpu_cores, total_memory, gpu_count):
+    """特征向量：输入规模、核心数、内存取对数，GPU 只看有无"""
+    return (
+        math.log2(max(input_bytes, 1)),
+        math.log2(max(cpu_cores, 1)),
+        math.log2(max(total_memory, 1)),
+        4.0 if gpu_count > 0 else 0.0,
+    )
+
+def distance(a, b):
+    return math.sqrt(sum((x - y) ** 2 for x, y in zip(a, b)))
+
+class FrameworkCostModel:
+    """基于历史记录的 k 近邻代价模型：对每个框架预测运行时间，选择最快的框架
+
+    同一任务类型内按特征距离加权平均 log(运行时间)；近邻太少或预测差距小于离散程度时置信度低。
+    """
+
+    def __init__(self, records, k=5, min_samples=3):
+        self.k = k
+        self.min_samples = min_samples
+        self.samples = {}
+        for r in records:
+            host = r["host"]
+            x = features(r["input_bytes"], host["cpu_cores"], host["total_memory"], host["gpu_count"])
+            # time_ms 精度为毫秒，0ms 的记录按 0.5ms 处理
+            y = math.log(max(r["time_ms"], 0.5) * 1000)
+            self.samples.setdefault((r["task_type"], r["framework"]), []).append((x, y))
+
+    @classmethod
+    def from_history(cls, history_file=HISTORY_FILE, condition=DEFAULT_CONDITION, **kwargs):
+        return cls(load_history(history_file, condition), **kwargs)
+
+    def predict_framework(self, task_type, framework, x):
+        """返回 (预测运行时间 µs, 对数标准差, 样本数)，没有样本时返回 None"""
+        samples = self.samples.get((task_type, framework))
+        if not samples:
+            return None
+        neighbors = sorted(samples, key=lambda s: distance(s[0], x))[:self.k]
+        weights = [1.0 / (1.0 + distance(s[0], x)) for s in neighbors]
+        total = sum(weights)
+        mean = sum(w * s[1] for w, s in zip(weights, neighbors)) / total
+        var = sum(w * (s[1] - mean) ** 2 for w, s in zip(weights, neighbors)) / total
+        return math.exp(mean), math.sqrt(var), len(neighbors)
+
+    def predict(self, hardware, task_type, input_bytes):
+        """为任务推荐框架
+
+        hardware 与 core.get_hardware_profile() 的格式一致。返回
+        {"framework", "expected_runtime_us", "confidence", "reason", "candidates"}。
+        """
+        x = features(input_bytes, hardware["cpu_cores"], hardware["total_memory"], hardware["gpu_count"])
+        candidates = {}
+        for framework in FRAMEWORKS:
+            if framework == "CUDA" and not hardware.get("cuda_available"):
+                continue
+            prediction = self.predict_framework(task_type, framework, x)
+            if prediction is not None:
+                candidates[framework] = prediction
+
+        if not candidates:
+            return {"framework": None, "expected_runtime_us": None, "confidence": 0.0,
+                    "reason": f"没有 {task_type} 的历史记录", "candidates": {}}
+
+        ranked = sorted(candidates.items(), key=lambda item: item[1][0])
+        best, (runtime_us, spread, count) = ranked[0]
+        # 样本数不足时置信度按比例下降
+        confidence = min(1.0, count / self.min_samples)
+        if len(ranked) > 1:
+            # 与第二名的对数差距相对离散程度越小，置信度越低
+            gap = math.log(ranked[1][1][0]) - math.log(runtime_us)
+            noise = max(spread, ranked[1][1][1], 1e-6)
+            confidence *= min(1.0, gap / (2 * noise))
+        elif len(FRAMEWORKS) > 1:
+            # 只有一个框架有历史数据，无法比较
+            confidence *= 0.5
+        return {
+            "framework": best,
+            "expected_runtime_us": runtime_us,
+            "confidence": confidence,
+            "reason": f"基于 {count} 条相近历史记录，预计运行 {runtime_us:.0f}µs",
+            "candidates": {f: p[0] for f, p in candidates.items()},
+        }
@@ -1,7 +1,11 @@
-cd generate
-# python generate_o3.py
-python generate.py
-cp output.json ../driver/output.json
-cd ..
-cd driver
-python driver.py
+# 流水线执行：生成、编译和测试同时进行，结果写入 sweeps/<时间戳>/
+python pipeline.py
+
+# 旧的串行流程：
+# cd generate
+# # python generate_o3.py
+# python generate.py
+# cp output.json ../driver/output.json
+# cd ..
+# cd driver
+# python driver.py
@@ -0,0 +1,11 @@
+import numpy as np
+
+def generate(params, rng):
+    return rng.integers(1, 1000, size=params["n"], dtype=np.int64)
+
+def format_input(values):
+    """空格分隔的整数"""
+    return " ".join(map(str, values.tolist())) + "\n"
+
+def oracle(values):
+    return f"{int(values.sum())}\n"
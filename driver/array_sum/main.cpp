@@ -1,52 +1,19 @@
 #include "array_sum.h"
 #include <iostream>
-#include <fstream>
-#include <sstream>
 #include <vector>
 #include <string>
 #include <chrono>
 #include <cstdlib> // 用于 exit()
+#include "common/harness.h"
 
+// 输入为空白分隔的整数，mmap + from_chars 解析（见 common/loader.h）
 std::vector<long long> load_array_from_file(const std::string& filename) {
-    Array arr;
-    std::ifstream file(filename);
-    std::string line;
-
-    if (!file.is_open()) {
-        std::cerr << "无法打开文件: " << filename << std::endl;
-        exit(1);
-    }
-
-    while (std::getline(file, line)) {
-        std::istringstream iss(line);
-        long long num;
-        while (iss >> num) {
-            arr.push_back(num);
-        }
-    }
-
-    file.close();
-    return arr;
+    return harness::load_values<long long>(filename);
 }
 
 long long load_result_from_file(const std::string& filename) {
-    long long result;
-    std::ifstream file(filename);
-    std::string line;
-
-    if (!file.is_open()) {
-        std::cerr << "无法打开文件: " << filename << std::endl;
-        exit(1);
-    }
-
-    while (std::getline(file, line)) {
-        std::istringstream iss(line);
-        long long num;
-        iss >> result;
-    }
-
-    file.close();
-    return result;
+    std::vector<long long> values = harness::load_values<long long>(filename, 1);
+    return values.empty() ? 0 : values.back();
 }
 
 int main(int argc, char* argv[]) {
@@ -55,6 +22,7 @@ int main(int argc, char* argv[]) {
         return 1;
     }
 
+    harness::init(argc, argv);
     // 从命令行参数获取文件路径
     std::string data_file_path = argv[1];
     std::string result_file_path = argv[2];
@@ -63,32 +31,13 @@ int main(int argc, char* argv[]) {
     std::vector<long long> arr = load_array_from_file(data_file_path);
     long long result = load_result_from_file(result_file_path);
 
-    // 记录BFS开始时间戳并写入标准输出
-    auto time_start = std::chrono::high_resolution_clock::now();
-    auto start_ms = std::chrono::duration_cast<std::chrono::milliseconds>(
-        time_start.time_since_epoch()
-    ).count();
-    std::cout << "[METRICS] ARRAY_TIME_START=" << start_ms << std::endl << std::flush;
+    // 输出读取阶段的统计和核心代码的起止时间戳（见 common/harness.h）
+    harness::KernelTimer timer("ARRAY");
+    timer.start();
 
-    // 执行BFS算法
     long long sum = array_sum(arr);
     std::cout << "数组的和是: " << sum << std::endl; // 统一函数调用
 
-    // 记录BFS结束时间戳并写入标准输出
-    auto time_end = std::chrono::high_resolution_clock::now();
-    auto end_ms = std::chrono::duration_cast<std::chrono::milliseconds>(
-        time_end.time_since_epoch()
-    ).count();
-    std::cout << "[METRICS] ARRAY_TIME_END=" << end_ms << std::endl << std::flush;
-    // 输出耗时和验证结果
-    std::cout << "Time: " 
-            << std::chrono::duration_cast<std::chrono::milliseconds>(time_end - time_start).count()
-            << "ms\n";
-
-    if (result == sum)
-        std::cout << "验证成功" << std::endl;
-    else
-        std::cout << "验证失败" << std::endl;
-
-    return 0;
+    timer.stop();
+    return harness::finish(result == sum);
 }
\ No newline at end of file
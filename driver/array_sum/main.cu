@@ -1,51 +1,19 @@
 #include "array_sum.h"
 #include <iostream>
-#include <fstream>
-#include <sstream>
 #include <vector>
 #include <string>
 #include <chrono>
 #include <cstdlib> // 用于 exit()
+#include "common/loader.h"
 
+// 输入为空白分隔的整数，mmap + from_chars 解析（见 common/loader.h）
 std::vector<long long> load_array_from_file(const std::string& filename) {
-    Array arr;
-    std::ifstream file(filename);
-    std::string line;
-
-    if (!file.is_open()) {
-        std::cerr << "无法打开文件: " << filename << std::endl;
-        exit(1);
-    }
-
-    while (std::getline(file, line)) {
-        std::istringstream iss(line);
-        long long num;
-        while (iss >> num) {
-            arr.push_back(num);
-        }
-    }
-
-    file.close();
-    return arr;
+    return harness::load_values<long long>(filename);
 }
 
 long long load_result_from_file(const std::string& filename) {
-    long long result;
-    std::ifstream file(filename);
-    std::string line;
-
-    if (!file.is_open()) {
-        std::cerr << "无法打开文件: " << filename << std::endl;
-        exit(1);
-    }
-
-    while (std::getline(file, line)) {
-        std::istringstream iss(line);
-        iss >> result;
-    }
-
-    file.close();
-    return result;
+    std::vector<long long> values = harness::load_values<long long>(filename, 1);
+    return values.empty() ? 0 : values.back();
 }
 
 int main(int argc, char* argv[]) {
@@ -62,7 +30,8 @@ int main(int argc, char* argv[]) {
     std::vector<long long> arr = load_array_from_file(data_file_path);
     long long result = load_result_from_file(result_file_path);
 
-    // 记录开始时间戳并写入标准输出
+    // 输出读取阶段的统计，记录开始时间戳并写入标准输出
+    harness::report_load();
     auto time_start = std::chrono::high_resolution_clock::now();
     auto start_ms = std::chrono::duration_cast<std::chrono::milliseconds>(
         time_start.time_since_epoch()
@@ -0,0 +1,157 @@
+// harness.h —— 测试程序共用的输入读取（见 loader.h）、计时标记、MPI 初始化和验证输出
+// 编译时 -I 指向临时目录，测试程序以 #include "common/harness.h" 引用
+#pragma once
+#include <chrono>
+#include <cmath>
+#include <cstdlib>
+#include <iostream>
+#include <string>
+#include <vector>
+
+#include "loader.h"
+
+#ifdef USE_MPI
+#include <mpi.h>
+#endif
+
+namespace harness {
+
+// 多进程运行时所有进程读取完整输入，只有 0 号进程输出和验证结果
+inline int rank() {
+#ifdef USE_MPI
+    int r = 0;
+    MPI_Comm_rank(MPI_COMM_WORLD, &r);
+    return r;
+#else
+    return 0;
+#endif
+}
+
+inline void barrier() {
+#ifdef USE_MPI
+    MPI_Barrier(MPI_COMM_WORLD);
+#endif
+}
+
+// 冒烟测试阶段的参考结果为 result_smoke_<阶段>.txt（见 smoke_inputs.py），这些运行不保留带时间戳的结果副本
+inline bool is_smoke_result(const std::string& result_file) {
+    return result_file.substr(result_file.find_last_of('/') + 1).rfind("result_smoke_", 0) == 0;
+}
+
+inline void init(int& argc, char**& argv) {
+#ifdef USE_MPI
+    MPI_Init(&argc, &argv);
+    if (rank() != 0) std::cout.setstate(std::ios::failbit);
+#else
+    (void)argc;
+    (void)argv;
+#endif
+}
+
+// 输出验证结果并结束 MPI，返回 main 的退出码
+inline int finish(bool ok) {
+    std::cout << (ok ? "验证成功" : "验证失败") << std::endl;
+#ifdef USE_MPI
+    MPI_Finalize();
+#endif
+    return 0;
+}
+
+inline long long epoch_ms(std::chrono::high_resolution_clock::time_point t) {
+    return std::chrono::duration_cast<std::chrono::milliseconds>(t.time_since_epoch()).count();
+}
+
+// 核心代码计时：输出驱动解析的 [METRICS] <TAG>_TIME_START/END 时间戳和 "Time: Xms"，开始前先输出读取阶段的统计
+class KernelTimer {
+public:
+    explicit KernelTimer(const std::string& tag) : tag_(tag) {}
+
+    void start() {
+        report_load();
+        barrier();
+        start_ = std::chrono::high_resolution_clock::now();
+        std::cout << "[METRICS] " << tag_ << "_TIME_START=" << epoch_ms(start_) << std::endl << std::flush;
+    }
+
+    void stop() {
+        barrier();
+        auto end = std::chrono::high_resolution_clock::now();
+        std::cout << "[METRICS] " << tag_ << "_TIME_END=" << epoch_ms(end) << std::endl << std::flush;
+        std::cout << "Time: " << std::chrono::duration_cast<std::chrono::milliseconds>(end - start_).count()
+                  << "ms\n";
+    }
+
+private:
+    std::string tag_;
+    std::chrono::high_resolution_clock::time_point start_;
+};
+
+inline TextReader open_input(const std::string& path) {
+    return TextReader(path);
+}
+
+// 读取 n 个空白分隔的值
+template <typename T>
+std::vector<T> read_values(TextReader& in, size_t n) {
+    return in.values<T>(n);
+}
+
+// 读取文件剩余的全部值，个数必须为 n（位于文件末尾的大块数据，可并行解析）
+template <typename T>
+std::vector<T> read_rest(TextReader& in, size_t n) {
+    std::vector<T> values = in.rest<T>();
+    if (values.size() != n) parse_error("数值个数与文件头声明的个数不一致");
+    return values;
+}
+
+// 读取文件中的全部值（参考结果文件）
+template <typename T>
+std::vector<T> read_file(const std::string& path) {
+    return load_values<T>(path);
+}
+
+// 浮点结果按相对误差 + 绝对误差比较
+inline bool close_enough(const std::vector<double>& actual, const std::vector<double>& expected,
+                         double rtol = 1e-6, double atol = 1e-9) {
+    if (actual.size() != expected.size()) return false;
+    for (size_t i = 0; i < actual.size(); ++i) {
+        if (!(std::fabs(actual[i] - expected[i]) <= atol + rtol * std::fabs(expected[i]))) return false;
+    }
+    return true;
+}
+
+// 边列表 "u v"，build_csr 把它转为 CSR 邻接表（symmetric 为 true 时每条边双向存储）
+struct EdgeList {
+    std::vector<int> src, dst;
+};
+
+// 边列表位于文件末尾
+inline EdgeList read_edges(TextReader& in, long long num_edges) {
+    std::vector<int> pairs = read_rest<int>(in, 2 * static_cast<size_t>(num_edges));
+    EdgeList list;
+    list.src.resize(num_edges);
+    list.dst.resize(num_edges);
+    for (long long i = 0; i < num_edges; ++i) {
+        list.src[i] = pairs[2 * i];
+        list.dst[i] = pairs[2 * i + 1];
+    }
+    return list;
+}
+
+inline void build_csr(const EdgeList& list, int num_vertices, bool symmetric,
+                      std::vector<int>& offset, std::vector<int>& edges) {
+    offset.assign(num_vertices + 1, 0);
+    for (size_t i = 0; i < list.src.size(); ++i) {
+        ++offset[list.src[i] + 1];
+        if (symmetric) ++offset[list.dst[i] + 1];
+    }
+    for (int v = 0; v < num_vertices; ++v) offset[v + 1] += offset[v];
+    edges.resize(offset[num_vertices]);
+    std::vector<int> pos(offset.begin(), offset.end() - 1);
+    for (size_t i = 0; i < list.src.size(); ++i) {
+        edges[pos[list.src[i]]++] = list.dst[i];
+        if (symmetric) edges[pos[list.dst[i]]++] = list.src[i];
+    }
+}
+
+}  // namespace harness
@@ -0,0 +1,310 @@
+// loader.h —— 测试程序共用的文本输入读取：mmap 映射整个文件，std::from_chars 直接在映射区上解析
+// 读取阶段单独计时：只累计打开映射和解析数值的时间（不含之后构建 CSR、矩阵等），进入核心代码前输出
+// [METRICS] LOAD_* 标记（字节数、起止时间戳、解析耗时和吞吐 MB/s）
+// 数值之间以空白或逗号分隔；'#' 或 '%' 开始的注释直到行尾（如 SNAP 边列表、Matrix Market 的文件头）被跳过，
+// 其它无法解析的内容视为格式错误
+// 环境变量 HARNESS_LOAD_THREADS 大于 1 时，文件尾部的同类型数值按块并行解析（0 表示使用全部核心）
+#pragma once
+#include <charconv>
+#include <chrono>
+#include <cstdio>
+#include <cstdlib>
+#include <cstring>
+#include <iostream>
+#include <string>
+#include <system_error>
+#include <thread>
+#include <type_traits>
+#include <vector>
+
+#include <fcntl.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
+
+namespace harness {
+
+// 小于该字节数的输入不值得启动线程
+constexpr size_t PARALLEL_MIN_BYTES = 1 << 20;
+
+// 一次运行的输入读取统计：start/end 为第一次和最后一次读取的起止时间，seconds 为各次读取耗时之和
+struct LoadStats {
+    size_t bytes = 0;
+    double seconds = 0.0;
+    int depth = 0;
+    bool started = false;
+    bool reported = false;
+    std::chrono::high_resolution_clock::time_point start, end;
+};
+
+inline LoadStats& load_stats() {
+    static LoadStats stats;
+    return stats;
+}
+
+// 在作用域内计时一次读取（映射、解析），嵌套时只计最外层
+class LoadTimer {
+public:
+    LoadTimer() {
+        LoadStats& stats = load_stats();
+        if (stats.depth++ > 0) return;
+        begin_ = std::chrono::high_resolution_clock::now();
+        if (!stats.started) {
+            stats.started = true;
+            stats.start = begin_;
+        }
+    }
+
+    ~LoadTimer() {
+        LoadStats& stats = load_stats();
+        if (--stats.depth > 0) return;
+        stats.end = std::chrono::high_resolution_clock::now();
+        stats.seconds += std::chrono::duration<double>(stats.end - begin_).count();
+    }
+
+    LoadTimer(const LoadTimer&) = delete;
+    LoadTimer& operator=(const LoadTimer&) = delete;
+
+private:
+    std::chrono::high_resolution_clock::time_point begin_;
+};
+
+inline int load_threads() {
+    const char* env = std::getenv("HARNESS_LOAD_THREADS");
+    if (env == nullptr || *env == '\0') return 1;
+    int threads = std::atoi(env);
+    if (threads <= 0) threads = static_cast<int>(std::thread::hardware_concurrency());
+    return threads > 0 ? threads : 1;
+}
+
+// 只读映射整个文件；映射失败（如管道、特殊文件系统）时退回一次性读入内存
+class MappedFile {
+public:
+    explicit MappedFile(const std::string& path) {
+        LoadTimer timer;
+        int fd = ::open(path.c_str(), O_RDONLY);
+        if (fd < 0) {
+            std::cerr << "无法打开文件: " << path << std::endl;
+            exit(1);
+        }
+        struct stat st;
+        if (::fstat(fd, &st) == 0 && st.st_size > 0) {
+            void* addr = ::mmap(nullptr, st.st_size, PROT_READ, MAP_PRIVATE, fd, 0);
+            if (addr != MAP_FAILED) {
+                ::madvise(addr, st.st_size, MADV_SEQUENTIAL);
+                data_ = static_cast<const char*>(addr);
+                size_ = st.st_size;
+                mapped_ = true;
+            }
+        }
+        if (!mapped_) {
+            char chunk[1 << 16];
+            ssize_t n;
+            while ((n = ::read(fd, chunk, sizeof(chunk))) > 0) buffer_.append(chunk, n);
+            data_ = buffer_.data();
+            size_ = buffer_.size();
+        }
+        ::close(fd);
+        load_stats().bytes += size_;
+    }
+
+    ~MappedFile() {
+        if (mapped_) ::munmap(const_cast<char*>(data_), size_);
+    }
+
+    MappedFile(const MappedFile&) = delete;
+    MappedFile& operator=(const MappedFile&) = delete;
+
+    const char* begin() const { return data_; }
+    const char* end() const { return data_ + size_; }
+    size_t size() const { return size_; }
+
+private:
+    const char* data_ = nullptr;
+    size_t size_ = 0;
+    bool mapped_ = false;
+    std::string buffer_;
+};
+
+inline bool is_separator(char c) {
+    return c == ' ' || c == '\n' || c == '\t' || c == '\r' || c == ',';
+}
+
+inline bool is_comment(char c) {
+    return c == '#' || c == '%';
+}
+
+// 跳过分隔符和注释，返回下一个数值的起始位置
+inline const char* skip_separators(const char* p, const char* end) {
+    while (p < end) {
+        if (is_separator(*p)) {
+            ++p;
+        } else if (is_comment(*p)) {
+            const void* eol = std::memchr(p, '\n', end - p);
+            p = eol ? static_cast<const char*>(eol) : end;
+        } else {
+            break;
+        }
+    }
+    return p;
+}
+
+inline bool has_comment(const char* begin, const char* end) {
+    return std::memchr(begin, '#', end - begin) != nullptr || std::memchr(begin, '%', end - begin) != nullptr;
+}
+
+// 解析一个数值，返回数值之后的位置；格式错误时返回 nullptr
+template <typename T>
+const char* parse_value(const char* p, const char* end, T& value) {
+    if (p < end && *p == '+') ++p;
+#if defined(__cpp_lib_to_chars)
+    auto [next, ec] = std::from_chars(p, end, value);
+    return ec == std::errc() ? next : nullptr;
+#else
+    if constexpr (std::is_floating_point_v<T>) {
+        // 旧版标准库不支持浮点 from_chars：复制单个数值后用 strtod 解析（映射区末尾没有 '\0'）
+        char token[64];
+        size_t len = 0;
+        while (p + len < end && !is_separator(p[len]) && len + 1 < sizeof(token)) ++len;
+        std::memcpy(token, p, len);
+        token[len] = '\0';
+        char* stop = nullptr;
+        value = static_cast<T>(std::strtod(token, &stop));
+        return stop == token ? nullptr : p + (stop - token);
+    } else {
+        auto [next, ec] = std::from_chars(p, end, value);
+        return ec == std::errc() ? next : nullptr;
+    }
+#endif
+}
+
+[[noreturn]] inline void parse_error(const char* what) {
+    std::cerr << "输入格式错误: " << what << std::endl;
+    exit(1);
+}
+
+// 解析 [p, end) 中的全部数值
+template <typename T>
+void parse_range(const char* p, const char* end, std::vector<T>& out) {
+    while ((p = skip_separators(p, end)) < end) {
+        T value;
+        p = parse_value(p, end, value);
+        if (p == nullptr) parse_error("无法解析的数值");
+        out.push_back(value);
+    }
+}
+
+// 按字节数把 [begin, end) 切成 threads 块并行解析，切分点后移到分隔符处，保证数值不被截断；
+// 含注释时切分点可能落在注释中间，改为顺序解析
+template <typename T>
+std::vector<T> parse_chunks(const char* begin, const char* end, int threads) {
+    std::vector<T> out;
+    size_t bytes = end - begin;
+    if (threads <= 1 || bytes < PARALLEL_MIN_BYTES || has_comment(begin, end)) {
+        parse_range(begin, end, out);
+        return out;
+    }
+    std::vector<const char*> cuts{begin};
+    for (int i = 1; i < threads; ++i) {
+        const char* cut = begin + bytes * i / threads;
+        if (cut < cuts.back()) cut = cuts.back();
+        while (cut < end && !is_separator(*cut)) ++cut;
+        cuts.push_back(cut);
+    }
+    cuts.push_back(end);
+
+    std::vector<std::vector<T>> parts(threads);
+    std::vector<std::thread> workers;
+    for (int i = 0; i < threads; ++i) {
+        workers.emplace_back([&, i] { parse_range(cuts[i], cuts[i + 1], parts[i]); });
+    }
+    size_t total = 0;
+    for (int i = 0; i < threads; ++i) {
+        workers[i].join();
+        total += parts[i].size();
+    }
+    out.reserve(total);
+    for (auto& part : parts) out.insert(out.end(), part.begin(), part.end());
+    return out;
+}
+
+// 顺序读取映射文件中的数值：先用 >> 或 values 读头部，再用 rest 读取剩余的同类型数据
+class TextReader {
+public:
+    explicit TextReader(const std::string& path) : file_(path), pos_(file_.begin()) {}
+
+    template <typename T>
+    bool next(T& value) {
+        pos_ = skip_separators(pos_, file_.end());
+        if (pos_ == file_.end()) return false;
+        const char* after = parse_value(pos_, file_.end(), value);
+        if (after == nullptr) parse_error("无法解析的数值");
+        pos_ = after;
+        return true;
+    }
+
+    // 与 std::istream 一致：读到文件末尾后转换为 false
+    template <typename T>
+    TextReader& operator>>(T& value) {
+        LoadTimer timer;
+        if (!next(value)) failed_ = true;
+        return *this;
+    }
+
+    explicit operator bool() const { return !failed_; }
+
+    template <typename T>
+    std::vector<T> values(size_t n) {
+        LoadTimer timer;
+        std::vector<T> out(n);
+        for (size_t i = 0; i < n; ++i) {
+            if (!next(out[i])) parse_error("数值个数少于文件头声明的个数");
+        }
+        return out;
+    }
+
+    // 文件剩余部分的全部数值（可并行解析）
+    template <typename T>
+    std::vector<T> rest(int threads = load_threads()) {
+        LoadTimer timer;
+        std::vector<T> out = parse_chunks<T>(pos_, file_.end(), threads);
+        pos_ = file_.end();
+        return out;
+    }
+
+    size_t size() const { return file_.size(); }
+
+private:
+    MappedFile file_;
+    const char* pos_;
+    bool failed_ = false;
+};
+
+// 读取整个文件中的全部数值（参考结果文件等）
+template <typename T>
+std::vector<T> load_values(const std::string& path, int threads = load_threads()) {
+    TextReader reader(path);
+    return reader.rest<T>(threads);
+}
+
+// 输出读取阶段的 [METRICS] 标记，只在第一次调用时输出（核心代码计时开始前调用）
+// LOAD_BEGIN_MS/LOAD_END_MS 为第一次读取开始到最后一次读取结束，吞吐按各次读取耗时之和 LOAD_PARSE_MS 计算
+inline void report_load() {
+    LoadStats& stats = load_stats();
+    if (!stats.started || stats.reported) return;
+    stats.reported = true;
+    auto to_ms = [](std::chrono::high_resolution_clock::time_point t) {
+        return std::chrono::duration_cast<std::chrono::milliseconds>(t.time_since_epoch()).count();
+    };
+    double mb_per_s = stats.seconds > 0 ? stats.bytes / 1e6 / stats.seconds : 0.0;
+    char rate[32], parse_ms[32];
+    std::snprintf(rate, sizeof(rate), "%.1f", mb_per_s);
+    std::snprintf(parse_ms, sizeof(parse_ms), "%.3f", stats.seconds * 1000);
+    std::cout << "[METRICS] LOAD_BEGIN_MS=" << to_ms(stats.start) << "\n"
+              << "[METRICS] LOAD_END_MS=" << to_ms(stats.end) << "\n"
+              << "[METRICS] LOAD_BYTES=" << stats.bytes << "\n"
+              << "[METRICS] LOAD_PARSE_MS=" << parse_ms << "\n"
+              << "[METRICS] LOAD_MBPS=" << rate << std::endl;
+}
+
+}  // namespace harness
@@ -0,0 +1,95 @@
+// shard.h —— 分布式测试程序只读取本进程的图分片（process.py partition 生成的二进制 CSR，小端）
+// 文件格式：魔数 "CSRSHRD1"，int64 文件头 9 项（版本、进程号、分片数、划分方式、全局顶点数、全局边数、
+// 拥有的顶点数、幽灵顶点数、本地边数），随后为 int64 offset 和 int32 的本地→全局编号、幽灵顶点所属进程、邻居
+#pragma once
+#include <cstdint>
+#include <cstring>
+#include <string>
+#include <vector>
+
+#include "harness.h"
+
+namespace harness {
+
+constexpr char SHARD_MAGIC[8] = {'C', 'S', 'R', 'S', 'H', 'R', 'D', '1'};
+constexpr long long SHARD_VERSION = 1;
+
+// 划分方式，与 process.py 的 PARTITION_SCHEMES 顺序一致
+enum class ShardScheme { Block = 0, Hash = 1, Grid2D = 2 };
+
+// 本地编号 [0, num_owned) 为本进程拥有的顶点（按全局编号排序），[num_owned, num_local()) 为幽灵顶点
+struct Shard {
+    int rank = 0;
+    int parts = 1;
+    ShardScheme scheme = ShardScheme::Block;
+    long long global_vertices = 0;
+    long long global_edges = 0;
+    int num_owned = 0;
+    int num_ghosts = 0;
+    std::vector<long long> offset;     // 本地 CSR 偏移，行为全部本地顶点
+    std::vector<int> local_to_global;  // 本地编号 -> 全局编号
+    std::vector<int> ghost_owner;      // 第 i 个幽灵顶点（本地编号 num_owned + i）所属的进程
+    std::vector<int> edges;            // 邻居的本地编号
+
+    int num_local() const { return num_owned + num_ghosts; }
+    long long num_edges() const { return static_cast<long long>(edges.size()); }
+    bool is_ghost(int local) const { return local >= num_owned; }
+    int owner(int local) const { return is_ghost(local) ? ghost_owner[local - num_owned] : rank; }
+};
+
+inline std::string shard_path(const std::string& dir, int rank) {
+    return dir + "/shard_" + std::to_string(rank) + ".bin";
+}
+
+// 读取 dir 中第 rank 个分片；映射文件的字节数计入读取阶段的统计
+inline Shard load_shard(const std::string& dir, int rank) {
+    LoadTimer timer;
+    MappedFile file(shard_path(dir, rank));
+    const char* p = file.begin();
+    auto take = [&](void* out, size_t bytes) {
+        if (static_cast<size_t>(file.end() - p) < bytes) parse_error("分片文件不完整");
+        std::memcpy(out, p, bytes);
+        p += bytes;
+    };
+
+    char magic[sizeof(SHARD_MAGIC)];
+    take(magic, sizeof(magic));
+    if (std::memcmp(magic, SHARD_MAGIC, sizeof(magic)) != 0) parse_error("不是图分片文件");
+    int64_t header[9];
+    take(header, sizeof(header));
+    if (header[0] != SHARD_VERSION) parse_error("分片文件版本不支持");
+
+    Shard shard;
+    shard.rank = static_cast<int>(header[1]);
+    shard.parts = static_cast<int>(header[2]);
+    shard.scheme = static_cast<ShardScheme>(header[3]);
+    shard.global_vertices = header[4];
+    shard.global_edges = header[5];
+    shard.num_owned = static_cast<int>(header[6]);
+    shard.num_ghosts = static_cast<int>(header[7]);
+    if (shard.rank != rank) parse_error("分片的进程号与文件名不一致");
+
+    shard.offset.resize(shard.num_local() + 1);
+    shard.local_to_global.resize(shard.num_local());
+    shard.ghost_owner.resize(shard.num_ghosts);
+    shard.edges.resize(header[8]);
+    take(shard.offset.data(), shard.offset.size() * sizeof(long long));
+    take(shard.local_to_global.data(), shard.local_to_global.size() * sizeof(int));
+    take(shard.ghost_owner.data(), shard.ghost_owner.size() * sizeof(int));
+    take(shard.edges.data(), shard.edges.size() * sizeof(int));
+    if (p != file.end() || shard.offset.back() != shard.num_edges()) parse_error("分片文件大小与文件头不一致");
+    return shard;
+}
+
+// 按 MPI 进程号读取本进程的分片，分片数必须等于进程数
+inline Shard load_local_shard(const std::string& dir) {
+    int size = 1;
+#ifdef USE_MPI
+    MPI_Comm_size(MPI_COMM_WORLD, &size);
+#endif
+    Shard shard = load_shard(dir, rank());
+    if (shard.parts != size) parse_error("分片数与进程数不一致");
+    return shard;
+}
+
+}  // namespace harness
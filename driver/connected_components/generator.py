@@ -0,0 +1,28 @@
+import numpy as np
+
+def generate(params, rng):
+    """随机无向边，边数少于顶点数时会留下大量小分量和孤立顶点"""
+    n, m = params["vertices"], params["edges"]
+    return {"vertices": n, "src": rng.integers(0, n, size=m), "dst": rng.integers(0, n, size=m)}
+
+def format_input(g):
+    """首行 "顶点数 边数"，之后每行一条无向边 "u v" """
+    return f"{g['vertices']} {len(g['src'])}\n" + "".join(
+        f"{u} {v}\n" for u, v in zip(g["src"].tolist(), g["dst"].tolist()))
+
+def oracle(g):
+    """并查集求分量，标号为分量内最小的顶点编号"""
+    parent = list(range(g["vertices"]))
+
+    def find(v):
+        while parent[v] != v:
+            parent[v] = parent[parent[v]]
+            v = parent[v]
+        return v
+
+    for u, v in zip(g["src"].tolist(), g["dst"].tolist()):
+        ru, rv = find(u), find(v)
+        if ru != rv:
+            # 总是把较大的根挂到较小的根下，根即分量内最小编号
+            parent[max(ru, rv)] = min(ru, rv)
+    return "\n".join(str(find(v)) for v in range(g["vertices"])) + "\n"
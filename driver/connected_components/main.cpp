@@ -0,0 +1,29 @@
+#include "connected_components.h"
+#include "common/harness.h"
+
+int main(int argc, char* argv[]) {
+    harness::init(argc, argv);
+    if (argc != 3) {
+        std::cerr << "用法: " << argv[0] << " <输入文件> <结果文件>" << std::endl;
+        return 1;
+    }
+
+    harness::TextReader in = harness::open_input(argv[1]);
+    int num_vertices = 0;
+    long long num_edges = 0;
+    in >> num_vertices >> num_edges;
+    harness::EdgeList list = harness::read_edges(in, num_edges);
+    std::vector<int> offset, edges;
+    harness::build_csr(list, num_vertices, true, offset, edges);
+    Graph graph{num_vertices, static_cast<int>(edges.size()), offset.data(), edges.data()};
+
+    std::vector<int> expected = harness::read_file<int>(argv[2]);
+    std::vector<int> component(num_vertices, -1);
+
+    harness::KernelTimer timer("CC");
+    timer.start();
+    connected_components(graph, component);
+    timer.stop();
+
+    return harness::finish(component == expected);
+}
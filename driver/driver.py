@@ -5,8 +5,16 @@ import tempfile
 import shutil
 import time
 import re
-import matplotlib.pyplot as plt
+import statistics
 from hardware_monitor import HardwareMonitor
+from process_runner import launch, load_memory_limit
+from timeouts import compute_timeout, HISTORY_FILE
+from smoke_inputs import SMOKE_STAGES, ensure_stage_input
+from env_guard import EnvironmentGuard, plan_cpusets, pin_driver
+from trace_export import TraceRecorder, harness_phases
+from numa_placement import plan_placement
+from mpi_launch import plan_mpi, apply_mpi, DEFAULT_RANKS
+from task_registry import install_harness, work_summary
 import sys
 
 def json_serializable(obj):
@@ -31,27 +39,81 @@ def list_files_in_directory(directory):
     for file in files:
         print(f"  {file}")
 
-def extract_and_compile(metadata, current_dir, temp_dir, monitor_mode):
-    framework = metadata['framework']
-    task_type = metadata['task_type']
-
-    # 初始化硬件监控
-    monitor = HardwareMonitor()
-
-    # 创建头文件路径
-    if framework == 'Serial':
-        header_file_name = 'single_thread_impl.h'
-    elif framework == 'OpenMP':
-        header_file_name = 'openmp_impl.h'
-    elif framework == 'CUDA':
-        header_file_name = 'cuda_impl.cu'
-    elif framework == 'MPI':
-        header_file_name = 'mpi_impl.h'
-    elif framework == 'TBB':
-        header_file_name = 'tbb_impl.h'
-    else:
-        header_file_name = 'single_thread_impl.h'
+# 框架到实现头文件名的映射
+HEADER_FILES = {
+    'Serial': 'single_thread_impl.h',
+    'OpenMP': 'openmp_impl.h',
+    'CUDA': 'cuda_impl.cu',
+    'MPI': 'mpi_impl.h',
+    'TBB': 'tbb_impl.h',
+}
+
+def append_history(result, metadata, monitor, current_dir, history_file=HISTORY_FILE):
+    """把一次运行结果连同输入规模和主机特征追加到历史记录"""
+    input_file = os.path.join(os.path.dirname(current_dir), 'dataset', result['task_type'], result['dataset'])
+    record = {
+        "timestamp": time.time(),
+        "model": metadata.get('model'),
+        "task_type": result['task_type'],
+        "framework": result['framework'],
+        "dataset": result['dataset'],
+        "profile": result['profile'],
+        "numa_policy": result.get('numa_policy', 'none'),
+        "mpi_ranks": result.get('mpi_ranks'),
+        "mpi_threads": result.get('mpi_threads'),
+        "input_bytes": os.path.getsize(input_file) if os.path.exists(input_file) else None,
+        "host": {
+            "cpu_cores": monitor.cpu_threads,
+            "total_memory": monitor.mem_total // (1024**3),  # GB
+            "gpu_count": monitor.gpu_count,
+        },
+        "status": result['status'],
+        "stages": result.get('stages'),
+        "noisy": result['environment']['noisy'] if result.get('environment') else None,
+        "verified": result['verified'],
+        "time_ms": result['time_ms'],
+        "runtime_ms": result['runtime_ms'],
+        "work": result.get('work'),
+        "load_mb_per_s": result['load']['mb_per_s'] if result.get('load') else None,
+        "energy_j": result['energy']['run']['joules'] if result.get('energy') else None,
+        "kernel_energy_j": result['energy']['phases']['kernel']['joules']
+            if result.get('energy') and 'kernel' in result['energy']['phases'] else None,
+        "peak_rss_kb": result['peak_rss_kb'],
+        "peak_rss_rank_kb": result.get('peak_rss_rank_kb'),
+        "launcher_peak_rss_kb": result.get('launcher_peak_rss_kb'),
+        "minor_faults": result['minor_faults'],
+        "major_faults": result['major_faults'],
+    }
+    with open(history_file, 'a') as f:
+        f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+def write_log(log_file, log_content, report=None):
+    """追加一条日志记录，monitor 模式下附带监控数据"""
+    with open(log_file, 'a') as f:
+        f.write(log_content + '\n')
+        if report is not None:
+            # 追加监控数据
+            for key, value in report['metrics'].items():
+                f.write(f'  {key}: {value}\n')
 
+            # 如果存在BFS时间窗口信息，也记录下来
+            if 'time_window' in report and report['time_window']:
+                f.write(f"  核心代码执行时段: {report['time_window']['duration_ms']}ms\n")
+
+            energy = report.get('energy')
+            if energy:
+                phases = ", ".join(f"{name} {phase['joules']:.2f}J" for name, phase in energy['phases'].items())
+                f.write(f"  能耗: {energy['run']['joules']:.2f}J，平均功率 {energy['run']['avg_w'] or 0:.1f}W，"
+                        f"EDP {energy['run']['edp_js']:.3f}J·s（{phases}）\n")
+
+            overhead = report.get('sampler_overhead')
+            if overhead:
+                f.write(f"  采样开销: {overhead['samples']} 个样本, 采样进程 CPU {overhead['sampler_cpu_ms']:.1f}ms "
+                        f"({overhead['cpu_fraction']:.2%}), 单次采样 {overhead['avg_sample_us']:.0f}µs\n")
+
+def write_impl_header(metadata, temp_dir):
+    """把生成的代码写成 temp_dir 中的实现头文件，返回头文件名"""
+    header_file_name = HEADER_FILES.get(metadata['framework'], 'single_thread_impl.h')
     header_file_path = os.path.join(temp_dir, header_file_name)
 
     # 使用头文件保护机制
@@ -61,6 +123,13 @@ def extract_and_compile(metadata, current_dir, temp_dir, monitor_mode):
     # 写入头文件
     with open(header_file_path, 'w') as header_file:
         header_file.write(protected_code)
+    return header_file_name
+
+def prepare_sources(metadata, current_dir, temp_dir):
+    """把生成的代码写成实现头文件并复制测试工程，返回主文件路径（失败返回 None）"""
+    framework = metadata['framework']
+    task_type = metadata['task_type']
+    header_file_name = write_impl_header(metadata, temp_dir)
 
     # 设置测试文件夹路径
     relative_test_folder_path = task_type
@@ -68,210 +137,470 @@ def extract_and_compile(metadata, current_dir, temp_dir, monitor_mode):
     
     if not os.path.exists(absolute_test_folder_path):
         print(f"文件夹 {absolute_test_folder_path} 不存在，跳过此任务。")
-        return
+        return None
 
     # 复制测试文件夹
     temp_test_folder_path = os.path.join(temp_dir, relative_test_folder_path)
     shutil.copytree(absolute_test_folder_path, temp_test_folder_path)
+    # 共用的 common/ 以及插件任务的统一接口头文件
+    install_harness(task_type, temp_dir)
 
     # 设置头文件包含
     include_line = f'#include "{header_file_name}"'
 
     # 确定主文件路径
     main_cpp_path = os.path.join(temp_test_folder_path, 'main.cu' if framework == 'CUDA' else 'main.cpp')
+    if framework == 'CUDA' and not os.path.exists(main_cpp_path) and os.path.exists(main_cpp_path[:-3] + '.cpp'):
+        # 插件任务只提供 main.cpp，复制为 main.cu 交给 nvcc 编译
+        shutil.copy(main_cpp_path[:-3] + '.cpp', main_cpp_path)
     if not os.path.exists(main_cpp_path):
         print(f"文件 {main_cpp_path} 不存在，跳过此任务。")
-        return
+        return None
 
     # 修改主文件
     with open(main_cpp_path, 'r') as main_file:
         lines = main_file.readlines()
 
     # 插入头文件包含
-    new_lines = []
-    inserted = False
     if len(lines) > 1:
         if lines[1].strip() == include_line.strip():
             new_lines = lines
-            inserted = True
         else:
             new_lines = lines[:1] + [include_line + '\n'] + lines[1:]
-            inserted = True
+    elif len(lines) == 1:
+        new_lines = [lines[0], include_line + '\n']
     else:
-        if len(lines) == 0:
-            new_lines = [include_line + '\n']
-        elif len(lines) == 1:
-            new_lines = [lines[0], include_line + '\n']
-        else:
-            new_lines = [include_line + '\n'] + lines
-        inserted = True
+        new_lines = [include_line + '\n']
+
+    with open(main_cpp_path, 'w') as main_file:
+        main_file.writelines(new_lines)
 
-    if inserted:
-        with open(main_cpp_path, 'w') as main_file:
-            main_file.writelines(new_lines)
+    return main_cpp_path
 
-    # 开始监控
-    monitor.start_monitoring()
+# 编译配置：附加在编译命令末尾的优化参数，default 与原始编译命令一致
+BUILD_PROFILES = {
+    'default': '',
+    'O2': '-O2',
+    'O3': '-O3 -march=native',
+}
 
-    # 设置编译命令
+def build_compile_command(framework, main_cpp_path, binary_path, temp_dir, profile='default'):
+    """根据框架和编译配置生成编译命令"""
     if framework == 'OpenMP':
-        compile_command = f"g++ -std=c++17 {main_cpp_path} -o {os.path.join(temp_dir, 'main')} -I{temp_dir} -fopenmp -DUSE_OPENMP"
+        command = f"g++ -std=c++17 {main_cpp_path} -o {binary_path} -I{temp_dir} -fopenmp -DUSE_OPENMP"
     elif framework == 'CUDA':
-        compile_command = f"nvcc -std=c++17 {main_cpp_path} -o {os.path.join(temp_dir, 'main')} -I{temp_dir} -lcudart -DUSE_CUDA"
+        command = f"nvcc -std=c++17 {main_cpp_path} -o {binary_path} -I{temp_dir} -lcudart -DUSE_CUDA"
     elif framework == 'MPI':
-        compile_command = f"mpicxx -std=c++17 {main_cpp_path} -o {os.path.join(temp_dir, 'main')} -I{temp_dir} -DUSE_MPI"
+        # -fopenmp：每个 rank 内可以用 OpenMP 线程（进程 × 线程的混合布局，见 mpi_launch.py）
+        command = f"mpicxx -std=c++17 {main_cpp_path} -o {binary_path} -I{temp_dir} -fopenmp -DUSE_MPI"
     elif framework == 'TBB':
-        compile_command = f"g++ -std=c++17 {main_cpp_path} -o {os.path.join(temp_dir, 'main')} -I{temp_dir} -ltbb -DUSE_TBB"
+        command = f"g++ -std=c++17 {main_cpp_path} -o {binary_path} -I{temp_dir} -ltbb -DUSE_TBB"
     else:
-        compile_command = f"g++ -std=c++17 {main_cpp_path} -o {os.path.join(temp_dir, 'main')} -I{temp_dir}"
+        command = f"g++ -std=c++17 {main_cpp_path} -o {binary_path} -I{temp_dir}"
+    flags = BUILD_PROFILES[profile]
+    return f"{command} {flags}" if flags else command
+
+def build_syntax_command(framework, source_path, temp_dir):
+    """只做语法检查的命令（不生成目标文件、不链接）；nvcc 没有 -fsyntax-only，只编译不链接"""
+    if framework == 'OpenMP':
+        return f"g++ -std=c++17 -fsyntax-only {source_path} -I{temp_dir} -fopenmp -DUSE_OPENMP"
+    elif framework == 'CUDA':
+        return f"nvcc -std=c++17 -c {source_path} -o /dev/null -I{temp_dir} -DUSE_CUDA"
+    elif framework == 'MPI':
+        return f"mpicxx -std=c++17 -fsyntax-only {source_path} -I{temp_dir} -fopenmp -DUSE_MPI"
+    elif framework == 'TBB':
+        return f"g++ -std=c++17 -fsyntax-only {source_path} -I{temp_dir} -DUSE_TBB"
+    else:
+        return f"g++ -std=c++17 -fsyntax-only {source_path} -I{temp_dir}"
+
+def compile_candidate(metadata, current_dir, temp_dir, profile='default'):
+    """准备源码并编译，返回 (可执行文件路径, 编译错误信息)"""
+    main_cpp_path = prepare_sources(metadata, current_dir, temp_dir)
+    if main_cpp_path is None:
+        return None, "测试工程不存在"
+
+    binary_path = os.path.join(temp_dir, 'main')
+    compile_command = build_compile_command(metadata['framework'], main_cpp_path, binary_path, temp_dir, profile)
 
     # 编译
     print(f"编译命令: {compile_command}")
     compile_result = subprocess.run(compile_command, shell=True, capture_output=True, text=True, cwd=temp_dir)
-    
+
     if compile_result.returncode != 0:
         print("编译失败！")
         print(compile_result.stderr)
-        log_content = f"{time.strftime('%Y-%m-%d %H:%M:%S')} - {framework} - {task_type} - 编译失败 - 运行时长: N/A"
-        with open('log.txt', 'a') as log_file:
-            log_file.write(log_content + '\n')
-        monitor.stop_monitoring()
-        return
-
+        return None, compile_result.stderr
+
+    return binary_path, None
+
+def parse_run_output(output):
+    """从测试程序输出中提取运行时间、验证结果和核心代码时间窗口"""
+    time_match = re.search(r"Time: (\d+)ms", output)
+    phase_times = None
+    # 提取核心代码执行时间戳（BFS/ARRAY/MATRIX）
+    start_match = re.search(r'\[METRICS\] \w+_TIME_START=(\d+)', output)
+    end_match = re.search(r'\[METRICS\] \w+_TIME_END=(\d+)', output)
+    if start_match and end_match:
+        # 提取并转换为秒级时间戳
+        phase_times = {
+            "bfs_start": int(start_match.group(1)) / 1000.0,
+            "bfs_end": int(end_match.group(1)) / 1000.0
+        }
+    # 读取输入阶段（common/loader.h 输出的 LOAD_* 标记）
+    load = None
+    load_fields = dict(re.findall(r'\[METRICS\] LOAD_(BEGIN_MS|END_MS|BYTES|PARSE_MS|MBPS)=([\d.]+)', output))
+    if all(k in load_fields for k in ("BEGIN_MS", "END_MS", "BYTES", "MBPS")):
+        load = {
+            "start": int(load_fields["BEGIN_MS"]) / 1000.0,
+            "end": int(load_fields["END_MS"]) / 1000.0,
+            "bytes": int(load_fields["BYTES"]),
+            # 映射和解析耗时之和（不含读取之间构建数据结构的时间），吞吐按此计算
+            "parse_ms": float(load_fields["PARSE_MS"]) if "PARSE_MS" in load_fields else None,
+            "mb_per_s": float(load_fields["MBPS"]),
+        }
+    return {
+        "time_ms": int(time_match.group(1)) if time_match else None,
+        "verified": "验证成功" in output,
+        "phase_times": phase_times,
+        "load": load,
+    }
+
+def run_candidate(binary_path, task_type, current_dir, temp_dir, monitor, dataset='data.txt', timeout=300,
+                  memory_limit=None, limit_mode='rlimit', cpus=None, placement=None):
+    """在给定数据集上运行已编译的测试程序，返回运行结果字典
+
+    memory_limit（字节）不为空时在内存上限下运行，并单独标记因内存超限失败的运行（status 为 oom）。
+    placement 为 plan_placement 生成的 NUMA 放置方案，MPI 运行时还包含 mpirun 前缀（见 apply_mpi）。
+    """
     parent_path = os.path.dirname(current_dir)
     # 运行测试代码
-    input_file = os.path.join(parent_path, 'dataset', task_type, 'data.txt')
-    output_file = os.path.join(parent_path, 'driver', task_type, 'result.txt')
-    run_command = f"./{os.path.basename(os.path.join(temp_dir, 'main'))} {input_file} {output_file}"
-    start_time = time.time()
-
-    try:
-        run_result = subprocess.run(run_command, shell=True, capture_output=True, text=True, cwd=temp_dir, timeout=300)  # 设置超时时间为300秒（5分钟）
-        output = run_result.stdout
-        
-        # 提取BFS核心代码执行时间戳
-        phase_times = None
-        start_match = re.search(r'\[METRICS\] BFS_TIME_START=(\d+)', output)
-        end_match = re.search(r'\[METRICS\] BFS_TIME_END=(\d+)', output)
-        
-        if start_match and end_match:
-            # 提取并转换为秒级时间戳
-            phase_times = {
-                "bfs_start": int(start_match.group(1)) / 1000.0,
-                "bfs_end": int(end_match.group(1)) / 1000.0
-            }
-            print(f"核心代码时间窗口: {phase_times['bfs_start']} - {phase_times['bfs_end']} (持续时间: {(phase_times['bfs_end']-phase_times['bfs_start'])*1000:.1f}ms)")
-        else:
-            print("未检测到时间戳标记，将使用完整运行时间分析")
-            
-    except subprocess.TimeoutExpired:
+    input_file = os.path.join(parent_path, 'dataset', task_type, dataset)
+    # data.txt 对应 result.txt，其它数据集沿用 driver_all.py 的 result_<数据集> 命名
+    result_name = 'result.txt' if dataset == 'data.txt' else f'result_{dataset}'
+    output_file = os.path.join(parent_path, 'driver', task_type, result_name)
+    result = {"dataset": dataset, "status": None, "runtime_ms": None, "time_ms": None,
+              "verified": False, "stdout": "", "stderr": "", "report": None, "memory_limit": memory_limit,
+              "timeout": timeout}
+
+    # 开始监控；MPI 运行只汇总被测程序的各 rank，不含 mpirun 等启动器
+    monitor.start_monitoring(binary_path if placement is not None and placement.get("mpi") else None)
+    if placement is not None:
+        cpus = placement["cpus"]
+        result["numa_policy"] = placement["policy"]
+        if placement.get("mpi"):
+            result["mpi_ranks"] = placement["mpi"]["ranks"]
+            result["mpi_threads"] = placement["mpi"]["threads"]
+    run_result = launch([binary_path, input_file, output_file], temp_dir, timeout, memory_limit, limit_mode,
+                        on_start=monitor.attach, cpus=cpus,
+                        wrapper=placement["wrapper"] if placement else None,
+                        env=placement["env"] if placement else None)
+    result["runtime_ms"] = run_result["wall_ms"]
+    result["start_time"] = run_result["start_time"]
+    result["end_time"] = run_result["start_time"] + run_result["wall_ms"] / 1000.0
+    result["stdout"] = run_result["stdout"]
+    result["stderr"] = run_result["stderr"]
+    result["peak_rss_kb"] = run_result["peak_rss_kb"]
+    result["minor_faults"] = run_result["minor_faults"]
+    result["major_faults"] = run_result["major_faults"]
+
+    if run_result["timed_out"]:
         print("测试代码运行超时！")
-        log_content = f"{time.strftime('%Y-%m-%d %H:%M:%S')} - {framework} - {task_type} - 运行超时 - 运行时长: {int((time.time() - start_time) * 1000)}ms"
-        with open("log.txt", 'a') as log_file:
-            log_file.write(log_content + '\n')
         monitor.stop_monitoring()
-        shutil.rmtree(temp_dir)
-        return
-
-    end_time = time.time()
-    runtime = int((end_time - start_time) * 1000)  # 转换为毫秒
+        result["status"] = "timeout"
+        return result
+
+    parsed = parse_run_output(run_result["stdout"])
+    phase_times = parsed["phase_times"]
+    result["phase_times"] = phase_times
+    if phase_times:
+        print(f"核心代码时间窗口: {phase_times['bfs_start']} - {phase_times['bfs_end']} (持续时间: {(phase_times['bfs_end']-phase_times['bfs_start'])*1000:.1f}ms)")
+    else:
+        print("未检测到时间戳标记，将使用完整运行时间分析")
+    result["load"] = parsed["load"]
+    if parsed["load"]:
+        load = parsed["load"]
+        parse_ms = load['parse_ms'] if load['parse_ms'] is not None else (load['end'] - load['start']) * 1000
+        print(f"读取输入: {load['bytes'] / 1e6:.1f}MB, 解析 {parse_ms:.0f}ms "
+              f"({load['mb_per_s']:.1f} MB/s)")
 
     # 停止监控并生成报告
     monitor.stop_monitoring()
-    report = monitor.generate_report(task_type, phase_times)
+    result["report"] = monitor.generate_report(task_type, phase_times)
+    # 各阶段的能耗（RAPL 计数器为整机能耗，包含被测程序以外的负载）
+    result["energy"] = monitor.energy_report(harness_phases(result))
+    result["report"]["energy"] = result["energy"]
+    # 多进程运行的峰值内存取各 rank 峰值之和，ru_maxrss（最大的单个 rank）和启动器的峰值内存另外记录
+    if placement is not None and placement.get("mpi"):
+        total_peak_kb = monitor.total_peak_rss_kb()
+        if total_peak_kb is not None:
+            result["peak_rss_rank_kb"] = result["peak_rss_kb"]
+            result["peak_rss_kb"] = total_peak_kb
+        result["launcher_peak_rss_kb"] = monitor.launcher_peak_rss_kb()
+    if result["energy"]:
+        energy = result["energy"]
+        kernel = energy["phases"].get("kernel")
+        print(f"能耗: {energy['run']['joules']:.2f}J，平均功率 {energy['run']['avg_w'] or 0:.1f}W，"
+              f"EDP {energy['run']['edp_js']:.3f}J·s" +
+              (f"；核心代码 {kernel['joules']:.2f}J，EDP {kernel['edp_js']:.4f}J·s" if kernel else ""))
 
     # 检查运行结果
-    if run_result.returncode != 0:
+    if run_result["oom_killed"]:
+        print(f"测试代码超出内存上限 {memory_limit} 字节！")
+        print(run_result["stderr"])
+        result["status"] = "oom"
+    elif run_result["returncode"] != 0:
         print("测试代码运行失败！")
         print("错误信息：")
-        print(run_result.stderr)
-        log_content = f"{time.strftime('%Y-%m-%d %H:%M:%S')} - {framework} - {task_type} - 运行失败 - 运行时长: {runtime}ms"
+        print(run_result["stderr"])
+        result["status"] = "run_failed"
     else:
         print("测试代码运行成功！")
         print("输出结果：")
-        print(run_result.stdout)
-        # 提取运行时间和验证成功与否的信息
-        time_match = re.search(r"Time: (\d+)ms", run_result.stdout)
-        success_match = re.search(r"验证成功", run_result.stdout)
-        time_info = time_match.group(1) if time_match else "N/A"
-        success_info = "验证成功" if success_match else "验证失败"
-        log_content = f"{time.strftime('%Y-%m-%d %H:%M:%S')} - {framework} - {task_type} - 运行成功 - 运行时间: {time_info}ms - {success_info}"
-
-    with open("log.txt", 'a') as log_file:
-        log_file.write(log_content + '\n')
-        if monitor_mode:
-            # 追加监控数据
-            for key, value in report['metrics'].items():
-                log_file.write(f'  {key}: {value}\n')
-            
-            # 如果存在BFS时间窗口信息，也记录下来
-            if 'time_window' in report and report['time_window']:
-                log_file.write(f"  核心代码执行时段: {report['time_window']['duration_ms']}ms\n")
-
-    # 生成可视化报告
-    '''
-    if monitor_mode:
-        try:
-            generate_detailed_report(report, task_type, monitor)
-        except Exception as e:
-            print(f"生成报告时出错: {str(e)}")
-    '''
+        print(run_result["stdout"])
+        result["status"] = "success"
+        result["time_ms"] = parsed["time_ms"]
+        result["verified"] = parsed["verified"]
+    rank_peak = f"（各进程之和，单个进程最大 {result['peak_rss_rank_kb']}KB）" if result.get('peak_rss_rank_kb') else ""
+    if result.get('launcher_peak_rss_kb'):
+        rank_peak += f"，启动器另占 {result['launcher_peak_rss_kb']}KB"
+    print(f"峰值内存: {result['peak_rss_kb']}KB{rank_peak}，缺页: {result['minor_faults']} 次 (主缺页 {result['major_faults']} 次)")
+    return result
+
+def run_guarded(binary_path, task_type, current_dir, temp_dir, monitor, dataset, timeout,
+                memory_limit, limit_mode, env_policy='tag', isolate=False, numa_policy='none', mpi=None):
+    """在环境检查下运行完整数据集：记录运行前后的环境快照，受干扰的运行被标记或拒绝"""
+    cpus = None
+    if isolate:
+        cpusets = plan_cpusets()
+        if cpusets is None:
+            print("可用核心少于 3 个，无法隔离驱动、采样进程和被测程序")
+        else:
+            pin_driver(cpusets)
+            cpus = cpusets["benchmark"]
+            monitor.sampler_cpu = cpusets["sampler"]
+            print(f"被测程序固定在核心 {cpus}，驱动 {cpusets['driver']}，采样进程 {cpusets['sampler']}")
+
+    placement = plan_placement(numa_policy, cpus=cpus)
+    if placement["note"]:
+        print(placement["note"])
+    if mpi is not None:
+        placement = apply_mpi(placement, mpi)
+
+    if env_policy == 'off':
+        return run_candidate(binary_path, task_type, current_dir, temp_dir, monitor, dataset, timeout,
+                             memory_limit=memory_limit, limit_mode=limit_mode, placement=placement)
+
+    guard = EnvironmentGuard(placement["cpus"])
+    before = guard.snapshot()
+    result = run_candidate(binary_path, task_type, current_dir, temp_dir, monitor, dataset, timeout,
+                           memory_limit=memory_limit, limit_mode=limit_mode, placement=placement)
+    environment = guard.assess(before, guard.snapshot(check_competing=False))
+    result["environment"] = environment
+    if environment["noisy"]:
+        print(f"运行环境存在干扰: {'; '.join(environment['reasons'])}")
+        if env_policy == 'reject' and result["status"] == "success":
+            result["status"] = "noisy"
+    return result
+
+def stage_outcome(result):
+    """单个冒烟阶段的结果：passed / verify_failed / 失败状态"""
+    if result["status"] != "success":
+        return result["status"]
+    return "passed" if result["verified"] else "verify_failed"
+
+def run_smoke_stages(binary_path, task_type, current_dir, temp_dir, stages, memory_limit=None, limit_mode='rlimit',
+                     trace=None, mpi=None, framework=None):
+    """依次在生成的小输入上运行并验证，返回 (各阶段结果, 第一个失败阶段的运行结果或 None)
+
+    framework 用于按框架的历史运行时间计算超时。
+    """
+    outcomes = {}
+    placement = apply_mpi(plan_placement('none'), mpi) if mpi is not None else None
+    for stage in stages:
+        stage_dataset = ensure_stage_input(task_type, stage, os.path.dirname(current_dir))
+        if stage_dataset is None:
+            continue
+        print(f"冒烟测试阶段: {stage} ({stage_dataset})")
+        timeout, _ = compute_timeout(task_type, stage_dataset, framework, mpi["ranks"] if mpi else None, default=30)
+        stage_monitor = HardwareMonitor(track_children=mpi is not None)
+        stage_result = run_candidate(binary_path, task_type, current_dir, temp_dir, stage_monitor, stage_dataset,
+                                     timeout, memory_limit=memory_limit, limit_mode=limit_mode, placement=placement)
+        outcomes[stage] = stage_outcome(stage_result)
+        if trace is not None:
+            trace.add_run(f"smoke: {stage}", stage_result, stage_monitor)
+        if outcomes[stage] != "passed":
+            print(f"冒烟测试阶段 {stage} 未通过: {outcomes[stage]}，跳过后续阶段")
+            stage_result["failed_stage"] = stage
+            return outcomes, stage_result
+    return outcomes, None
+
+def format_log_line(framework, task_type, result):
+    """把运行结果格式化为 log.txt 中的一行"""
+    now = time.strftime('%Y-%m-%d %H:%M:%S')
+    status = result["status"]
+    if status == "compile_error":
+        return f"{now} - {framework} - {task_type} - 编译失败 - 运行时长: N/A"
+    if status == "timeout":
+        return f"{now} - {framework} - {task_type} - 运行超时 - 运行时长: {result['runtime_ms']}ms"
+    if status == "run_failed":
+        return f"{now} - {framework} - {task_type} - 运行失败 - 运行时长: {result['runtime_ms']}ms"
+    if status == "smoke_failed":
+        stage = result["failed_stage"]
+        return f"{now} - {framework} - {task_type} - 冒烟测试失败({stage}: {result['stages'][stage]}) - 运行时长: {result['runtime_ms']}ms"
+    if result.get("mpi_ranks"):
+        framework = f"{framework}({result['mpi_ranks']}x{result['mpi_threads']})"
+    if result.get("numa_policy", "none") != "none":
+        framework = f"{framework}[{result['numa_policy']}]"
+    noise = ""
+    if result.get("environment") and result["environment"]["noisy"]:
+        noise = f" - 环境干扰: {'; '.join(result['environment']['reasons'])}"
+    if status == "noisy":
+        return f"{now} - {framework} - {task_type} - 环境干扰已拒绝 - 运行时间: {result['time_ms']}ms{noise}"
+    if status == "oom":
+        return f"{now} - {framework} - {task_type} - 内存超限 - 运行时长: {result['runtime_ms']}ms - 峰值内存: {result['peak_rss_kb']}KB"
+    time_info = result["time_ms"] if result["time_ms"] is not None else "N/A"
+    success_info = "验证成功" if result["verified"] else "验证失败"
+    return f"{now} - {framework} - {task_type} - 运行成功 - 运行时间: {time_info}ms - {success_info} - 峰值内存: {result['peak_rss_kb']}KB{noise}"
+
+def extract_and_compile(metadata, current_dir, temp_dir, monitor_mode, log_file='log.txt', dataset='data.txt',
+                        profile='default', binary_cache=None, limit_mode='rlimit', timeout=None,
+                        smoke_stages=SMOKE_STAGES, env_policy='tag', isolate=False, trace_dir=None,
+                        numa_policy='none', mpi_ranks=None, mpi_threads=1, precompiled=None):
+    """编译并运行一个生成的任务，写入日志并返回运行结果
+
+    binary_cache 为目录时，若其中已有可执行文件则跳过编译，否则把编译结果缓存到该目录。
+    precompiled 为流水线编译阶段已得到的 (可执行文件路径, 编译错误信息)，不为空时不再编译。
+    内存上限取自 input.json 的 resources.cpu_memory，limit_mode 为 rlimit 或 cgroup。
+    timeout 为空时按 (任务, 数据集) 的参考或历史运行时间自适应计算。
+    smoke_stages 中的各级小输入全部验证通过后才运行完整数据集，传入空元组可关闭冒烟测试。
+    env_policy 为 off / tag / reject：记录运行环境并标记（或拒绝）受干扰的运行；
+    isolate 为 True 时把驱动、采样进程和被测程序分别固定在不同的核心上。
+    numa_policy 为 none / bind / interleave / spread，决定完整数据集运行的 NUMA 放置方式。
+    MPI 框架通过 mpirun/mpiexec 以 mpi_ranks 个进程 × mpi_threads 个线程在本机运行（默认 DEFAULT_RANKS 个进程）。
+    trace_dir 不为空时把编译、各阶段运行和硬件采样导出为 Chrome trace-event JSON（可用 Perfetto 打开）。
+    """
+    framework = metadata['framework']
+    task_type = metadata['task_type']
+    memory_limit = load_memory_limit(metadata, os.path.join(os.path.dirname(current_dir), 'generate', 'input.json'))
+    if framework == 'CUDA' and limit_mode == 'rlimit':
+        # CUDA 运行时会预留远超物理内存的虚拟地址空间，RLIMIT_AS 会导致初始化失败
+        memory_limit = None
+
+    mpi = None
+    if framework == 'MPI':
+        mpi = plan_mpi(mpi_ranks or DEFAULT_RANKS, mpi_threads)
+        if mpi is None:
+            print("未找到 mpirun/mpiexec，MPI 程序按单进程运行")
+        else:
+            print(f"MPI 布局: {mpi['ranks']} 个进程 × {mpi['threads']} 个线程")
+            if mpi["note"]:
+                print(mpi["note"])
+            if limit_mode == 'rlimit':
+                # RLIMIT_AS 只能逐进程限制，且 MPI 运行时同样会预留大量虚拟地址空间；需要总量限制时使用 cgroup
+                memory_limit = None
+
+    # 初始化硬件监控（MPI 运行时汇总所有 rank 进程）
+    monitor = HardwareMonitor(track_children=mpi is not None)
+    trace = TraceRecorder(f"{metadata.get('model') or ''} {task_type}/{framework}/{profile}/{dataset}".strip()) \
+        if trace_dir else None
+
+    cached_binary = os.path.join(binary_cache, 'main') if binary_cache else None
+    if precompiled is not None:
+        binary_path, compile_error = precompiled
+        if trace is not None:
+            trace.instant("precompiled", time.time(), {"path": binary_path, "ok": binary_path is not None})
+    elif cached_binary and os.path.exists(cached_binary):
+        print(f"使用已缓存的可执行文件: {cached_binary}")
+        binary_path, compile_error = cached_binary, None
+        if trace is not None:
+            trace.instant("binary cache hit", time.time(), {"path": cached_binary})
+    else:
+        compile_start = time.time()
+        binary_path, compile_error = compile_candidate(metadata, current_dir, temp_dir, profile)
+        if trace is not None:
+            trace.span("compile", compile_start, time.time(), args={"profile": profile, "ok": binary_path is not None})
+        if binary_path is not None and cached_binary:
+            os.makedirs(binary_cache, exist_ok=True)
+            shutil.copy2(binary_path, cached_binary)
+            binary_path = cached_binary
+
+    if binary_path is None:
+        result = {"dataset": dataset, "status": "compile_error", "runtime_ms": None, "time_ms": None,
+                  "verified": False, "stdout": "", "stderr": compile_error, "report": None,
+                  "memory_limit": memory_limit, "peak_rss_kb": None, "minor_faults": None, "major_faults": None}
+    else:
+        stages, failed = run_smoke_stages(binary_path, task_type, current_dir, temp_dir, smoke_stages,
+                                          memory_limit, limit_mode, trace, mpi, framework)
+        if failed is not None:
+            result = dict(failed, dataset=dataset, status="smoke_failed", time_ms=None, verified=False)
+        else:
+            if timeout is None:
+                timeout, source = compute_timeout(task_type, dataset, framework, mpi["ranks"] if mpi else None)
+                print(f"超时时间: {timeout:.0f}s (基准来源: {source})")
+            result = run_guarded(binary_path, task_type, current_dir, temp_dir, monitor, dataset, timeout,
+                                 memory_limit, limit_mode, env_policy, isolate, numa_policy, mpi)
+            if trace is not None:
+                trace.add_run("run", result, monitor)
+            # 按任务的工作量模型换算吞吐（数据集带有规模参数时）
+            result["work"] = work_summary(task_type, dataset, result["time_ms"], os.path.dirname(current_dir))
+            if result["work"] and result["work"].get("gb_per_s") is not None:
+                print(f"吞吐: {result['work']['gb_per_s']:.2f} GB/s, {result['work']['gops']:.2f} Gop/s "
+                      f"({result['work']['bound']})")
+            if stages:
+                stages["full"] = stage_outcome(result)
+        result["stages"] = stages
+
+    result["task_type"] = task_type
+    result["framework"] = framework
+    result["profile"] = profile
+    report = result["report"] if monitor_mode else None
+    write_log(log_file, format_log_line(framework, task_type, result), report)
+    append_history(result, metadata, monitor, current_dir)
+
+    if trace is not None:
+        trace_name = f"{task_type}_{framework}_{profile}_{os.path.splitext(dataset)[0]}_{time.strftime('%Y%m%d_%H%M%S')}.json"
+        print(f"trace 已保存到 {trace.save(os.path.join(trace_dir, trace_name))}")
+
     # 清理临时文件
-    shutil.rmtree(temp_dir)
-
-def generate_detailed_report(report: dict, task_name: str, monitor: HardwareMonitor):
-    """生成详细报告"""
-    if monitor.metrics_log:
-        # 绘制CPU使用率图
-        plt.figure(figsize=(10, 5))
-        timestamps = [float(m['timestamp'] - monitor.metrics_log[0]['timestamp']) for m in monitor.metrics_log]
-        plt.plot(timestamps, [float(m['cpu_usage']) for m in monitor.metrics_log], label='CPU Usage (%)')
-        
-        # 添加BFS时间窗口标记
-        if 'time_window' in report and report['time_window']:
-            start_rel = float(report['time_window']['start'] - monitor.metrics_log[0]['timestamp'])
-            end_rel = float(report['time_window']['end'] - monitor.metrics_log[0]['timestamp'])
-            plt.axvline(x=start_rel, color='r', linestyle='--', label='BFS Start')
-            plt.axvline(x=end_rel, color='g', linestyle='--', label='BFS End')
-            
-        plt.xlabel("Time (seconds)")
-        plt.ylabel("CPU Usage (%)")
-        plt.title(f"CPU Utilization - {task_name}")
-        plt.legend()
-        plt.tight_layout()
-        # plt.savefig(f"{task_name}_cpu_usage.png")
-        plt.close()
-
-        # 如果有GPU，绘制GPU使用率图
-        if report['hardware']['gpu_count'] > 0:
-            plt.figure(figsize=(10, 5))
-            gpu_data = [float(u['gpu_usage'][0]) if u['gpu_usage'] else 0.0 for u in monitor.metrics_log]
-            plt.plot(timestamps, gpu_data, label='GPU Usage (%)', color='orange')
-            
-            if 'time_window' in report and report['time_window']:
-                plt.axvline(x=start_rel, color='r', linestyle='--', label='BFS Start')
-                plt.axvline(x=end_rel, color='g', linestyle='--', label='BFS End')
-                
-            plt.xlabel("Time (seconds)")
-            plt.ylabel("GPU Usage (%)")
-            plt.title(f"GPU Utilization - {task_name}")
-            plt.legend()
-            plt.tight_layout()
-            # plt.savefig(f"{task_name}_gpu_usage.png")
-            plt.close()
-
-        # 保存JSON报告
-        try:
-            serializable_report = make_json_serializable(report)
-            with open(f"{task_name}_report.json", 'w') as f:
-                print()
-                #json.dump(serializable_report, f, indent=2)
-        except Exception as e:
-            print(f"保存JSON报告时出错: {str(e)}")
+    shutil.rmtree(temp_dir, ignore_errors=True)
+    return result
+
+def extract_and_compile_repeated(metadata, current_dir, monitor_mode, repeat=1, **options):
+    """同一任务重复测量 repeat 次，每次运行都写入历史记录（regression.py 的显著性检验需要多个样本）
+
+    首次运行负责编译和冒烟测试，之后复用同一个可执行文件只运行完整数据集；任一次未验证通过即停止。
+    返回首次运行的结果，附带各次的 times_ms，time_ms 取验证通过的各次的中位数。
+    """
+    binary_cache = options.pop('binary_cache', None)
+    own_cache = binary_cache is None and options.get('precompiled') is None and repeat > 1
+    if own_cache:
+        binary_cache = tempfile.mkdtemp()
+    try:
+        first = extract_and_compile(metadata, current_dir, tempfile.mkdtemp(), monitor_mode,
+                                    binary_cache=binary_cache, **options)
+        times = [first['time_ms']]
+        for _ in range(repeat - 1):
+            if first['status'] != 'success' or not first['verified'] or first['time_ms'] is None:
+                break
+            result = extract_and_compile(metadata, current_dir, tempfile.mkdtemp(), monitor_mode,
+                                         binary_cache=binary_cache, **dict(options, smoke_stages=()))
+            if result['status'] != 'success' or not result['verified'] or result['time_ms'] is None:
+                print(f"第 {len(times) + 1} 次重复测量未通过（{result['status']}），停止重复")
+                break
+            times.append(result['time_ms'])
+    finally:
+        if own_cache:
+            shutil.rmtree(binary_cache, ignore_errors=True)
+    if repeat > 1 and first['time_ms'] is not None:
+        first['times_ms'] = times
+        first['time_ms'] = statistics.median(times)
+        print(f"重复测量 {len(times)} 次，运行时间中位数: {first['time_ms']}ms")
+    return first
 
 def main():
-    # 检查是否有'm'参数
+    # 检查是否有'm'参数；监控模式下同时导出 trace；-r N 为每个任务的重复测量次数
     monitor_mode = '-m' in sys.argv
+    repeat = int(sys.argv[sys.argv.index('-r') + 1]) if '-r' in sys.argv else 1
 
     # 定义JSON文件路径
     json_file_path = 'output.json'
@@ -298,8 +627,8 @@ def main():
     # 处理每个任务
     for task in data['tasks']:
         metadata = task['metadata']
-        temp_dir = tempfile.mkdtemp()
-        extract_and_compile(metadata, current_dir, temp_dir, monitor_mode)
+        extract_and_compile_repeated(metadata, current_dir, monitor_mode, repeat,
+                                     trace_dir=os.path.join(current_dir, 'traces') if monitor_mode else None)
 
 if __name__ == "__main__":
     main()
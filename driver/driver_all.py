@@ -6,6 +6,7 @@ import shutil
 import time
 import re  # 导入正则表达式模块
 import glob  # 用于文件匹配
+from task_registry import install_harness
 
 def list_files_in_directory(directory):
     """列出指定目录中的所有文件和文件夹"""
@@ -53,6 +54,8 @@ def extract_and_compile(metadata, current_dir, temp_dir):
     # 复制整个f"{task_type}"文件夹到临时文件夹
     temp_test_folder_path = os.path.join(temp_dir, relative_test_folder_path)
     shutil.copytree(absolute_test_folder_path, temp_test_folder_path)
+    # 测试程序共用的 common/（输入读取库等）
+    install_harness(task_type, temp_dir)
 
     # 根据framework选择头文件包含
     include_line = f'#include "{header_file_name}"'
@@ -90,7 +93,7 @@ def extract_and_compile(metadata, current_dir, temp_dir):
         compile_command = f"nvcc -std=c++17 {main_cu_path} -o {os.path.join(temp_dir, 'main')} -I{temp_dir} -lcudart -DUSE_CUDA"
         print("nvcc CUDA编译")
     elif framework == 'MPI':
-        compile_command = f"mpicxx -std=c++17 {main_cpp_path} -o {os.path.join(temp_dir, 'main')} -I{temp_dir} -DUSE_MPI"
+        compile_command = f"mpicxx -std=c++17 {main_cpp_path} -o {os.path.join(temp_dir, 'main')} -I{temp_dir} -fopenmp -DUSE_MPI"
         print("mpicxx MPI编译")
     else:
         print("g++编译")
@@ -0,0 +1,138 @@
+import os
+import glob
+import time
+from sampler import default_sampler_cpu, CLK_TCK
+
+CPU_SYSFS = "/sys/devices/system/cpu"
+
+# 判定为干扰的阈值
+LOAD_PER_CPU_THRESHOLD = 0.5      # 运行前 1 分钟负载 / 核心数
+COMPETING_CPU_THRESHOLD = 10.0    # 其它进程的 CPU 占用百分比
+FREQ_DROP_THRESHOLD = 0.15        # 运行前后平均频率下降比例
+COMPETING_WINDOW = 0.1            # 统计其它进程 CPU 占用的时间窗口（秒）
+
+def read_text(path):
+    try:
+        with open(path, "r") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+def read_governors():
+    governors = {}
+    for path in glob.glob(f"{CPU_SYSFS}/cpu[0-9]*/cpufreq/scaling_governor"):
+        governors[int(path.split("/")[-3][3:])] = read_text(path)
+    return governors
+
+def read_frequencies_khz():
+    freqs = {}
+    for path in glob.glob(f"{CPU_SYSFS}/cpu[0-9]*/cpufreq/scaling_cur_freq"):
+        value = read_text(path)
+        if value:
+            freqs[int(path.split("/")[-3][3:])] = int(value)
+    return freqs
+
+def read_turbo():
+    """返回睿频是否开启，无法判断时返回 None"""
+    no_turbo = read_text(f"{CPU_SYSFS}/intel_pstate/no_turbo")
+    if no_turbo is not None:
+        return no_turbo == "0"
+    boost = read_text(f"{CPU_SYSFS}/cpufreq/boost")
+    if boost is not None:
+        return boost == "1"
+    return None
+
+def read_throttle_counts():
+    """所有核心的温控降频计数之和（core + package），不支持时返回 None"""
+    paths = glob.glob(f"{CPU_SYSFS}/cpu[0-9]*/thermal_throttle/*_throttle_count")
+    if not paths:
+        return None
+    return sum(int(read_text(p) or 0) for p in paths)
+
+def read_process_ticks(exclude):
+    """所有进程（排除 exclude）的 utime+stime jiffies"""
+    ticks = {}
+    for stat_path in glob.glob("/proc/[0-9]*/stat"):
+        pid = int(stat_path.split("/")[2])
+        if pid in exclude:
+            continue
+        stat = read_text(stat_path)
+        if not stat:
+            continue
+        fields = stat[stat.rindex(")") + 2:].split()
+        ticks[pid] = (stat[stat.index("(") + 1:stat.rindex(")")], int(fields[11]) + int(fields[12]))
+    return ticks
+
+def competing_processes(exclude, window=COMPETING_WINDOW, threshold=COMPETING_CPU_THRESHOLD):
+    """在 window 秒内 CPU 占用超过 threshold% 的其它进程"""
+    before = read_process_ticks(exclude)
+    time.sleep(window)
+    after = read_process_ticks(exclude)
+    busy = []
+    for pid, (name, ticks) in after.items():
+        if pid in before:
+            percent = (ticks - before[pid][1]) / CLK_TCK / window * 100
+            if percent >= threshold:
+                busy.append({"pid": pid, "name": name, "cpu_percent": round(percent, 1)})
+    return sorted(busy, key=lambda p: -p["cpu_percent"])
+
+def plan_cpusets():
+    """把可用核心划分给驱动、采样进程和被测程序；核心数不足 3 个时返回 None"""
+    cpus = sorted(os.sched_getaffinity(0))
+    if len(cpus) < 3:
+        return None
+    sampler = default_sampler_cpu()
+    driver = cpus[0]
+    return {"driver": driver, "sampler": sampler, "benchmark": [c for c in cpus if c not in (driver, sampler)]}
+
+def pin_driver(cpusets):
+    """把驱动进程固定到保留核心上"""
+    os.sched_setaffinity(0, {cpusets["driver"]})
+
+class EnvironmentGuard:
+    """记录运行前后的频率、调速器、温控和负载情况，并判断本次运行是否受到干扰"""
+
+    def __init__(self, cpus=None):
+        # cpus 为被测程序使用的核心，None 表示所有核心
+        self.cpus = cpus
+
+    def snapshot(self, exclude_pids=(), check_competing=True):
+        exclude = {os.getpid(), *exclude_pids}
+        # 驱动的子进程（采样进程、perf 等）不算干扰
+        children = read_text(f"/proc/{os.getpid()}/task/{os.getpid()}/children")
+        if children:
+            exclude.update(int(p) for p in children.split())
+        return {
+            "timestamp": time.time(),
+            "governors": read_governors(),
+            "frequencies_khz": read_frequencies_khz(),
+            "turbo": read_turbo(),
+            "throttle_count": read_throttle_counts(),
+            "loadavg": os.getloadavg(),
+            "competing": competing_processes(exclude) if check_competing else [],
+        }
+
+    def _mean_freq(self, snapshot):
+        freqs = snapshot["frequencies_khz"]
+        values = [f for cpu, f in freqs.items() if self.cpus is None or cpu in self.cpus]
+        return sum(values) / len(values) if values else None
+
+    def assess(self, before, after):
+        """比较运行前后的快照，返回 {"noisy", "reasons", "before", "after"}"""
+        reasons = []
+        governors = {g for cpu, g in before["governors"].items() if self.cpus is None or cpu in self.cpus}
+        if governors and governors != {"performance"}:
+            reasons.append(f"调速器为 {','.join(sorted(governors))}")
+        if before["throttle_count"] is not None and after["throttle_count"] is not None \
+                and after["throttle_count"] > before["throttle_count"]:
+            reasons.append(f"运行期间温控降频 {after['throttle_count'] - before['throttle_count']} 次")
+        num_cpus = len(self.cpus) if self.cpus else os.cpu_count()
+        if before["loadavg"][0] / num_cpus > LOAD_PER_CPU_THRESHOLD:
+            reasons.append(f"运行前负载 {before['loadavg'][0]:.2f}")
+        if before["competing"]:
+            names = ", ".join(f"{p['name']}({p['cpu_percent']}%)" for p in before["competing"][:3])
+            reasons.append(f"存在竞争进程 {names}")
+        freq_before, freq_after = self._mean_freq(before), self._mean_freq(after)
+        if freq_before and freq_after and (freq_before - freq_after) / freq_before > FREQ_DROP_THRESHOLD:
+            reasons.append(f"平均频率由 {freq_before / 1000:.0f}MHz 降至 {freq_after / 1000:.0f}MHz")
+        return {"noisy": bool(reasons), "reasons": reasons, "cpus": self.cpus, "before": before, "after": after}
@@ -0,0 +1,34 @@
+from collections import deque
+import numpy as np
+
+def generate(params, rng):
+    """有向边：先连一条链保证顶点编号连续且从 1 出发大部分可达，再补随机边"""
+    num_vertices, num_edges = params["vertices"], params["edges"]
+    chain = np.arange(num_vertices - 1)
+    src = np.concatenate([chain, rng.integers(0, num_vertices, size=num_edges - len(chain))])
+    dst = np.concatenate([chain + 1, rng.integers(0, num_vertices, size=num_edges - len(chain))])
+    return {"vertices": num_vertices, "src": src, "dst": dst}
+
+def format_input(graph):
+    """边列表 "u v" """
+    return "".join(f"{u} {v}\n" for u, v in zip(graph["src"].tolist(), graph["dst"].tolist()))
+
+def oracle(graph):
+    """从顶点 1 出发的层数，未到达为 -1
+
+    测试程序把结果数组初始化为 numVertices + 1 个 -1，因此参考结果也多一项。
+    """
+    num_vertices = graph["vertices"]
+    adjacency = [[] for _ in range(num_vertices)]
+    for u, v in zip(graph["src"].tolist(), graph["dst"].tolist()):
+        adjacency[u].append(v)
+    levels = [-1] * (num_vertices + 1)
+    levels[1] = 0
+    frontier = deque([1])
+    while frontier:
+        u = frontier.popleft()
+        for v in adjacency[u]:
+            if levels[v] == -1:
+                levels[v] = levels[u] + 1
+                frontier.append(v)
+    return "".join(f"{d}\n" for d in levels)
@@ -9,50 +9,23 @@
 #include <numeric>
 #include <ctime>
 #include <iomanip>
+#include "common/harness.h"
 
 std::vector<int> loadFileToVector(const std::string& filename) {
-    std::vector<int> result;
-    std::ifstream file(filename);
-    if (!file.is_open()) {
-        std::cerr << "无法打开文件: " << filename << std::endl;
-        return result;
-    }
-    std::string line;
-    while (std::getline(file, line)) {
-        std::istringstream iss(line);
-        int num;
-        while (iss >> num) {
-            result.push_back(num);
-        }
-    }
-    file.close();
-    return result;
+    return harness::load_values<int>(filename);
 }
 
+// 输入为每行一条边 "u v"，一次解析全部顶点编号后按计数排序构建 CSR（同一顶点的邻居保持文件中的顺序）
 Graph loadGraphFromFile(const std::string& filename) {
-    std::ifstream file(filename);
+    std::vector<int> pairs = harness::load_values<int>(filename);
     Graph graph;
 
-    if (!file.is_open()) {
-        std::cerr << "无法打开文件: " << filename << std::endl;
-        return {0, 0, nullptr, nullptr};
-    }
-
-    // 第一次遍历文件，计算顶点数和边数
+    // 计算顶点数和边数
+    int numEdges = static_cast<int>(pairs.size() / 2);
     int maxVertex = 0;
-    int numEdges = 0;
-    std::string line;
-    while (std::getline(file, line)) {
-        std::istringstream iss(line);
-        int u, v;
-        if (iss >> u >> v) {
-            maxVertex = std::max({maxVertex, u, v});
-            numEdges++;
-        }
+    for (int i = 0; i < 2 * numEdges; ++i) {
+        maxVertex = std::max(maxVertex, pairs[i]);
     }
-    file.close();
-
-    // 计算顶点数
     graph.numVertices = maxVertex + 1;
     graph.numEdges = numEdges;
 
@@ -60,33 +33,17 @@ Graph loadGraphFromFile(const std::string& filename) {
     graph.offset = new int[graph.numVertices + 1]();
     graph.edges = new int[graph.numEdges];
 
-    // 第二次遍历文件，计算偏移数组
-    file.open(filename);
-    while (std::getline(file, line)) {
-        std::istringstream iss(line);
-        int u, v;
-        if (iss >> u >> v) {
-            graph.offset[u + 1]++;
-        }
+    // 计算偏移数组和前缀和
+    for (int i = 0; i < numEdges; ++i) {
+        graph.offset[pairs[2 * i] + 1]++;
     }
-    file.close();
-
-    // 计算前缀和
     std::partial_sum(graph.offset, graph.offset + graph.numVertices + 1, graph.offset);
 
-    // 第三次遍历文件，填充边数组
-    std::vector<int> edgeIndex(graph.numVertices + 1, 0);
-    file.open(filename);
-    while (std::getline(file, line)) {
-        std::istringstream iss(line);
-        int u, v;
-        if (iss >> u >> v) {
-            int idx = graph.offset[u] + edgeIndex[u];
-            graph.edges[idx] = v;
-            edgeIndex[u]++;
-        }
+    // 填充边数组
+    std::vector<int> edgeIndex(graph.offset, graph.offset + graph.numVertices);
+    for (int i = 0; i < numEdges; ++i) {
+        graph.edges[edgeIndex[pairs[2 * i]]++] = pairs[2 * i + 1];
     }
-    file.close();
 
     return graph;
 }
@@ -120,32 +77,26 @@ int main(int argc, char* argv[]) {
         return 1;
     }
 
+    harness::init(argc, argv);
     std::string input_file = argv[1];
     std::string result_file = argv[2];
     Graph graph = loadGraphFromFile(input_file);
 
+    bool verified = false;
     if (graph.numVertices > 0) {
         int bfs_start_vertex = 1;
         std::cout << "BFS starting from vertex " << bfs_start_vertex << ":\n";
         std::vector<int> bfs_result(graph.numVertices + 1, -1); // 初始化为 -1，表示未访问
         std::vector<int> result = loadFileToVector(result_file);
 
-        // 记录BFS开始时间戳并写入标准输出
-        auto time_start = std::chrono::high_resolution_clock::now();
-        auto start_ms = std::chrono::duration_cast<std::chrono::milliseconds>(
-            time_start.time_since_epoch()
-        ).count();
-        std::cout << "[METRICS] BFS_TIME_START=" << start_ms << std::endl << std::flush;
+        // 输出读取阶段的统计和 BFS 的起止时间戳（见 common/harness.h）
+        harness::KernelTimer timer("BFS");
+        timer.start();
 
         // 执行BFS算法
         bfs(graph, bfs_start_vertex, bfs_result);
 
-        // 记录BFS结束时间戳并写入标准输出
-        auto time_end = std::chrono::high_resolution_clock::now();
-        auto end_ms = std::chrono::duration_cast<std::chrono::milliseconds>(
-            time_end.time_since_epoch()
-        ).count();
-        std::cout << "[METRICS] BFS_TIME_END=" << end_ms << std::endl << std::flush;
+        timer.stop();
 
         // 生成带时间戳的文件名
         std::string timestamped_result_file = generateTimestampedFilename(
@@ -153,22 +104,16 @@ int main(int argc, char* argv[]) {
             "bfs_result" // 基础文件名
         );
 
-        // 保存 BFS 结果到带时间戳的文件
-        saveBfsResultToFile(bfs_result, timestamped_result_file);
+        // 保存 BFS 结果到带时间戳的文件（冒烟测试阶段不保存）
+        if (harness::rank() == 0 && !harness::is_smoke_result(result_file))
+            saveBfsResultToFile(bfs_result, timestamped_result_file);
 
         // 清理内存
         delete[] graph.offset;
         delete[] graph.edges;
 
-        std::cout << "Time: " 
-                  << std::chrono::duration_cast<std::chrono::milliseconds>(time_end - time_start).count()
-                  << "ms\n";
-        
-        if (result == bfs_result)
-            std::cout << "验证成功" << std::endl;
-        else
-            std::cout << "验证失败" << std::endl;
+        verified = result == bfs_result;
         // std::cout << "BFS 结果已保存到文件: " << timestamped_result_file << std::endl;
     }
-    return 0;
+    return harness::finish(verified);
 }
\ No newline at end of file
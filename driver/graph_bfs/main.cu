@@ -9,50 +9,23 @@
 #include <numeric>
 #include <ctime>
 #include <iomanip>
+#include "common/loader.h"
 
 std::vector<int> loadFileToVector(const std::string& filename) {
-    std::vector<int> result;
-    std::ifstream file(filename);
-    if (!file.is_open()) {
-        std::cerr << "无法打开文件: " << filename << std::endl;
-        return result;
-    }
-    std::string line;
-    while (std::getline(file, line)) {
-        std::istringstream iss(line);
-        int num;
-        while (iss >> num) {
-            result.push_back(num);
-        }
-    }
-    file.close();
-    return result;
+    return harness::load_values<int>(filename);
 }
 
+// 输入为每行一条边 "u v"，一次解析全部顶点编号后按计数排序构建 CSR（同一顶点的邻居保持文件中的顺序）
 CUDAGraph loadGraphFromFile(const std::string& filename) {
-    std::ifstream file(filename);
+    std::vector<int> pairs = harness::load_values<int>(filename);
     CUDAGraph graph;
 
-    if (!file.is_open()) {
-        std::cerr << "无法打开文件: " << filename << std::endl;
-        return {0, 0, nullptr, nullptr};
-    }
-
-    // 第一次遍历文件，计算顶点数和边数
+    // 计算顶点数和边数
+    int numEdges = static_cast<int>(pairs.size() / 2);
     int maxVertex = 0;
-    int numEdges = 0;
-    std::string line;
-    while (std::getline(file, line)) {
-        std::istringstream iss(line);
-        int u, v;
-        if (iss >> u >> v) {
-            maxVertex = std::max({maxVertex, u, v});
-            numEdges++;
-        }
+    for (int i = 0; i < 2 * numEdges; ++i) {
+        maxVertex = std::max(maxVertex, pairs[i]);
     }
-    file.close();
-
-    // 计算顶点数
     graph.numVertices = maxVertex + 1;
     graph.numEdges = numEdges;
 
@@ -60,33 +33,17 @@ CUDAGraph loadGraphFromFile(const std::string& filename) {
     graph.offset = new int[graph.numVertices + 1]();
     graph.edges = new int[graph.numEdges];
 
-    // 第二次遍历文件，计算偏移数组
-    file.open(filename);
-    while (std::getline(file, line)) {
-        std::istringstream iss(line);
-        int u, v;
-        if (iss >> u >> v) {
-            graph.offset[u + 1]++;
-        }
+    // 计算偏移数组和前缀和
+    for (int i = 0; i < numEdges; ++i) {
+        graph.offset[pairs[2 * i] + 1]++;
     }
-    file.close();
-
-    // 计算前缀和
     std::partial_sum(graph.offset, graph.offset + graph.numVertices + 1, graph.offset);
 
-    // 第三次遍历文件，填充边数组
-    std::vector<int> edgeIndex(graph.numVertices + 1, 0);
-    file.open(filename);
-    while (std::getline(file, line)) {
-        std::istringstream iss(line);
-        int u, v;
-        if (iss >> u >> v) {
-            int idx = graph.offset[u] + edgeIndex[u];
-            graph.edges[idx] = v;
-            edgeIndex[u]++;
-        }
+    // 填充边数组
+    std::vector<int> edgeIndex(graph.offset, graph.offset + graph.numVertices);
+    for (int i = 0; i < numEdges; ++i) {
+        graph.edges[edgeIndex[pairs[2 * i]]++] = pairs[2 * i + 1];
     }
-    file.close();
 
     return graph;
 }
@@ -130,7 +87,8 @@ int main(int argc, char* argv[]) {
         std::vector<int> bfs_result(graph.numVertices + 1, -1); // 初始化为 -1，表示未访问
         std::vector<int> result = loadFileToVector(result_file);
 
-        // 记录BFS开始时间戳并写入标准输出
+        // 输出读取阶段的统计，记录BFS开始时间戳并写入标准输出
+        harness::report_load();
         auto time_start = std::chrono::high_resolution_clock::now();
         auto start_ms = std::chrono::duration_cast<std::chrono::milliseconds>(
             time_start.time_since_epoch()
@@ -7,19 +7,43 @@ import time
 import subprocess
 import os
 import re
+from sampler import ProcessSampler
+from numa_placement import list_nodes
+from rapl import RaplSampler, summarize_energy
+
+PERF_INTERVAL_MS = 100
+PERF_EVENTS = {"L1-dcache-load-misses": "L1_miss", "LLC-load-misses": "LLC_miss", "instructions": "instructions"}
 
 class HardwareMonitor:
-    def __init__(self):
+    def __init__(self, sampler: str = "process", track_children: bool = False, energy_root: Optional[str] = None):
+        # sampler="process"：在独立进程中自适应采样被测程序；"thread"：旧的驱动进程内 100ms 采样线程
+        # track_children：把被测进程的所有后代（MPI 各 rank）汇总为一个样本
+        # energy_root：powercap 目录（默认 /sys/class/powercap 或环境变量 RAPL_SYSFS_ROOT），测试时可指向伪造目录
+        self.sampler_mode = sampler
+        # 采样进程固定的核心，只在隔离运行时由 run_guarded 设置，其余情况不固定
+        self.sampler_cpu = None
+        self.track_children = track_children
+        self.sampler = None
+        self.sampler_overhead = None
         self.process = psutil.Process()
         self.pid = self.process.pid
         self.cpu_cores = psutil.cpu_count(logical=False)
         self.cpu_threads = psutil.cpu_count(logical=True)
         self.mem_total = psutil.virtual_memory().total
+        # 多 NUMA 节点主机上额外采样每个节点的内存占用，单节点主机不采样
+        self.numa_nodes = len(list_nodes())
         
         # 缓存性能监控初始化
         self.perf_available = self._check_perf_availability()
         self.perf_process = None
         self.cache_metrics = {"L1_miss": 0, "LLC_miss": 0, "instructions": 0}
+        # perf stat -I 的区间计数：[{"timestamp", "event", "count"}]
+        self.perf_intervals = []
+        self.perf_start_time = None
+
+        # RAPL 能耗计数器，不可读（非 Intel/AMD、虚拟机、没有权限）时为 None，报告中不含能耗
+        rapl = RaplSampler(energy_root)
+        self.rapl = rapl if rapl.available else None
         
         # GPU 相关初始化
         self.gpu_count = 0
@@ -52,20 +76,43 @@ class HardwareMonitor:
         except (FileNotFoundError, PermissionError):
             return False
     
-    def start_monitoring(self):
-        """开始监控硬件资源使用情况"""
+    def start_monitoring(self, rank_exe: Optional[str] = None):
+        """开始监控硬件资源使用情况
+
+        process 模式下先启动采样进程，等 attach() 传入被测程序 pid 后才开始采样。
+        track_children 时 rank_exe 为被测程序路径，只汇总该程序的进程（不含 mpirun 等启动器）。
+        """
+        if self.rapl is not None:
+            self.rapl.start()
+        if self.sampler_mode == "process":
+            self.sampler = ProcessSampler(num_gpus=self.gpu_count, cpu=self.sampler_cpu,
+                                          num_nodes=self.numa_nodes if self.numa_nodes > 1 else 0,
+                                          track_children=self.track_children, rank_exe=rank_exe)
+            self.sampler.start()
+            return
+
         self._stop_event.clear()
         self._monitoring_thread = Thread(target=self._monitor_loop)
         self._monitoring_thread.start()
-        
-        # 如果perf可用，启动perf统计
+        self._start_perf(self.pid)
+
+    def attach(self, pid: int):
+        """被测程序启动后调用：采样进程和 perf 都改为跟踪该进程"""
+        if self.sampler is not None:
+            self.sampler.attach(pid)
+            self._start_perf(pid)
+
+    def _start_perf(self, pid: int):
+        # 如果perf可用，启动perf统计（每 PERF_INTERVAL_MS 输出一次 CSV 格式的区间计数）
         if self.perf_available:
             try:
                 cmd = [
                     "perf", "stat", "-e", 
                     "L1-dcache-load-misses,LLC-load-misses,instructions",
-                    "-p", str(self.pid)
+                    "-I", str(PERF_INTERVAL_MS), "-x", ",",
+                    "-p", str(pid)
                 ]
+                self.perf_start_time = time.time()
                 self.perf_process = subprocess.Popen(
                     cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
                 )
@@ -75,6 +122,16 @@ class HardwareMonitor:
         
     def stop_monitoring(self):
         """停止监控"""
+        if self.rapl is not None:
+            self.rapl.stop()
+
+        if self.sampler is not None:
+            self.sampler.stop()
+            self._append_samples(self.sampler.poll())
+            self.sampler_overhead = self.sampler.overhead()
+            self.sampler.close()
+            self.sampler = None
+
         if self._monitoring_thread is not None:
             self._stop_event.set()
             self._monitoring_thread.join()
@@ -97,11 +154,14 @@ class HardwareMonitor:
                 "cpu_cores": self.cpu_cores,
                 "cpu_threads": self.cpu_threads,
                 "memory_total": self.mem_total,
-                "gpu_count": self.gpu_count
+                "gpu_count": self.gpu_count,
+                "numa_nodes": self.numa_nodes,
+                "rapl_domains": [d["name"] for d in self.rapl.domains] if self.rapl is not None else []
             },
             "metrics": self._calculate_metrics(phase_times),
             "task_type": task_type,
-            "cache_metrics": self.cache_metrics
+            "cache_metrics": self.cache_metrics,
+            "sampler_overhead": self.sampler_overhead
         }
         
         if phase_times:
@@ -113,6 +173,62 @@ class HardwareMonitor:
             
         return report
 
+    def total_peak_rss_kb(self) -> Optional[int]:
+        """被测进程树中各进程峰值驻留内存（VmHWM）之和，只有 process 采样器记录；没有样本时返回 None
+
+        wait4 的 ru_maxrss 只是单个进程（MPI 时为最大的一个 rank）的峰值，多进程运行以此为准。
+        """
+        values = [m["hwm_kb"] for m in self.metrics_log if m.get("hwm_kb")]
+        return int(max(values)) if values else None
+
+    def launcher_peak_rss_kb(self) -> Optional[int]:
+        """mpirun、orted 等启动器进程峰值驻留内存之和（不计入被测程序），没有记录时返回 None"""
+        values = [m["launcher_hwm_kb"] for m in self.metrics_log if m.get("launcher_hwm_kb")]
+        return int(max(values)) if values else None
+
+    def energy_report(self, phases: List) -> Optional[Dict]:
+        """按阶段 [(名称, 开始, 结束)] 积分的能耗、平均功率和 EDP，RAPL 不可用时返回 None"""
+        if self.rapl is None:
+            return None
+        return summarize_energy(self.rapl, phases)
+
+    def _append_samples(self, samples: List[Dict]):
+        """把采样进程的原始样本转换为与采样线程相同格式的 metrics_log 记录"""
+        for sample in samples:
+            per_core = sample["cpu_per_core"]
+            metrics = {
+                "timestamp": sample["timestamp"],
+                "cpu_usage": float(np.mean(per_core)) if per_core else 0.0,
+                "cpu_per_core": per_core,
+                "memory_usage": sample["rss_kb"] * 1024 / self.mem_total * 100,
+                "rss_kb": sample["rss_kb"],
+                "hwm_kb": sample["hwm_kb"],
+                "launcher_hwm_kb": sample["launcher_hwm_kb"],
+                "cpu_time": sample["utime"] + sample["stime"],
+                "num_threads": int(sample["num_threads"]),
+                "num_procs": int(sample["num_procs"]),
+                "numa_node_kb": sample["numa_node_kb"],
+                "gpu_usage": sample["gpu_usage"],
+                "gpu_memory": [{"percent": p} for p in sample["gpu_memory_percent"]],
+                "ctx_switches": {
+                    "voluntary": int(sample["ctx_voluntary"]),
+                    "involuntary": int(sample["ctx_involuntary"]),
+                },
+                "cpu_load_balance": {
+                    "std_dev": float(np.std(per_core)) if per_core else 0.0,
+                    "max_diff": max(per_core) - min(per_core) if per_core else 0
+                },
+            }
+            if self.metrics_log:
+                last_metric = self.metrics_log[-1]
+                time_diff = metrics["timestamp"] - last_metric["timestamp"]
+                if time_diff > 0:
+                    metrics["ctx_switches"]["vol_rate_per_sec"] = (
+                        metrics["ctx_switches"]["voluntary"] - last_metric["ctx_switches"]["voluntary"]) / time_diff
+                    metrics["ctx_switches"]["invol_rate_per_sec"] = (
+                        metrics["ctx_switches"]["involuntary"] - last_metric["ctx_switches"]["involuntary"]) / time_diff
+            self.metrics_log.append(metrics)
+
     def _monitor_loop(self):
         """监控循环"""
         while not self._stop_event.is_set():
@@ -199,6 +315,21 @@ class HardwareMonitor:
         """解析perf工具输出，提取缓存性能指标"""
         if not perf_output:
             return
+
+        # 区间模式：每行 "相对时间,计数,单位,事件,..."，总数为各区间之和
+        for line in perf_output.splitlines():
+            fields = line.strip().split(',')
+            if len(fields) < 4 or fields[3] not in PERF_EVENTS:
+                continue
+            try:
+                offset, count = float(fields[0]), int(fields[1])
+            except ValueError:
+                continue  # <not counted> / <not supported>
+            self.perf_intervals.append({"timestamp": self.perf_start_time + offset, "event": fields[3], "count": count})
+            self.cache_metrics[PERF_EVENTS[fields[3]]] += count
+        if self.perf_intervals:
+            self._calculate_cache_ratios()
+            return
         
         # 匹配L1 缓存未命中
         l1_match = re.search(r'([\d,]+)\s+L1-dcache-load-misses', perf_output)
@@ -214,7 +345,9 @@ class HardwareMonitor:
         instr_match = re.search(r'([\d,]+)\s+instructions', perf_output)
         if instr_match:
             self.cache_metrics["instructions"] = int(instr_match.group(1).replace(',', ''))
-            
+        self._calculate_cache_ratios()
+
+    def _calculate_cache_ratios(self):
         # 计算缓存命中率（如果有指令数据）
         if self.cache_metrics["instructions"] > 0:
             # 估算L1缓存命中率（近似值）
@@ -278,6 +411,20 @@ class HardwareMonitor:
                 if invol_rates:
                     metrics["ctx_switch_involuntary_per_sec"] = np.mean(invol_rates)
             
+            # 多进程运行时的进程数和所有进程的峰值驻留内存之和
+            if self.track_children and "num_procs" in window_metrics[0]:
+                metrics["max_processes"] = max(m["num_procs"] for m in window_metrics)
+                metrics["max_total_rss_mb"] = max(m["rss_kb"] for m in window_metrics) / 1024
+                if "hwm_kb" in window_metrics[0]:
+                    metrics["sum_peak_rss_mb"] = max(m["hwm_kb"] for m in window_metrics) / 1024
+                if window_metrics[0].get("launcher_hwm_kb") is not None:
+                    metrics["launcher_peak_rss_mb"] = max(m["launcher_hwm_kb"] for m in window_metrics) / 1024
+
+            # 每个 NUMA 节点上的峰值驻留内存
+            node_kb = [m["numa_node_kb"] for m in window_metrics if m.get("numa_node_kb")]
+            for node, values in enumerate(zip(*node_kb)):
+                metrics[f"numa_node{node}_peak_mb"] = max(values) / 1024
+
             # 内存使用率
             metrics["avg_memory_usage"] = np.mean([m["memory_usage"] for m in window_metrics])
             metrics["max_memory_usage"] = np.max([m["memory_usage"] for m in window_metrics])
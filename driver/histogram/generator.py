@@ -0,0 +1,15 @@
+import numpy as np
+
+def generate(params, rng):
+    """偏斜分布（几何分布截断），热点桶上的写冲突更接近真实数据"""
+    bins = params["bins"]
+    values = np.minimum(rng.geometric(4.0 / bins, size=params["n"]) - 1, bins - 1)
+    return {"bins": bins, "values": values.astype(np.int64)}
+
+def format_input(data):
+    """首行为元素个数和桶数，第二行为空格分隔的值"""
+    return f"{len(data['values'])} {data['bins']}\n" + " ".join(map(str, data["values"].tolist())) + "\n"
+
+def oracle(data):
+    counts = np.bincount(data["values"], minlength=data["bins"])
+    return "\n".join(map(str, counts.tolist())) + "\n"
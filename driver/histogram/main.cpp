@@ -0,0 +1,25 @@
+#include "histogram.h"
+#include "common/harness.h"
+
+int main(int argc, char* argv[]) {
+    harness::init(argc, argv);
+    if (argc != 3) {
+        std::cerr << "用法: " << argv[0] << " <输入文件> <结果文件>" << std::endl;
+        return 1;
+    }
+
+    harness::TextReader in = harness::open_input(argv[1]);
+    size_t n = 0;
+    int num_bins = 0;
+    in >> n >> num_bins;
+    std::vector<int> values = harness::read_rest<int>(in, n);
+    std::vector<long long> expected = harness::read_file<long long>(argv[2]);
+    std::vector<long long> counts(num_bins, 0);
+
+    harness::KernelTimer timer("HISTOGRAM");
+    timer.start();
+    histogram(values, num_bins, counts);
+    timer.stop();
+
+    return harness::finish(counts == expected);
+}
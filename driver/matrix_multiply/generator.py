@@ -0,0 +1,19 @@
+import numpy as np
+
+def generate(params, rng):
+    """稀疏 0/1 对称矩阵，A 对称时 A·Aᵀ 与 Aᵀ·A 相同"""
+    n = params["n"]
+    upper = np.triu(rng.random((n, n)) < 0.1)
+    return (upper | upper.T).astype(np.int64)
+
+def format_input(matrix):
+    """与数据集一样：首行为行数和列数，之后每行 "行 列 值" """
+    rows, cols = np.nonzero(matrix)
+    n = matrix.shape[0]
+    return f"{n} {n}\n" + "".join(f"{i}\t{j}\t1\n" for i, j in zip(rows.tolist(), cols.tolist()))
+
+def oracle(matrix):
+    product = matrix @ matrix.T
+    rows, cols = np.nonzero(product)
+    # 与 save_matrix 一致：按行优先输出非零元素
+    return "".join(f"{i} {j} {product[i, j]}\n" for i, j in zip(rows.tolist(), cols.tolist()))
@@ -6,22 +6,21 @@
 #include <string>
 #include <ctime>
 #include <filesystem>
+#include "common/harness.h"
 
+// 输入为 "rows cols" 加三元组形式的非零元素，mmap + from_chars 解析（见 common/loader.h）
 Matrix load_matrix(const std::string& filename) {
-    std::ifstream file(filename);
-    if (!file.is_open()) {
-        std::cerr << "Failed to open file: " << filename << std::endl;
-        exit(1);
-    }
+    harness::TextReader file(filename);
 
-    int rows, cols;
+    int rows = 0, cols = 0;
     file >> rows >> cols; // 读取矩阵的行数和列数
     //std::cout << "Matrix size: " << rows << " x " << cols << std::endl;
     Matrix matrix(rows, std::vector<int>(cols, 0)); // 初始化为全零矩阵
 
     // 读取三元组形式的非零元素
-    int i, j, value;
-    while (file >> i >> j >> value) {
+    std::vector<int> triples = file.rest<int>();
+    for (size_t k = 0; k + 2 < triples.size(); k += 3) {
+        int i = triples[k], j = triples[k + 1], value = triples[k + 2];
         if (i >= 0 && i < rows && j >= 0 && j < cols) {
             matrix[i][j] = value;
         } else {
@@ -157,6 +156,7 @@ int main(int argc, char* argv[]) {
         return 1;
     }
 
+    harness::init(argc, argv);
     std::string input_file = argv[1];
     std::string output_file = argv[2];
 
@@ -167,40 +167,26 @@ int main(int argc, char* argv[]) {
     for (auto& row : result) {
         std::fill(row.begin(), row.end(), 0);
     }
-    // 记录BFS开始时间戳并写入标准输出
-    auto time_start = std::chrono::high_resolution_clock::now();
-    auto start_ms = std::chrono::duration_cast<std::chrono::milliseconds>(
-        time_start.time_since_epoch()
-    ).count();
-    std::cout << "[METRICS] MATRIX_TIME_START=" << start_ms << std::endl << std::flush;
-
-    // 执行BFS算法
-    matrix_multiply(A, result); // 统一函数调用
+    // 输出读取阶段的统计和核心代码的起止时间戳（见 common/harness.h）
+    harness::KernelTimer timer("MATRIX");
+    timer.start();
 
-    // 记录BFS结束时间戳并写入标准输出
-    auto time_end = std::chrono::high_resolution_clock::now();
-    auto end_ms = std::chrono::duration_cast<std::chrono::milliseconds>(
-        time_end.time_since_epoch()
-    ).count();
-    std::cout << "[METRICS] MATRIX_TIME_END=" << end_ms << std::endl << std::flush;
+    matrix_multiply(A, result); // 统一函数调用
 
-    // 输出耗时和验证结果
-    std::cout << "Time: " 
-            << std::chrono::duration_cast<std::chrono::milliseconds>(time_end - time_start).count()
-            << "ms\n";
+    timer.stop();
 
     // 生成包含时间戳的文件名
     std::string combined_file = generate_filename_with_timestamp(output_file);
-    save_matrix(result,combined_file);
+    if (harness::rank() == 0)
+        save_matrix(result,combined_file);
 
     // 保存输入文件和输出文件的内容到新文件
     //save_combined_file(input_file, combined_file, combined_file);
 
     //std::cout << "Combined file saved as: " << combined_file << std::endl;
-    bool c_result = compare_text_files(combined_file, output_file);
-    if(c_result)
-       std::cout<<"验证成功"<<std::endl;
-    else
-        std::cout<<"验证失败"<<std::endl;
-    return 0;
+    bool c_result = harness::rank() != 0 || compare_text_files(combined_file, output_file);
+    // 冒烟测试阶段的结果副本只用于比较，比较后删除
+    if (harness::rank() == 0 && harness::is_smoke_result(output_file))
+        std::filesystem::remove(combined_file);
+    return harness::finish(c_result);
 }
\ No newline at end of file
@@ -6,16 +6,14 @@
 #include <string>
 #include <ctime>
 #include <filesystem>
+#include "common/loader.h"
 
 // CUDA版本使用一维数组表示矩阵，这里需要加载为一维形式
+// 输入为 "rows cols" 加三元组形式的非零元素，mmap + from_chars 解析（见 common/loader.h）
 Matrix load_matrix(const std::string& filename, int& N, int& M) {
-    std::ifstream file(filename);
-    if (!file.is_open()) {
-        std::cerr << "Failed to open file: " << filename << std::endl;
-        exit(1);
-    }
+    harness::TextReader file(filename);
 
-    int rows, cols;
+    int rows = 0, cols = 0;
     file >> rows >> cols; // 读取矩阵的行数和列数
     N = rows;
     M = cols;
@@ -24,8 +22,9 @@ Matrix load_matrix(const std::string& filename, int& N, int& M) {
     Matrix matrix(rows * cols, 0);
 
     // 读取三元组形式的非零元素
-    int i, j, value;
-    while (file >> i >> j >> value) {
+    std::vector<int> triples = file.rest<int>();
+    for (size_t k = 0; k + 2 < triples.size(); k += 3) {
+        int i = triples[k], j = triples[k + 1], value = triples[k + 2];
         if (i >= 0 && i < rows && j >= 0 && j < cols) {
             matrix[i * cols + j] = value;
         } else {
@@ -132,7 +131,8 @@ int main(int argc, char* argv[]) {
     Matrix A = load_matrix(input_file, N, M);
     Matrix result(M * M, 0);  // 初始化结果矩阵为全零（一维表示）
 
-    // 记录开始时间戳并写入标准输出
+    // 输出读取阶段的统计，记录开始时间戳并写入标准输出
+    harness::report_load();
     auto time_start = std::chrono::high_resolution_clock::now();
     auto start_ms = std::chrono::duration_cast<std::chrono::milliseconds>(
         time_start.time_since_epoch()
@@ -0,0 +1,54 @@
+import os
+import shutil
+import subprocess
+
+# MPI 框架默认的进程数和每个进程的线程数（ranks × threads 混合布局）
+DEFAULT_RANKS = 4
+DEFAULT_THREADS = 1
+
+def find_launcher():
+    """返回 mpirun 或 mpiexec 的路径，都不存在时返回 None"""
+    return shutil.which("mpirun") or shutil.which("mpiexec")
+
+def launcher_flavor(launcher):
+    """区分 Open MPI 和 MPICH/Intel MPI（Hydra），两者的参数不同"""
+    try:
+        version = subprocess.run([launcher, "--version"], capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.TimeoutExpired):
+        return "hydra"
+    return "openmpi" if "Open MPI" in version.stdout + version.stderr else "hydra"
+
+def plan_mpi(ranks=DEFAULT_RANKS, threads=DEFAULT_THREADS, cpus=None):
+    """生成在本机以 ranks 个进程、每个进程 threads 个线程运行的 mpirun 前缀
+
+    返回 {"ranks", "threads", "wrapper", "env", "note"}；找不到启动器时返回 None。
+    cpus 不为空（已固定核心）时不让 MPI 再做绑定，避免覆盖外层的亲和性设置。
+    """
+    launcher = find_launcher()
+    if launcher is None:
+        return None
+    available = len(cpus) if cpus else len(os.sched_getaffinity(0))
+    oversubscribe = ranks * threads > available
+    env = {"OMP_NUM_THREADS": str(threads)}
+    note = f"{ranks} 个进程 × {threads} 个线程超过可用核心数 {available}，结果仅供参考" if oversubscribe else None
+
+    if launcher_flavor(launcher) == "openmpi":
+        wrapper = [launcher, "-np", str(ranks), "--host", f"localhost:{ranks}", "-x", "OMP_NUM_THREADS"]
+        if oversubscribe or cpus:
+            wrapper += ["--oversubscribe", "--bind-to", "none"]
+        elif threads > 1:
+            wrapper += ["--map-by", f"slot:PE={threads}", "--bind-to", "core"]
+        else:
+            wrapper += ["--bind-to", "core"]
+        if os.geteuid() == 0:
+            env.update(OMPI_ALLOW_RUN_AS_ROOT="1", OMPI_ALLOW_RUN_AS_ROOT_CONFIRM="1")
+    else:
+        wrapper = [launcher, "-n", str(ranks), "-hosts", "localhost", "-genv", "OMP_NUM_THREADS", str(threads)]
+        if not (oversubscribe or cpus):
+            wrapper += ["-bind-to", "core" if threads == 1 else f"core:{threads}"]
+    return {"ranks": ranks, "threads": threads, "wrapper": wrapper, "env": env, "note": note}
+
+def apply_mpi(placement, mpi):
+    """把 mpirun 前缀加到 NUMA 放置方案外层：mpirun ... numactl ... 测试程序"""
+    return dict(placement, wrapper=mpi["wrapper"] + placement["wrapper"], env=dict(placement["env"], **mpi["env"]),
+                mpi=mpi)
@@ -0,0 +1,100 @@
+import os
+import glob
+import shutil
+
+NODE_SYSFS = "/sys/devices/system/node"
+
+# 运行放置策略：
+#   none       不做任何处理（与以前一致）
+#   bind       线程和内存都绑定到一个节点（numactl --cpunodebind --membind）
+#   interleave 内存在所有节点间交错分配（numactl --interleave=all）
+#   spread     OpenMP 线程分散到所有节点（OMP_PROC_BIND=spread），内存仍由首次访问决定
+POLICIES = ("none", "bind", "interleave", "spread")
+
+def parse_cpulist(text):
+    """解析 "0-3,8,10-11" 形式的核心列表"""
+    cpus = []
+    for part in text.strip().split(","):
+        if not part:
+            continue
+        if "-" in part:
+            lo, hi = part.split("-")
+            cpus.extend(range(int(lo), int(hi) + 1))
+        else:
+            cpus.append(int(part))
+    return cpus
+
+def list_nodes():
+    """返回 {节点编号: 核心列表}，没有 NUMA 信息时视为单节点"""
+    nodes = {}
+    for path in glob.glob(f"{NODE_SYSFS}/node[0-9]*/cpulist"):
+        with open(path, "r") as f:
+            cpus = parse_cpulist(f.read())
+        if cpus:
+            nodes[int(path.split("/")[-2][4:])] = cpus
+    return nodes or {0: sorted(os.sched_getaffinity(0))}
+
+def read_numa_maps(pid, num_nodes):
+    """从 /proc/<pid>/numa_maps 统计进程在每个节点上的驻留内存（KB），进程已退出时返回 None"""
+    usage = [0] * num_nodes
+    try:
+        with open(f"/proc/{pid}/numa_maps", "r") as f:
+            lines = f.readlines()
+    except (FileNotFoundError, ProcessLookupError, PermissionError):
+        return None
+    for line in lines:
+        page_kb = 4
+        counts = []
+        for field in line.split()[2:]:
+            key, _, value = field.partition("=")
+            if key == "kernelpagesize_kB":
+                page_kb = int(value)
+            elif key[:1] == "N" and key[1:].isdigit():
+                counts.append((int(key[1:]), int(value)))
+        for node, pages in counts:
+            if node < num_nodes:
+                usage[node] += pages * page_kb
+    return usage
+
+def plan_placement(policy, node=0, cpus=None):
+    """生成放置方案 {"policy", "wrapper", "env", "cpus", "note"}
+
+    wrapper 为加在测试程序命令前的 numactl 参数，env 为附加环境变量，cpus 为进程亲和性。
+    单节点主机上所有策略都退化为 none；没有 numactl 时 bind 退化为只绑定核心（等同 taskset）。
+    cpus 不为空（--isolate 划出的被测程序核心）时 bind 只使用节点与 cpus 的交集（numactl --physcpubind），
+    不会占用保留给驱动和采样进程的核心；请求的节点与 cpus 没有交集时改用交集最大的节点。
+    """
+    plan = {"policy": policy, "wrapper": [], "env": {}, "cpus": cpus, "note": None}
+    if policy == "none":
+        return plan
+    nodes = list_nodes()
+    if len(nodes) < 2:
+        plan.update(policy="none", note=f"只有 1 个 NUMA 节点，忽略放置策略 {policy}")
+        return plan
+    numactl = shutil.which("numactl")
+    if policy == "bind":
+        node = node if node in nodes else min(nodes)
+        if cpus is not None:
+            overlap = lambda n: len(set(nodes[n]) & set(cpus))
+            if overlap(node) == 0:
+                node = max(sorted(nodes), key=overlap)
+            node_cpus = [c for c in nodes[node] if c in cpus]
+        else:
+            node_cpus = nodes[node]
+        plan["env"] = {"OMP_NUM_THREADS": str(len(node_cpus)), "OMP_PROC_BIND": "close"}
+        if numactl:
+            # --cpunodebind 会替换进程已有的亲和性，隔离时改为只绑定交集中的核心
+            cpu_arg = f"--physcpubind={','.join(map(str, node_cpus))}" if cpus is not None \
+                else f"--cpunodebind={node}"
+            plan["wrapper"] = [numactl, cpu_arg, f"--membind={node}"]
+        else:
+            plan["cpus"] = node_cpus
+            plan["note"] = "未找到 numactl，只绑定核心，内存仍按首次访问分配"
+    elif policy == "interleave":
+        if numactl:
+            plan["wrapper"] = [numactl, "--interleave=all"]
+        else:
+            plan.update(policy="none", note="未找到 numactl，无法交错分配内存")
+    elif policy == "spread":
+        plan["env"] = {"OMP_PROC_BIND": "spread", "OMP_PLACES": "cores"}
+    return plan
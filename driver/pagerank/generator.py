@@ -0,0 +1,26 @@
+import numpy as np
+
+DAMPING = 0.85
+
+def generate(params, rng):
+    """幂律出度的有向图，部分顶点没有出边（悬挂顶点）"""
+    n, m = params["vertices"], params["edges"]
+    src = np.minimum((rng.pareto(1.5, size=m) * n / 20).astype(np.int64), n - 1)
+    dst = rng.integers(0, n, size=m)
+    return {"vertices": n, "src": src, "dst": dst, "iterations": params["iterations"]}
+
+def format_input(g):
+    """首行 "顶点数 边数 迭代次数 阻尼系数"，之后每行一条有向边 "u v" """
+    return (f"{g['vertices']} {len(g['src'])} {g['iterations']} {DAMPING}\n"
+            + "".join(f"{u} {v}\n" for u, v in zip(g["src"].tolist(), g["dst"].tolist())))
+
+def oracle(g):
+    n = g["vertices"]
+    out_degree = np.bincount(g["src"], minlength=n)
+    dangling = out_degree == 0
+    rank = np.full(n, 1.0 / n)
+    for _ in range(g["iterations"]):
+        contrib = np.where(dangling, 0.0, rank / np.maximum(out_degree, 1))
+        incoming = np.bincount(g["dst"], weights=contrib[g["src"]], minlength=n)
+        rank = (1 - DAMPING) / n + DAMPING * (incoming + rank[dangling].sum() / n)
+    return "\n".join(repr(float(v)) for v in rank.tolist()) + "\n"
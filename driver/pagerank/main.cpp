@@ -0,0 +1,30 @@
+#include "pagerank.h"
+#include "common/harness.h"
+
+int main(int argc, char* argv[]) {
+    harness::init(argc, argv);
+    if (argc != 3) {
+        std::cerr << "用法: " << argv[0] << " <输入文件> <结果文件>" << std::endl;
+        return 1;
+    }
+
+    harness::TextReader in = harness::open_input(argv[1]);
+    int num_vertices = 0, iterations = 0;
+    long long num_edges = 0;
+    double damping = 0.85;
+    in >> num_vertices >> num_edges >> iterations >> damping;
+    harness::EdgeList list = harness::read_edges(in, num_edges);
+    std::vector<int> offset, edges;
+    harness::build_csr(list, num_vertices, false, offset, edges);
+    Graph graph{num_vertices, static_cast<int>(edges.size()), offset.data(), edges.data()};
+
+    std::vector<double> expected = harness::read_file<double>(argv[2]);
+    std::vector<double> rank(num_vertices, 0.0);
+
+    harness::KernelTimer timer("PAGERANK");
+    timer.start();
+    pagerank(graph, iterations, damping, rank);
+    timer.stop();
+
+    return harness::finish(harness::close_enough(rank, expected, 1e-6, 1e-12));
+}
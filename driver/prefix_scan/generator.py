@@ -0,0 +1,11 @@
+import numpy as np
+
+def generate(params, rng):
+    return rng.integers(-1000, 1000, size=params["n"], dtype=np.int64)
+
+def format_input(values):
+    """首行为元素个数，第二行为空格分隔的整数"""
+    return f"{len(values)}\n" + " ".join(map(str, values.tolist())) + "\n"
+
+def oracle(values):
+    return "\n".join(map(str, np.cumsum(values).tolist())) + "\n"
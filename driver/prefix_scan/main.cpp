@@ -0,0 +1,24 @@
+#include "prefix_scan.h"
+#include "common/harness.h"
+
+int main(int argc, char* argv[]) {
+    harness::init(argc, argv);
+    if (argc != 3) {
+        std::cerr << "用法: " << argv[0] << " <输入文件> <结果文件>" << std::endl;
+        return 1;
+    }
+
+    harness::TextReader in = harness::open_input(argv[1]);
+    size_t n = 0;
+    in >> n;
+    std::vector<long long> input = harness::read_rest<long long>(in, n);
+    std::vector<long long> expected = harness::read_file<long long>(argv[2]);
+    std::vector<long long> output(n, 0);
+
+    harness::KernelTimer timer("SCAN");
+    timer.start();
+    prefix_scan(input, output);
+    timer.stop();
+
+    return harness::finish(output == expected);
+}
@@ -0,0 +1,165 @@
+import os
+import re
+import sys
+import json
+import shutil
+import hashlib
+import argparse
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from driver import write_impl_header, build_syntax_command
+from task_registry import install_harness
+
+# 完整编译前的快速筛选：
+#   1. 规范化代码（去掉注释和空白差异后按 token 计算哈希），只差注释、空白或排版的候选视为重复，只保留第一个
+#   2. 对去重后的候选并行执行 -fsyntax-only，只编译任务接口头文件和实现，不编译测试程序、不链接
+# 只有语法正确且不重复的实现才进入完整编译和基准测试。
+DRIVER_DIR = os.path.dirname(os.path.abspath(__file__))
+SYNTAX_TIMEOUT = 60
+
+# 注释和字符串一起匹配，保证字符串中的 "//" 不被当作注释
+_COMMENT_OR_LITERAL = re.compile(r'"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'|//[^\n]*|/\*.*?\*/', re.S)
+# 多字符运算符在前，"a + +b" 和 "a++b" 得到不同的 token 序列
+_TOKEN = re.compile(r'"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'|[A-Za-z_]\w*|\.?\d[\w.\']*'
+                    r'|->\*?|\+\+|--|<<=|>>=|<=>|<<|>>|<=|>=|==|!=|&&|\|\||::|\.\.\.|[-+*/%&|^]=|\S')
+
+# 语法检查结果缓存：规范化哈希 -> (是否通过, 错误信息)，同一进程内的多次筛选共用
+_syntax_cache = {}
+_cache_lock = threading.Lock()
+
+def strip_comments(code):
+    return _COMMENT_OR_LITERAL.sub(lambda m: " " if m.group(0).startswith("/") else m.group(0), code)
+
+def normalize_code(code):
+    """去掉代码块标记、注释和空白差异后的 token 序列（预处理指令各占一行）"""
+    code = code.strip().replace("```cpp", "").replace("```", "")
+    code = strip_comments(code.replace("\\\n", " "))
+    lines = []
+    pending = []
+    for line in code.splitlines():
+        tokens = _TOKEN.findall(line)
+        if not tokens:
+            continue
+        if tokens[0] == "#":
+            # 预处理指令以换行结束，不能与后面的代码合并
+            if pending:
+                lines.append(" ".join(pending))
+                pending = []
+            lines.append(" ".join(tokens))
+        else:
+            pending.extend(tokens)
+    if pending:
+        lines.append(" ".join(pending))
+    return "\n".join(lines)
+
+def code_key(metadata):
+    """规范化代码的哈希（包含任务和框架，相同代码在不同框架下编译方式不同）"""
+    content = "\0".join([metadata["task_type"], metadata["framework"] or "", normalize_code(metadata["code"])])
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()[:16]
+
+def syntax_check(metadata, current_dir=DRIVER_DIR, timeout=SYNTAX_TIMEOUT):
+    """只对任务接口头文件和实现做语法检查，返回 (是否通过, 错误信息)
+
+    找不到对应编译器（如没有 nvcc）时返回 (None, 原因)，由完整编译给出结论。
+    """
+    framework = metadata["framework"]
+    task_type = metadata["task_type"]
+    temp_dir = tempfile.mkdtemp(prefix="prescreen_")
+    try:
+        write_impl_header(metadata, temp_dir)
+        task_dir = os.path.join(temp_dir, task_type)
+        os.makedirs(task_dir)
+        header = os.path.join(current_dir, task_type, f"{task_type}.h")
+        if os.path.exists(header):
+            shutil.copy(header, task_dir)
+        # 复制 common/，插件任务没有手写头文件时按 task.json 生成
+        install_harness(task_type, temp_dir)
+        if not os.path.exists(os.path.join(task_dir, f"{task_type}.h")):
+            return False, "测试工程不存在"
+
+        source_path = os.path.join(task_dir, "check.cu" if framework == "CUDA" else "check.cpp")
+        with open(source_path, "w") as f:
+            f.write(f'#include "{task_type}.h"\n')
+        command = build_syntax_command(framework, source_path, temp_dir)
+        if shutil.which(command.split()[0]) is None:
+            return None, f"未找到编译器 {command.split()[0]}，跳过语法检查"
+        try:
+            result = subprocess.run(command, shell=True, capture_output=True, text=True, cwd=temp_dir,
+                                    timeout=timeout)
+        except subprocess.TimeoutExpired:
+            return False, f"语法检查超时（{timeout}s）"
+        # 错误信息中的临时路径换成相对路径，便于比较和阅读
+        errors = result.stderr.replace(temp_dir + os.sep, "")
+        return result.returncode == 0, errors or None
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+def check_candidate(metadata, current_dir=DRIVER_DIR):
+    """带缓存的语法检查：规范化后相同的代码只检查一次，返回 (是否通过, 错误信息)"""
+    key = code_key(metadata)
+    with _cache_lock:
+        if key in _syntax_cache:
+            return _syntax_cache[key]
+    outcome = syntax_check(metadata, current_dir)
+    with _cache_lock:
+        _syntax_cache[key] = outcome
+    return outcome
+
+def prescreen(candidates, current_dir=DRIVER_DIR, max_workers=None):
+    """对一组候选（metadata 列表）去重并并行做语法检查
+
+    返回与输入一一对应的 [{key, duplicate_of, syntax_ok, error}]：duplicate_of 为同一代码第一次出现的下标，
+    重复的候选沿用第一次出现的检查结果；没有代码的候选 syntax_ok 为 False。
+    """
+    results = []
+    first = {}
+    unique = []
+    for index, metadata in enumerate(candidates):
+        if not metadata.get("code"):
+            results.append({"key": None, "duplicate_of": None, "syntax_ok": False, "error": "没有代码"})
+            continue
+        key = code_key(metadata)
+        results.append({"key": key, "duplicate_of": first.get(key), "syntax_ok": None, "error": None})
+        if key not in first:
+            first[key] = index
+            unique.append(index)
+
+    with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor:
+        outcomes = dict(zip(unique, executor.map(lambda i: check_candidate(candidates[i], current_dir), unique)))
+    for result in results:
+        if result["key"] is not None:
+            result["syntax_ok"], result["error"] = outcomes[first[result["key"]]]
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="对生成结果去重并做语法检查（不完整编译）")
+    parser.add_argument("outputs", nargs="+", help="generate.py 输出的 output.json")
+    parser.add_argument("--workers", type=int, help="并行检查数（默认为 CPU 核心数）")
+    parser.add_argument("-v", "--verbose", action="store_true", help="输出语法错误")
+    args = parser.parse_args()
+
+    candidates = []
+    for path in args.outputs:
+        with open(path, "r", encoding="utf-8") as f:
+            candidates.extend(task["metadata"] for task in json.load(f)["tasks"])
+    if not candidates:
+        print("输出中没有候选代码")
+        sys.exit(1)
+    results = prescreen(candidates, max_workers=args.workers)
+    for metadata, result in zip(candidates, results):
+        if result["duplicate_of"] is not None:
+            status = f"与第 {result['duplicate_of']} 个重复"
+        else:
+            status = {True: "通过", False: "语法错误", None: "未检查"}[result["syntax_ok"]]
+        print(f"{metadata['task_type']}/{metadata['framework']}: {status}")
+        if args.verbose and result["syntax_ok"] is False and result["duplicate_of"] is None and result["error"]:
+            print(result["error"])
+    unique = [r for r in results if r["key"] is not None and r["duplicate_of"] is None]
+    print(f"共 {len(results)} 个候选，去重后 {len(unique)} 个，"
+          f"语法检查通过 {sum(1 for r in unique if r['syntax_ok'] is not False)} 个")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+import os
+import re
+import json
+import time
+import signal
+import resource
+import tempfile
+import threading
+import subprocess
+
+CGROUP_ROOT = "/sys/fs/cgroup"
+
+def parse_memory_size(text):
+    """把 "20 GB" / "512MB" / "1.5G" 这样的字符串转换为字节数"""
+    match = re.match(r'\s*([\d.]+)\s*([KMGT]?)i?B?\s*$', str(text), re.IGNORECASE)
+    if not match:
+        raise ValueError(f"无法解析内存大小: {text}")
+    units = {"": 1, "K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4}
+    return int(float(match.group(1)) * units[match.group(2).upper()])
+
+def load_memory_limit(metadata, input_json):
+    """从任务元数据或 input.json 的 resources.cpu_memory 中读取内存上限（字节），没有时返回 None"""
+    resources = metadata.get('resources')
+    if resources is None and os.path.exists(input_json):
+        with open(input_json, 'r') as f:
+            resources = json.load(f).get('resources')
+    if not resources or not resources.get('cpu_memory'):
+        return None
+    return parse_memory_size(resources['cpu_memory'])
+
+class CgroupMemoryLimit:
+    """cgroup v2 子组内存限制；当前进程没有可写的 cgroup 时 available 为 False"""
+
+    def __init__(self, limit_bytes):
+        self.limit_bytes = limit_bytes
+        self.path = None
+        path = None
+        try:
+            with open("/proc/self/cgroup", "r") as f:
+                # cgroup v2 只有一行 "0::/path"
+                current = f.read().strip().split("::", 1)[1]
+            parent = os.path.join(CGROUP_ROOT, current.lstrip("/"))
+            path = os.path.join(parent, f"partest_{os.getpid()}_{time.time_ns()}")
+            os.mkdir(path)
+            with open(os.path.join(path, "memory.max"), "w") as f:
+                f.write(str(limit_bytes))
+            self.path = path
+        except (OSError, IndexError):
+            if path is not None and os.path.isdir(path):
+                os.rmdir(path)
+
+    @property
+    def available(self):
+        return self.path is not None
+
+    def attach_self(self):
+        """在子进程 exec 之前调用，把自身加入子组"""
+        with open(os.path.join(self.path, "cgroup.procs"), "w") as f:
+            f.write(str(os.getpid()))
+
+    def oom_kills(self):
+        with open(os.path.join(self.path, "memory.events"), "r") as f:
+            for line in f:
+                key, value = line.split()
+                if key == "oom_kill":
+                    return int(value)
+        return 0
+
+    def remove(self):
+        try:
+            os.rmdir(self.path)
+        except OSError:
+            pass
+
+# 超时后先发 SIGTERM，等待该时长后仍未退出则 SIGKILL 整个进程组
+KILL_GRACE_SECONDS = 2.0
+
+def kill_process_group(pgid, sig):
+    try:
+        os.killpg(pgid, sig)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+def launch(args, cwd, timeout=300, memory_limit=None, limit_mode="rlimit", on_start=None, cpus=None,
+           wrapper=None, env=None):
+    """运行一个测试程序并用 wait4 收集资源使用情况
+
+    测试程序在独立的会话/进程组中运行，超时后整个进程组（包括它派生的子进程）都会被终止。
+    memory_limit 为字节数；limit_mode 为 "rlimit"（RLIMIT_AS）或 "cgroup"（cgroup v2 memory.max，
+    不可用时退回 rlimit）。on_start 在子进程创建后以其 pid 调用（用于挂载监控）。cpus 不为空时
+    把测试程序固定在这些核心上。wrapper 为加在命令前的包装程序参数（如 numactl，需 exec 被测程序以保持 pid），
+    env 为附加的环境变量。返回 {returncode, stdout, stderr, timed_out, oom_killed, peak_rss_kb,
+    minor_faults, major_faults, start_time, wall_ms}。
+    """
+    cgroup = None
+    if memory_limit and limit_mode == "cgroup":
+        cgroup = CgroupMemoryLimit(memory_limit)
+        if not cgroup.available:
+            print("cgroup v2 不可写，改用 RLIMIT_AS 限制内存")
+            cgroup = None
+
+    def preexec():
+        if cpus:
+            os.sched_setaffinity(0, cpus)
+        if cgroup is not None:
+            cgroup.attach_self()
+        elif memory_limit:
+            resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+
+    # 输出写入临时文件，避免管道写满导致子进程阻塞
+    with tempfile.TemporaryFile(mode='w+') as out, tempfile.TemporaryFile(mode='w+') as err:
+        start_time = time.time()
+        proc = subprocess.Popen(list(wrapper or []) + list(args), cwd=cwd, stdout=out, stderr=err,
+                                preexec_fn=preexec, start_new_session=True,
+                                env=dict(os.environ, **env) if env else None)
+        pgid = proc.pid
+        if on_start is not None:
+            on_start(proc.pid)
+
+        timed_out = threading.Event()
+        finished = threading.Event()
+        def on_timeout():
+            timed_out.set()
+            kill_process_group(pgid, signal.SIGTERM)
+            if not finished.wait(KILL_GRACE_SECONDS):
+                kill_process_group(pgid, signal.SIGKILL)
+        timer = threading.Timer(timeout, on_timeout) if timeout else None
+        if timer:
+            timer.start()
+        _, status, rusage = os.wait4(proc.pid, 0)
+        finished.set()
+        if timer:
+            timer.cancel()
+        wall_ms = int((time.time() - start_time) * 1000)
+        # 主进程退出后清理残留的子进程
+        kill_process_group(pgid, signal.SIGKILL)
+        # 已由 wait4 回收，告诉 Popen 不要再次等待
+        proc.returncode = os.waitstatus_to_exitcode(status)
+
+        out.seek(0)
+        err.seek(0)
+        stdout, stderr = out.read(), err.read()
+
+    oom_killed = False
+    if cgroup is not None:
+        oom_killed = cgroup.oom_kills() > 0
+        cgroup.remove()
+    elif memory_limit:
+        # RLIMIT_AS 下分配失败表现为 bad_alloc 异常或 CUDA/glibc 的分配错误
+        oom_killed = proc.returncode != 0 and bool(
+            re.search(r"bad_alloc|Cannot allocate memory|out of memory", stderr))
+
+    return {
+        "returncode": proc.returncode,
+        "stdout": stdout,
+        "stderr": stderr,
+        "timed_out": timed_out.is_set(),
+        "oom_killed": oom_killed,
+        "peak_rss_kb": rusage.ru_maxrss,
+        "minor_faults": rusage.ru_minflt,
+        "major_faults": rusage.ru_majflt,
+        "start_time": start_time,
+        "wall_ms": wall_ms,
+    }
@@ -0,0 +1,156 @@
+import os
+import glob
+import time
+from threading import Event, Thread
+
+# RAPL 能耗计数器（Linux powercap）：/sys/class/powercap/intel-rapl:<包>/energy_uj 为整个处理器包的累计能耗，
+# intel-rapl:<包>:<子域>/ 中 name 为 dram 的子域为内存能耗。计数器为系统级（包含被测程序以外的负载），
+# 到 max_energy_range_uj 后归零重新计数。AMD 处理器在较新内核上同样通过 intel-rapl 接口提供包能耗。
+# 环境变量 RAPL_SYSFS_ROOT 可指向伪造的 powercap 目录（测试用）。
+POWERCAP_SYSFS = "/sys/class/powercap"
+RAPL_ROOT_ENV = "RAPL_SYSFS_ROOT"
+# 采样间隔：远小于计数器归零周期（200W 时约 20 分钟）；短于一个间隔的阶段按线性插值估计
+RAPL_INTERVAL_S = 0.05
+
+def read_int(path):
+    with open(path, "r") as f:
+        return int(f.read().strip())
+
+def find_domains(root=None):
+    """返回可读的包/内存能耗域 [{"name", "path", "max_range"}]，名称如 package-0、dram-0"""
+    root = root or os.getenv(RAPL_ROOT_ENV) or POWERCAP_SYSFS
+    domains = []
+    for zone in sorted(glob.glob(os.path.join(root, "intel-rapl:*"))):
+        parts = os.path.basename(zone).split(":")
+        try:
+            with open(os.path.join(zone, "name"), "r") as f:
+                name = f.read().strip()
+            energy_path = os.path.join(zone, "energy_uj")
+            read_int(energy_path)
+            max_range = read_int(os.path.join(zone, "max_energy_range_uj"))
+        except (OSError, ValueError):
+            # 没有权限（5.10 之后的内核 energy_uj 默认只有 root 可读）或不是能耗域
+            continue
+        if len(parts) == 2 and name.startswith("package"):
+            domains.append({"name": name, "path": energy_path, "max_range": max_range})
+        elif len(parts) == 3 and name == "dram":
+            domains.append({"name": f"dram-{parts[1]}", "path": energy_path, "max_range": max_range})
+    return domains
+
+class RaplSampler:
+    """在后台线程中周期读取能耗计数器，把计数器展开为单调递增的累计焦耳数"""
+
+    def __init__(self, root=None, interval=RAPL_INTERVAL_S):
+        self.domains = find_domains(root)
+        self.interval = interval
+        # [(时间戳, [各域累计焦耳])]
+        self.samples = []
+        self._last_raw = None
+        self._stop_event = Event()
+        self._thread = None
+
+    @property
+    def available(self):
+        return bool(self.domains)
+
+    def _sample(self):
+        timestamp = time.time()
+        try:
+            raw = [read_int(d["path"]) for d in self.domains]
+        except (OSError, ValueError):
+            return False
+        if self._last_raw is None:
+            totals = [0.0] * len(raw)
+        else:
+            totals = list(self.samples[-1][1])
+            for i, (prev, cur) in enumerate(zip(self._last_raw, raw)):
+                # 计数器到 max_energy_range_uj 后归零
+                delta = cur - prev if cur >= prev else cur + self.domains[i]["max_range"] - prev
+                totals[i] += delta / 1e6
+        self._last_raw = raw
+        self.samples.append((timestamp, totals))
+        return True
+
+    def _loop(self):
+        # 单次读取失败时跳过该样本，相邻样本之间按插值计算
+        while not self._stop_event.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        if not self.available:
+            return
+        self.samples = []
+        self._last_raw = None
+        self._stop_event.clear()
+        if not self._sample():
+            return
+        self._thread = Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+        self._sample()
+
+    def _energy_at(self, timestamp):
+        """时间戳处各域的累计焦耳数（相邻样本间线性插值，超出范围时取端点）"""
+        samples = self.samples
+        if timestamp <= samples[0][0]:
+            return samples[0][1]
+        for (t0, e0), (t1, e1) in zip(samples, samples[1:]):
+            if timestamp <= t1:
+                w = (timestamp - t0) / (t1 - t0) if t1 > t0 else 1.0
+                return [a + (b - a) * w for a, b in zip(e0, e1)]
+        return samples[-1][1]
+
+    def energy_between(self, start, end):
+        """[start, end] 区间内各域的能耗（焦耳），样本不足时返回 None"""
+        if len(self.samples) < 2 or end < start:
+            return None
+        e0, e1 = self._energy_at(start), self._energy_at(end)
+        return {d["name"]: b - a for d, a, b in zip(self.domains, e0, e1)}
+
+    def power_series(self):
+        """相邻样本间的平均功率 [(时间戳, {域: 瓦})]，用于 trace 导出"""
+        series = []
+        for (t0, e0), (t1, e1) in zip(self.samples, self.samples[1:]):
+            if t1 > t0:
+                series.append((t1, {d["name"]: (b - a) / (t1 - t0) for d, a, b in zip(self.domains, e0, e1)}))
+        return series
+
+def summarize_energy(sampler, phases):
+    """按阶段积分能耗，phases 为 [(名称, 开始, 结束)]（第一个开始到最后一个结束为整次运行）
+
+    返回 {"domains", "interval_ms", "phases": {名称: {joules, by_domain, avg_w, duration_s}},
+    "run": {..., "edp_js"}}，kernel 阶段另外计算 EDP（能耗 × 时间）；计数器不可用时返回 None。
+    """
+    if sampler is None or len(sampler.samples) < 2 or not phases:
+        return None
+
+    def measure(start, end):
+        by_domain = sampler.energy_between(start, end)
+        if by_domain is None:
+            return None
+        joules = sum(by_domain.values())
+        duration = end - start
+        return {"joules": joules, "by_domain": by_domain, "duration_s": duration,
+                "avg_w": joules / duration if duration > 0 else None}
+
+    report = {"domains": [d["name"] for d in sampler.domains], "interval_ms": sampler.interval * 1000,
+              "phases": {}}
+    for name, start, end in phases:
+        phase = measure(start, end)
+        if phase is not None:
+            report["phases"][name] = phase
+    run = measure(phases[0][1], phases[-1][2])
+    if run is None:
+        return None
+    run["edp_js"] = run["joules"] * run["duration_s"]
+    report["run"] = run
+    kernel = report["phases"].get("kernel")
+    if kernel is not None:
+        kernel["edp_js"] = kernel["joules"] * kernel["duration_s"]
+    return report
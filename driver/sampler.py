@@ -0,0 +1,328 @@
+import os
+import time
+import struct
+import multiprocessing as mp
+from multiprocessing import shared_memory
+from numa_placement import read_numa_maps
+
+# 自适应采样：起始间隔 10ms，每采集 ADAPT_EVERY 个样本间隔翻倍，最大 100ms
+# （/proc/stat 和进程 CPU 时间以 jiffy 为单位更新，通常 10ms，更短的间隔只会得到 0% 或 100% 的读数）
+MIN_INTERVAL = 0.01
+MAX_INTERVAL = 0.1
+ADAPT_EVERY = 20
+# 等待被测程序启动时轮询 pid 的间隔，保证尽早开始采样
+ATTACH_POLL = 0.001
+# 每个核心的忙碌率至少在 CPU_WINDOW_JIFFIES 个 jiffy 的窗口上计算，窗口未满的样本沿用上一个窗口的值
+CPU_WINDOW_JIFFIES = 2
+# 每 NUMA_EVERY 个样本读取一次 numa_maps（映射多时开销较大），其余样本沿用上一次的值
+NUMA_EVERY = 10
+# 等待采样进程（forkserver/spawn 启动需要导入模块）初始化完成的最长时间（秒）
+READY_TIMEOUT = 10.0
+# 环形缓冲区容量（样本数），写满后覆盖最旧的样本
+CAPACITY = 65536
+
+CLK_TCK = os.sysconf('SC_CLK_TCK')
+PAGE_SIZE_KB = os.sysconf('SC_PAGE_SIZE') // 1024
+
+# 共享内存头部：写入计数、采样进程 CPU 时间(秒)、采样耗时累计(秒)
+HEADER = struct.Struct('<qdd')
+# 样本固定字段：时间戳、进程 user/sys CPU 秒、RSS(KB)、峰值 RSS(VmHWM, KB)、自愿/非自愿上下文切换、线程数、进程数、
+# 启动器峰值 RSS(KB)（多进程时前几项为各 rank 之和，峰值 RSS 之和即各 rank 峰值内存之和；mpirun、orted 等启动器
+# 不是被测程序，其峰值内存之和单独记录）
+# 之后依次为每个核心的忙碌率、每块 GPU 的利用率和显存占用率、每个 NUMA 节点的驻留内存(KB)
+FIXED_FIELDS = ('timestamp', 'utime', 'stime', 'rss_kb', 'hwm_kb', 'ctx_voluntary', 'ctx_involuntary', 'num_threads', 'num_procs',
+                'launcher_hwm_kb')
+
+def read_cpu_times():
+    """读取 /proc/stat 中每个核心的 (忙碌, 总计) jiffies"""
+    times = []
+    with open('/proc/stat', 'r') as f:
+        for line in f:
+            if not line.startswith('cpu') or line.startswith('cpu '):
+                continue
+            values = [int(v) for v in line.split()[1:]]
+            idle = values[3] + (values[4] if len(values) > 4 else 0)  # idle + iowait
+            total = sum(values[:8])  # 不含 guest，guest 已计入 user
+            times.append((total - idle, total))
+    return times
+
+def read_process(pid):
+    """读取 /proc/<pid>/stat 和 status，进程已退出时返回 None"""
+    try:
+        with open(f'/proc/{pid}/stat', 'r') as f:
+            stat = f.read()
+        with open(f'/proc/{pid}/status', 'r') as f:
+            status = f.read()
+    except (FileNotFoundError, ProcessLookupError):
+        return None
+    # comm 字段可能包含空格，从最后一个 ')' 之后开始解析
+    fields = stat[stat.rindex(')') + 2:].split()
+    info = {
+        'utime': int(fields[11]) / CLK_TCK,
+        'stime': int(fields[12]) / CLK_TCK,
+        'num_threads': int(fields[17]),
+        'rss_kb': int(fields[21]) * PAGE_SIZE_KB,
+        'hwm_kb': 0,
+        'ctx_voluntary': 0,
+        'ctx_involuntary': 0,
+        'num_procs': 1,
+    }
+    for line in status.splitlines():
+        if line.startswith('VmHWM:'):
+            info['hwm_kb'] = int(line.split()[1])
+        elif line.startswith('voluntary_ctxt_switches:'):
+            info['ctx_voluntary'] = int(line.split()[1])
+        elif line.startswith('nonvoluntary_ctxt_switches:'):
+            info['ctx_involuntary'] = int(line.split()[1])
+    return info
+
+def list_descendants(pid):
+    """pid 的所有后代进程（如 mpirun 启动的各个 rank）"""
+    descendants = []
+    stack = [pid]
+    while stack:
+        parent = stack.pop()
+        try:
+            with open(f'/proc/{parent}/task/{parent}/children', 'r') as f:
+                children = [int(c) for c in f.read().split()]
+        except (FileNotFoundError, ProcessLookupError):
+            continue
+        descendants.extend(children)
+        stack.extend(children)
+    return descendants
+
+def process_exe(pid):
+    """进程的可执行文件路径，无法读取时返回 None"""
+    try:
+        return os.readlink(f'/proc/{pid}/exe')
+    except OSError:
+        return None
+
+def rank_pids(pid, rank_exe=None):
+    """pid 及其后代中被测程序的进程：rank_exe 为空时是全部进程，否则只取可执行文件为 rank_exe 的进程"""
+    pids = [pid] + list_descendants(pid)
+    if rank_exe is None:
+        return pids
+    return [p for p in pids if process_exe(p) == rank_exe]
+
+def read_process_tree(pid, rank_exe=None):
+    """把 pid 及其后代中被测程序各进程的计数累加在一起，pid 已退出时返回 None
+
+    rank_exe 不为空时只累加可执行文件为 rank_exe 的进程（MPI 各 rank），其余进程（pid 本身的 mpirun、
+    orted 等启动器）只把峰值驻留内存累加到 launcher_hwm_kb。
+    """
+    root = read_process(pid)
+    if root is None:
+        return None
+    total = dict.fromkeys(root, 0)
+    total['launcher_hwm_kb'] = 0
+    for p in [pid] + list_descendants(pid):
+        info = root if p == pid else read_process(p)
+        if info is None:
+            continue
+        if rank_exe is not None and process_exe(p) != rank_exe:
+            total['launcher_hwm_kb'] += info['hwm_kb']
+            continue
+        for key, value in info.items():
+            total[key] += value
+    return total
+
+def default_sampler_cpu():
+    """隔离运行（--isolate）时保留给采样进程的核心：可用核心中编号最大的那个"""
+    return max(os.sched_getaffinity(0))
+
+class SampleBuffer:
+    """共享内存中的定长样本环形缓冲区"""
+
+    def __init__(self, num_cpus, num_gpus, capacity=CAPACITY, name=None, num_nodes=0):
+        self.num_cpus = num_cpus
+        self.num_gpus = num_gpus
+        self.num_nodes = num_nodes
+        self.capacity = capacity
+        self.record = struct.Struct('<' + 'd' * (len(FIXED_FIELDS) + num_cpus + 2 * num_gpus + num_nodes))
+        size = HEADER.size + capacity * self.record.size
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+            HEADER.pack_into(self.shm.buf, 0, 0, 0.0, 0.0)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+
+    def write(self, values):
+        count, cpu_time, busy = HEADER.unpack_from(self.shm.buf, 0)
+        offset = HEADER.size + (count % self.capacity) * self.record.size
+        self.record.pack_into(self.shm.buf, offset, *values)
+        # 先写样本再更新计数，读者看到的计数对应的样本总是完整的
+        HEADER.pack_into(self.shm.buf, 0, count + 1, cpu_time, busy)
+
+    def set_overhead(self, cpu_time, busy):
+        count = HEADER.unpack_from(self.shm.buf, 0)[0]
+        HEADER.pack_into(self.shm.buf, 0, count, cpu_time, busy)
+
+    def header(self):
+        return HEADER.unpack_from(self.shm.buf, 0)
+
+    def read(self, since=0):
+        """读取编号 >= since 的样本，返回 (样本列表, 下一个编号)"""
+        count = self.header()[0]
+        start = max(since, count - self.capacity)
+        samples = []
+        for i in range(start, count):
+            values = self.record.unpack_from(self.shm.buf, HEADER.size + (i % self.capacity) * self.record.size)
+            samples.append(self._decode(values))
+        return samples, count
+
+    def _decode(self, values):
+        n_fixed = len(FIXED_FIELDS)
+        sample = dict(zip(FIXED_FIELDS, values[:n_fixed]))
+        sample['cpu_per_core'] = list(values[n_fixed:n_fixed + self.num_cpus])
+        gpu = values[n_fixed + self.num_cpus:n_fixed + self.num_cpus + 2 * self.num_gpus]
+        sample['gpu_usage'] = list(gpu[:self.num_gpus])
+        sample['gpu_memory_percent'] = list(gpu[self.num_gpus:])
+        sample['numa_node_kb'] = list(values[n_fixed + self.num_cpus + 2 * self.num_gpus:])
+        return sample
+
+    def close(self, unlink=False):
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+def _gpu_reader(num_gpus):
+    """在采样进程中初始化 NVML，返回读取 (利用率列表, 显存占用率列表) 的函数"""
+    if num_gpus == 0:
+        return lambda: ([], [])
+    import pynvml
+    pynvml.nvmlInit()
+    handles = [pynvml.nvmlDeviceGetHandleByIndex(i) for i in range(num_gpus)]
+
+    def read():
+        usage, memory = [], []
+        for handle in handles:
+            try:
+                usage.append(pynvml.nvmlDeviceGetUtilizationRates(handle).gpu)
+                mem = pynvml.nvmlDeviceGetMemoryInfo(handle)
+                memory.append(mem.used / mem.total * 100 if mem.total else 0.0)
+            except pynvml.NVMLError:
+                usage.append(0.0)
+                memory.append(0.0)
+        return usage, memory
+    return read
+
+def _sampler_main(shm_name, num_cpus, num_gpus, capacity, target_pid, stop_event, ready_event, cpu, num_nodes,
+                  track_children, rank_exe):
+    """采样进程入口：初始化完成后置位 ready_event，等待目标 pid，按自适应间隔采样直到停止或目标退出"""
+    if cpu is not None:
+        try:
+            os.sched_setaffinity(0, {cpu})
+        except OSError:
+            pass
+    buffer = SampleBuffer(num_cpus, num_gpus, capacity, name=shm_name, num_nodes=num_nodes)
+    read_gpu = _gpu_reader(num_gpus)
+    cpu_start = time.process_time()
+    busy = 0.0
+    ready_event.set()
+
+    while target_pid.value == 0 and not stop_event.is_set():
+        time.sleep(ATTACH_POLL)
+
+    pid = target_pid.value
+    prev_cpu = read_cpu_times()
+    per_core = [0.0] * num_cpus
+    interval = MIN_INTERVAL
+    taken = 0
+    node_kb = [0] * num_nodes
+    while pid and not stop_event.is_set():
+        tick = time.perf_counter()
+        proc = read_process_tree(pid, rank_exe) if track_children else read_process(pid)
+        if proc is None:
+            break
+        cpu_now = read_cpu_times()
+        if max(total_now - total_prev for (_, total_now), (_, total_prev) in zip(cpu_now, prev_cpu)) \
+                >= CPU_WINDOW_JIFFIES:
+            per_core = []
+            for (busy_now, total_now), (busy_prev, total_prev) in zip(cpu_now, prev_cpu):
+                delta = total_now - total_prev
+                per_core.append(100.0 * (busy_now - busy_prev) / delta if delta > 0 else 0.0)
+            prev_cpu = cpu_now
+        gpu_usage, gpu_memory = read_gpu()
+        if num_nodes and taken % NUMA_EVERY == 0:
+            pids = rank_pids(pid, rank_exe) if track_children else [pid]
+            usage = [read_numa_maps(p, num_nodes) for p in pids]
+            node_kb = [sum(kb) for kb in zip(*[u for u in usage if u])] or node_kb
+        buffer.write([time.time()] + [proc.get(k, 0) for k in FIXED_FIELDS[1:]] + per_core + gpu_usage + gpu_memory + node_kb)
+
+        busy += time.perf_counter() - tick
+        buffer.set_overhead(time.process_time() - cpu_start, busy)
+        taken += 1
+        if taken % ADAPT_EVERY == 0:
+            interval = min(interval * 2, MAX_INTERVAL)
+        stop_event.wait(interval)
+
+    buffer.set_overhead(time.process_time() - cpu_start, busy)
+    buffer.close()
+
+class ProcessSampler:
+    """独立进程中的硬件采样器，样本通过共享内存传回驱动进程"""
+
+    def __init__(self, num_gpus=0, cpu=None, capacity=CAPACITY, num_nodes=0, track_children=False, rank_exe=None):
+        # num_nodes > 0 时额外记录被测程序在每个 NUMA 节点上的驻留内存
+        # track_children 为 True 时累加目标进程及其所有后代（多进程 MPI 运行）；
+        # rank_exe 为被测程序路径时只累加该程序的进程，启动器单独记录
+        # cpu 为空时不固定采样进程：只有隔离运行把该核心从被测程序的亲和性中去掉时，固定才不会与被测程序争抢
+        rank_exe = os.path.realpath(rank_exe) if rank_exe else None
+        self.num_cpus = len(read_cpu_times())
+        self.num_gpus = num_gpus
+        self.num_nodes = num_nodes
+        self.cpu = cpu
+        self.buffer = SampleBuffer(self.num_cpus, num_gpus, capacity, num_nodes=num_nodes)
+        # 驱动进程可能已有线程（基准测试队列、日志），fork 出的子进程可能继承被持有的锁，改用 forkserver/spawn
+        ctx = mp.get_context('forkserver' if 'forkserver' in mp.get_all_start_methods() else 'spawn')
+        self._target_pid = ctx.Value('i', 0)
+        self._stop_event = ctx.Event()
+        self._ready_event = ctx.Event()
+        self._process = ctx.Process(
+            target=_sampler_main,
+            args=(self.buffer.shm.name, self.num_cpus, num_gpus, capacity, self._target_pid,
+                  self._stop_event, self._ready_event, self.cpu, num_nodes, track_children, rank_exe),
+            daemon=True,
+        )
+        self._next = 0
+        self.start_time = None
+        self.stop_time = None
+
+    def start(self):
+        """启动采样进程并等待其初始化完成，避免被测程序启动后的最初一段时间没有样本"""
+        self.start_time = time.time()
+        self._process.start()
+        if not self._ready_event.wait(READY_TIMEOUT):
+            print(f"采样进程 {READY_TIMEOUT:.0f}s 内未完成初始化，本次运行可能缺少样本")
+
+    def attach(self, pid):
+        """开始采样目标进程（可在 start 之后任意时刻调用）"""
+        self._target_pid.value = pid
+
+    def poll(self):
+        """读取自上次 poll 以来的新样本"""
+        samples, self._next = self.buffer.read(self._next)
+        return samples
+
+    def stop(self):
+        self._stop_event.set()
+        self._process.join(timeout=2.0)
+        if self._process.is_alive():
+            self._process.terminate()
+        self.stop_time = time.time()
+
+    def overhead(self):
+        """采样开销：采样进程 CPU 时间、单次采样平均耗时及其占运行时间的比例"""
+        count, cpu_time, busy = self.buffer.header()
+        wall = (self.stop_time or time.time()) - self.start_time if self.start_time else 0.0
+        return {
+            "samples": count,
+            "sampler_cpu_ms": cpu_time * 1000,
+            "avg_sample_us": busy / count * 1e6 if count else 0.0,
+            "cpu_fraction": cpu_time / wall if wall > 0 else 0.0,
+            "sampler_cpu": self.cpu,
+        }
+
+    def close(self):
+        self.buffer.close(unlink=True)
@@ -0,0 +1,15 @@
+from task_registry import generate_dataset
+
+# 冒烟测试分级：先在极小输入上验证，再用中等输入验证，全部通过才进入完整数据集
+# 各级输入规模、生成器和参考实现由各任务目录中的 task.json / generator.py 提供
+SMOKE_STAGES = ('tiny', 'medium')
+
+def stage_dataset_name(stage):
+    return f"smoke_{stage}.txt"
+
+def ensure_stage_input(task_type, stage, root_dir):
+    """确保 dataset/<task>/smoke_<stage>.txt 及其参考结果存在，返回数据集文件名；任务没有生成器时返回 None"""
+    dataset = stage_dataset_name(stage)
+    if not generate_dataset(task_type, stage, dataset, root_dir):
+        return None
+    return dataset
@@ -0,0 +1,11 @@
+import numpy as np
+
+def generate(params, rng):
+    return rng.integers(-2**31, 2**31, size=params["n"], dtype=np.int64)
+
+def format_input(keys):
+    """首行为元素个数，第二行为空格分隔的整数"""
+    return f"{len(keys)}\n" + " ".join(map(str, keys.tolist())) + "\n"
+
+def oracle(keys):
+    return "\n".join(map(str, np.sort(keys).tolist())) + "\n"
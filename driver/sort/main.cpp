@@ -0,0 +1,23 @@
+#include "sort.h"
+#include "common/harness.h"
+
+int main(int argc, char* argv[]) {
+    harness::init(argc, argv);
+    if (argc != 3) {
+        std::cerr << "用法: " << argv[0] << " <输入文件> <结果文件>" << std::endl;
+        return 1;
+    }
+
+    harness::TextReader in = harness::open_input(argv[1]);
+    size_t n = 0;
+    in >> n;
+    std::vector<int> keys = harness::read_rest<int>(in, n);
+    std::vector<int> expected = harness::read_file<int>(argv[2]);
+
+    harness::KernelTimer timer("SORT");
+    timer.start();
+    sort_keys(keys);
+    timer.stop();
+
+    return harness::finish(keys == expected);
+}
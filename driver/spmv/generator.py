@@ -0,0 +1,25 @@
+import numpy as np
+
+def generate(params, rng):
+    """每行非零元个数在 [1, 2 * nnz_per_row) 之间随机，列号均匀分布（同一行内可能有重复列，按累加处理）"""
+    rows, cols = params["rows"], params["cols"]
+    per_row = rng.integers(1, 2 * params["nnz_per_row"], size=rows)
+    row_ptr = np.concatenate([[0], np.cumsum(per_row)])
+    col_idx = rng.integers(0, cols, size=int(row_ptr[-1]))
+    values = rng.uniform(-1.0, 1.0, size=len(col_idx))
+    x = rng.uniform(-1.0, 1.0, size=cols)
+    return {"rows": rows, "cols": cols, "row_ptr": row_ptr, "col_idx": col_idx, "values": values, "x": x}
+
+def format_input(m):
+    """首行 "行数 列数 非零元数"，之后依次为 row_ptr、col_idx、values、x 各一行"""
+    fmt = lambda a: " ".join(repr(float(v)) for v in a.tolist())
+    return (f"{m['rows']} {m['cols']} {len(m['values'])}\n"
+            + " ".join(map(str, m["row_ptr"].tolist())) + "\n"
+            + " ".join(map(str, m["col_idx"].tolist())) + "\n"
+            + fmt(m["values"]) + "\n" + fmt(m["x"]) + "\n")
+
+def oracle(m):
+    rows_of_nnz = np.repeat(np.arange(m["rows"]), np.diff(m["row_ptr"]))
+    y = np.zeros(m["rows"])
+    np.add.at(y, rows_of_nnz, m["values"] * m["x"][m["col_idx"]])
+    return "\n".join(repr(float(v)) for v in y.tolist()) + "\n"
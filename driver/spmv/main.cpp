@@ -0,0 +1,29 @@
+#include "spmv.h"
+#include "common/harness.h"
+
+int main(int argc, char* argv[]) {
+    harness::init(argc, argv);
+    if (argc != 3) {
+        std::cerr << "用法: " << argv[0] << " <输入文件> <结果文件>" << std::endl;
+        return 1;
+    }
+
+    harness::TextReader in = harness::open_input(argv[1]);
+    CSRMatrix A;
+    size_t nnz = 0;
+    in >> A.rows >> A.cols >> nnz;
+    A.row_ptr = harness::read_values<int>(in, A.rows + 1);
+    A.col_idx = harness::read_values<int>(in, nnz);
+    A.values = harness::read_values<double>(in, nnz);
+    std::vector<double> x = harness::read_rest<double>(in, A.cols);
+    std::vector<double> expected = harness::read_file<double>(argv[2]);
+    std::vector<double> y(A.rows, 0.0);
+
+    harness::KernelTimer timer("SPMV");
+    timer.start();
+    spmv(A, x, y);
+    timer.stop();
+
+    // 浮点累加顺序不同会有舍入差异
+    return harness::finish(harness::close_enough(y, expected, 1e-9, 1e-12));
+}
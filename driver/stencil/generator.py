@@ -0,0 +1,19 @@
+import numpy as np
+
+def generate(params, rng):
+    return {"grid": rng.uniform(0.0, 100.0, size=(params["rows"], params["cols"])),
+            "iterations": params["iterations"]}
+
+def format_input(data):
+    """首行 "行数 列数 迭代次数"，之后每行为网格的一行"""
+    grid = data["grid"]
+    return (f"{grid.shape[0]} {grid.shape[1]} {data['iterations']}\n"
+            + "".join(" ".join(repr(float(v)) for v in row) + "\n" for row in grid.tolist()))
+
+def oracle(data):
+    grid = data["grid"].copy()
+    for _ in range(data["iterations"]):
+        nxt = grid.copy()
+        nxt[1:-1, 1:-1] = 0.25 * (grid[:-2, 1:-1] + grid[2:, 1:-1] + grid[1:-1, :-2] + grid[1:-1, 2:])
+        grid = nxt
+    return "\n".join(repr(float(v)) for v in grid.ravel().tolist()) + "\n"
@@ -0,0 +1,25 @@
+#include "stencil.h"
+#include "common/harness.h"
+
+int main(int argc, char* argv[]) {
+    harness::init(argc, argv);
+    if (argc != 3) {
+        std::cerr << "用法: " << argv[0] << " <输入文件> <结果文件>" << std::endl;
+        return 1;
+    }
+
+    harness::TextReader in = harness::open_input(argv[1]);
+    Grid input;
+    int iterations = 0;
+    in >> input.rows >> input.cols >> iterations;
+    input.data = harness::read_rest<double>(in, static_cast<size_t>(input.rows) * input.cols);
+    std::vector<double> expected = harness::read_file<double>(argv[2]);
+    Grid output{input.rows, input.cols, std::vector<double>(input.data.size(), 0.0)};
+
+    harness::KernelTimer timer("STENCIL");
+    timer.start();
+    stencil_2d(input, iterations, output);
+    timer.stop();
+
+    return harness::finish(harness::close_enough(output.data, expected, 1e-9, 1e-9));
+}
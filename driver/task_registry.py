@@ -0,0 +1,188 @@
+import os
+import ast
+import sys
+import json
+import math
+import shutil
+import operator
+import argparse
+import importlib.util
+import numpy as np
+
+# 任务插件：driver/<任务>/ 目录中的 task.json 声明函数签名、上下文、各级输入规模和工作量模型，
+# generator.py 提供输入生成器 generate(params, rng)、输入格式化 format_input(inputs) 和参考实现 oracle(inputs)，
+# main.cpp 为测试程序。新增任务只需添加这样一个目录，不需要修改 driver.py。
+DRIVER_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(DRIVER_DIR)
+COMMON_DIR = os.path.join(DRIVER_DIR, 'common')
+SPEC_FILE = 'task.json'
+GENERATOR_FILE = 'generator.py'
+
+SEED = 20250608
+
+# 任务目录中没有手写头文件时，按 task.json 生成统一接口头文件
+HEADER_TEMPLATE = """// {header} —— 由 task.json 生成的统一接口
+#pragma once
+#if defined(USE_CUDA)
+{cuda_context}
+
+{cuda_signature}
+#else
+{context}
+
+{signature}
+#endif
+
+// 根据不同编译选项包含实现
+#if defined(USE_OPENMP)
+#include "openmp_impl.h"
+#elif defined(USE_MPI)
+#include "mpi_impl.h"
+#elif defined(USE_CUDA)
+#include "cuda_impl.cu"
+#elif defined(USE_TBB)
+#include "tbb_impl.h"
+#else
+#include "single_thread_impl.h"
+#endif
+"""
+
+def task_dir(task_type):
+    return os.path.join(DRIVER_DIR, task_type)
+
+def load_spec(task_type):
+    """读取任务的 task.json，任务不是插件时返回 None"""
+    path = os.path.join(task_dir(task_type), SPEC_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def list_tasks():
+    return sorted(name for name in os.listdir(DRIVER_DIR) if os.path.exists(os.path.join(task_dir(name), SPEC_FILE)))
+
+def prompt_entry(task_type):
+    """input.json 中一个任务的提示条目（type / function_signatures / contexts）"""
+    spec = load_spec(task_type)
+    return {"type": task_type, "function_signatures": spec["function_signatures"], "contexts": spec["contexts"]}
+
+def render_header(spec):
+    return HEADER_TEMPLATE.format(
+        header=f"{spec['type']}.h",
+        cuda_context=spec["contexts"]["CUDA"], cuda_signature=spec["function_signatures"]["CUDA"],
+        context=spec["contexts"]["other"], signature=spec["function_signatures"]["other"])
+
+def install_harness(task_type, temp_dir):
+    """把共用的 common/ 复制到编译目录，并为没有手写头文件的插件生成统一接口头文件"""
+    if os.path.isdir(COMMON_DIR) and not os.path.exists(os.path.join(temp_dir, 'common')):
+        shutil.copytree(COMMON_DIR, os.path.join(temp_dir, 'common'))
+    spec = load_spec(task_type)
+    if spec is None:
+        return
+    header_path = os.path.join(temp_dir, task_type, f"{task_type}.h")
+    if not os.path.exists(header_path):
+        with open(header_path, 'w') as f:
+            f.write(render_header(spec))
+
+def load_generator(task_type):
+    path = os.path.join(task_dir(task_type), GENERATOR_FILE)
+    if not os.path.exists(path):
+        return None
+    module_spec = importlib.util.spec_from_file_location(f"{task_type}_generator", path)
+    module = importlib.util.module_from_spec(module_spec)
+    module_spec.loader.exec_module(module)
+    return module
+
+def dataset_paths(task_type, dataset, root_dir=ROOT_DIR):
+    """(输入文件, 参考结果文件, 规模参数文件)，与 run_candidate 的结果文件命名一致"""
+    result_name = 'result.txt' if dataset == 'data.txt' else f'result_{dataset}'
+    data_path = os.path.join(root_dir, 'dataset', task_type, dataset)
+    return (data_path, os.path.join(root_dir, 'driver', task_type, result_name),
+            os.path.splitext(data_path)[0] + '.params.json')
+
+def generate_dataset(task_type, stage, dataset, root_dir=ROOT_DIR, seed=SEED, force=False):
+    """按 task.json 中 stage 级的规模生成输入及参考结果，返回是否生成（任务没有该级规模或生成器时返回 False）"""
+    spec = load_spec(task_type)
+    if spec is None or stage not in spec.get("sizes", {}):
+        return False
+    data_path, result_path, params_path = dataset_paths(task_type, dataset, root_dir)
+    if not force and os.path.exists(data_path) and os.path.exists(result_path):
+        return True
+    generator = load_generator(task_type)
+    if generator is None:
+        return False
+    params = spec["sizes"][stage]
+    inputs = generator.generate(params, np.random.default_rng(seed))
+    os.makedirs(os.path.dirname(data_path), exist_ok=True)
+    with open(data_path, 'w') as f:
+        f.write(generator.format_input(inputs))
+    with open(result_path, 'w') as f:
+        f.write(generator.oracle(inputs))
+    with open(params_path, 'w') as f:
+        json.dump(params, f)
+    return True
+
+def load_params(task_type, dataset, root_dir=ROOT_DIR):
+    params_path = dataset_paths(task_type, dataset, root_dir)[2]
+    if not os.path.exists(params_path):
+        return None
+    with open(params_path, 'r') as f:
+        return json.load(f)
+
+_ALLOWED_FUNCS = {'log2': math.log2, 'sqrt': math.sqrt}
+_BINARY_OPS = {ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul,
+               ast.Div: operator.truediv, ast.Pow: operator.pow}
+
+def eval_formula(formula, params):
+    """计算工作量公式（只允许四则运算、幂、log2/sqrt 和规模参数名）"""
+    def visit(node):
+        if isinstance(node, ast.Expression):
+            return visit(node.body)
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+            return node.value
+        if isinstance(node, ast.Name):
+            return params[node.id]
+        if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPS:
+            return _BINARY_OPS[type(node.op)](visit(node.left), visit(node.right))
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in _ALLOWED_FUNCS:
+            return _ALLOWED_FUNCS[node.func.id](*[visit(a) for a in node.args])
+        raise ValueError(f"工作量公式中不支持的表达式: {formula}")
+    return visit(ast.parse(formula, mode='eval'))
+
+def work_summary(task_type, dataset, time_ms, root_dir=ROOT_DIR):
+    """按工作量模型计算核心代码的数据量、操作数和达到的吞吐；缺少模型或规模参数时返回 None"""
+    spec = load_spec(task_type)
+    params = load_params(task_type, dataset, root_dir)
+    if spec is None or params is None or "work" not in spec:
+        return None
+    work = spec["work"]
+    summary = {"bound": work.get("bound"),
+               "bytes": eval_formula(work["bytes"], params), "ops": eval_formula(work["ops"], params)}
+    if time_ms:
+        summary["gb_per_s"] = summary["bytes"] / (time_ms / 1000.0) / 1e9
+        summary["gops"] = summary["ops"] / (time_ms / 1000.0) / 1e9
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description="任务插件：列出任务、生成数据集")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="列出所有任务插件")
+    gen = sub.add_parser("generate", help="按 task.json 中的规模生成输入和参考结果")
+    gen.add_argument("task")
+    gen.add_argument("--stage", default="full", help="task.json sizes 中的规模级别")
+    gen.add_argument("--dataset", default="data.txt", help="写入 dataset/<任务>/ 的文件名")
+    gen.add_argument("--seed", type=int, default=SEED)
+    args = parser.parse_args()
+
+    if args.command == "list":
+        for name in list_tasks():
+            spec = load_spec(name)
+            print(f"{name}: {spec.get('description', '')} (sizes: {', '.join(spec.get('sizes', {}))})")
+        return
+    if not generate_dataset(args.task, args.stage, args.dataset, seed=args.seed, force=True):
+        print(f"任务 {args.task} 没有 {args.stage} 级规模或生成器")
+        sys.exit(1)
+    print(f"已生成 {dataset_paths(args.task, args.dataset)[0]}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import os
+import json
+import statistics
+
+DRIVER_DIR = os.path.dirname(os.path.abspath(__file__))
+# 基准测试历史记录（JSON Lines），由 driver.py 追加，供超时计算、代价模型和回归检测使用
+HISTORY_FILE = os.path.join(DRIVER_DIR, 'history.jsonl')
+# 可选的参考运行时间表：{"<task_type>/<dataset>": 墙钟毫秒}，优先于历史中位数
+REFERENCE_FILE = os.path.join(DRIVER_DIR, 'reference_runtimes.json')
+
+# 超时 = k × 基准运行时间，再限制在 [floor, ceiling] 秒之间；没有基准时使用 default
+TIMEOUT_FACTOR = 5
+TIMEOUT_FLOOR = 10
+TIMEOUT_CEILING = 1800
+DEFAULT_TIMEOUT = 300
+
+def load_reference(task_type, dataset, reference_file=REFERENCE_FILE):
+    if not os.path.exists(reference_file):
+        return None
+    with open(reference_file, 'r') as f:
+        return json.load(f).get(f"{task_type}/{dataset}")
+
+def historical_median(task_type, dataset, framework=None, mpi_ranks=None, history_file=HISTORY_FILE):
+    """历史记录中该 (任务, 数据集, 框架, MPI 进程数) 验证通过运行的墙钟时间中位数（毫秒）
+
+    不同框架的运行时间可差几个数量级（如 CUDA 与 Serial），只用同一框架、同一进程数的记录；
+    framework 为空时不区分框架。
+    """
+    if not os.path.exists(history_file):
+        return None
+    runtimes = []
+    with open(history_file, 'r') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if framework is not None and (record['framework'] != framework or record.get('mpi_ranks') != mpi_ranks):
+                continue
+            if record['task_type'] == task_type and record['dataset'] == dataset \
+                    and record['status'] == 'success' and record['verified'] and record['runtime_ms']:
+                runtimes.append(record['runtime_ms'])
+    return statistics.median(runtimes) if runtimes else None
+
+def compute_timeout(task_type, dataset, framework=None, mpi_ranks=None, k=TIMEOUT_FACTOR, floor=TIMEOUT_FLOOR,
+                    ceiling=TIMEOUT_CEILING, default=DEFAULT_TIMEOUT, history_file=HISTORY_FILE,
+                    reference_file=REFERENCE_FILE):
+    """计算 (任务, 数据集) 的超时时间（秒），返回 (超时, 基准来源)
+
+    历史基准按框架和 MPI 进程数区分，该组合没有历史记录时使用 default。
+    """
+    baseline_ms = load_reference(task_type, dataset, reference_file)
+    source = 'reference'
+    if baseline_ms is None:
+        baseline_ms = historical_median(task_type, dataset, framework, mpi_ranks, history_file)
+        source = 'history'
+    if baseline_ms is None:
+        return default, 'default'
+    return min(max(k * baseline_ms / 1000.0, floor), ceiling), source
@@ -0,0 +1,106 @@
+import os
+import json
+
+# Chrome trace-event 格式（chrome://tracing 和 ui.perfetto.dev 都能直接打开），时间单位为微秒
+# 驱动进程一条轨道记录编译和各阶段区间，被测程序一条轨道记录运行区间、测试程序阶段和硬件计数器
+DRIVER_PID = 1
+BENCH_PID = 2
+DRIVER_TID = 1
+BENCH_TID = 2
+
+def to_us(timestamp):
+    return int(timestamp * 1e6)
+
+def harness_phases(result):
+    """按测试程序输出的 [METRICS] 时间戳把一次运行分成 [(阶段, 开始, 结束)]
+
+    有 LOAD_* 标记时为进程启动、读取输入、核心代码、写出结果四段，否则读取阶段从进程启动算起；
+    没有核心代码时间戳时整次运行为一段 "run"，缺少运行区间时返回空列表。
+    """
+    start, end = result.get("start_time"), result.get("end_time")
+    if start is None or end is None:
+        return []
+    phase_times = result.get("phase_times")
+    load = result.get("load")
+    if not phase_times:
+        return [("run", start, end)]
+    kernel_start, kernel_end = phase_times["bfs_start"], phase_times["bfs_end"]
+    phases = [("startup", start, load["start"]), ("load", load["start"], load["end"])] if load \
+        else [("load", start, kernel_start)]
+    return phases + [("kernel", kernel_start, kernel_end), ("write", kernel_end, end)]
+
+class TraceRecorder:
+    """收集一次任务的编译、冒烟阶段和完整运行的时间区间以及硬件采样，导出为 trace-event JSON"""
+
+    def __init__(self, label):
+        self.label = label
+        self.events = [
+            {"name": "process_name", "ph": "M", "pid": DRIVER_PID, "args": {"name": f"driver: {label}"}},
+            {"name": "thread_name", "ph": "M", "pid": DRIVER_PID, "tid": DRIVER_TID, "args": {"name": "pipeline"}},
+            {"name": "process_name", "ph": "M", "pid": BENCH_PID, "args": {"name": "benchmark"}},
+            {"name": "thread_name", "ph": "M", "pid": BENCH_PID, "tid": BENCH_TID, "args": {"name": "phases"}},
+        ]
+
+    def span(self, name, start, end, pid=DRIVER_PID, tid=DRIVER_TID, cat="driver", args=None):
+        """完整区间事件（ph=X），start/end 为秒级时间戳"""
+        self.events.append({"name": name, "cat": cat, "ph": "X", "pid": pid, "tid": tid,
+                            "ts": to_us(start), "dur": max(to_us(end) - to_us(start), 0), "args": args or {}})
+
+    def instant(self, name, timestamp, args=None):
+        self.events.append({"name": name, "cat": "driver", "ph": "i", "s": "t", "pid": DRIVER_PID,
+                            "tid": DRIVER_TID, "ts": to_us(timestamp), "args": args or {}})
+
+    def counter(self, name, timestamp, values):
+        """计数器事件（ph=C），同一 name 的各个 key 显示为一条堆叠轨道"""
+        self.events.append({"name": name, "ph": "C", "pid": BENCH_PID, "ts": to_us(timestamp),
+                            "args": {k: float(v) for k, v in values.items()}})
+
+    def add_run(self, name, result, monitor=None):
+        """记录一次 run_candidate 的运行区间、测试程序阶段以及 monitor 中的硬件采样"""
+        start, end = result.get("start_time"), result.get("end_time")
+        if start is None or end is None:
+            return
+        self.span(name, start, end, args={"dataset": result["dataset"], "status": result["status"],
+                                          "time_ms": result["time_ms"], "peak_rss_kb": result.get("peak_rss_kb")})
+
+        # 测试程序输出的 [METRICS] 时间戳把运行分成进程启动、读取输入、核心代码、写出结果几段
+        load = result.get("load")
+        for phase, phase_start, phase_end in harness_phases(result):
+            args = {"bytes": load["bytes"], "mb_per_s": load["mb_per_s"]} if phase == "load" and load else None
+            energy = (result.get("energy") or {}).get("phases", {}).get(phase)
+            if energy:
+                args = dict(args or {}, joules=energy["joules"], avg_w=energy["avg_w"])
+            self.span(name if phase == "run" else phase, phase_start, phase_end, BENCH_PID, BENCH_TID, "harness", args)
+
+        if monitor is not None:
+            self.add_samples(monitor.metrics_log)
+            self.add_perf_intervals(monitor.perf_intervals)
+            if monitor.rapl is not None:
+                for timestamp, watts in monitor.rapl.power_series():
+                    self.counter("RAPL power (W)", timestamp, watts)
+
+    def add_samples(self, metrics_log):
+        for m in metrics_log:
+            ts = m["timestamp"]
+            self.counter("CPU per core (%)", ts, {f"cpu{i}": v for i, v in enumerate(m["cpu_per_core"])})
+            self.counter("CPU (%)", ts, {"avg": m["cpu_usage"]})
+            if "rss_kb" in m:
+                self.counter("RSS (MB)", ts, {"rss": m["rss_kb"] / 1024})
+                self.counter("threads", ts, {"threads": m["num_threads"]})
+            if m.get("numa_node_kb"):
+                self.counter("NUMA memory (MB)", ts, {f"node{i}": kb / 1024 for i, kb in enumerate(m["numa_node_kb"])})
+            if m["gpu_usage"]:
+                self.counter("GPU util (%)", ts, {f"gpu{i}": v for i, v in enumerate(m["gpu_usage"])})
+                self.counter("GPU memory (%)", ts, {f"gpu{i}": g["percent"] for i, g in enumerate(m["gpu_memory"])})
+
+    def add_perf_intervals(self, intervals):
+        """perf stat -I 的每个区间的事件计数，每个事件一条轨道"""
+        for interval in intervals:
+            self.counter(f"perf {interval['event']}", interval["timestamp"], {"count": interval["count"]})
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump({"traceEvents": self.events, "displayTimeUnit": "ms",
+                       "otherData": {"label": self.label}}, f)
+        return path
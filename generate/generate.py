@@ -1,8 +1,13 @@
 # https://api.siliconflow.cn/v1/chat/completions
 import json
 import os
-from openai import OpenAI
 from config import CONFIG
+import llm_client
+import prompt_builder
+from llm_metrics import timed_completion, summarize_calls, print_summary
+
+# 任务插件目录：driver/<任务>/task.json 提供函数签名和上下文
+DRIVER_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "driver")
 
 def check_available_devices(hardware):
     available_devices = []
@@ -36,15 +41,21 @@ def extract_framework_from_code(code_content):
     else:
         return "Serial"
 
-def generate_code(config_path):
-    with open(config_path, "r", encoding="utf-8") as f:
-        config = json.load(f)
+# 输出格式要求（所有任务共用）
+FORMAT_PROMPT = "Please output the code strictly in the following format:\n1. The code must start with\n```cpp\nand end with\n```\nThere should be no content other than C++ code in between.\n2. Only output the function implementation corresponding to the selected framework, do not output the structure definitions given in the prompt.\n3. Do not output any explanatory text or comments.\n4. Specify the selected framework before the code (e.g., Selected framework: <Framework name>).\n5. Try to reduce resource consumption according to the hardware conditions as much as possible.\n6. Check the logic of the code before giving the final result, optimize the memory usage and modify it. Check if the output format meets the requirements."
 
-    global_output = {
-        "tasks": []
-    }
+# 可选框架
+AVAILABLE_FRAMEWORKS = [
+    "Serial",
+    #"OpenMP",
+    #"TBB",
+    # "MPI",
+    #"CUDA",
+]
 
-    available_devices = check_available_devices(config["hardware"])
+def describe_devices(hardware):
+    """把硬件配置整理成提示中的一行描述"""
+    available_devices = check_available_devices(hardware)
     available_devices_info = []
     for device in available_devices:
         if device["type"] == "CPU":
@@ -52,165 +63,230 @@ def generate_code(config_path):
         else:
             device_info = f"GPU (CUDA Cores: {device['cores']}, Memory: {device['memory'].get('size', 'N/A')})"
         available_devices_info.append(device_info)
-    available_devices_info = ", ".join(available_devices_info)
-
-    available_frameworks = [
-        "Serial",
-        #"OpenMP",
-        #"TBB",
-        # "MPI",
-        #"CUDA",
-    ]
+    return ", ".join(available_devices_info)
 
-    for task in config["tasks"]:
-        system_prompt = f"""You are a C++ expert. Generate optimized parallel computing code based on the following configuration:
-        - Task type: {task['type']}
-        - Hardware configuration: {available_devices_info}
-        - Available frameworks: {', '.join(available_frameworks)}
-        Please select the most suitable framework from the available ones according to the hardware information and task requirements (you must choose one). The generated code should utilize all hardware resources as much as possible while reducing memory overhead. If you choose Serial, do not use any parallel frameworks or methods.
-
-        **Optimization Goals**:
-        - Minimize memory usage.
-        - Maximize CPU/GPU utilization.
-        - Ensure thread safety and avoid race conditions.
-        - Consider parallel-friendly data structures to maximize performance.
-
-        **Code Review and Correction**:
-        - Check the logic of the generated code for correctness.
-        - Ensure that the code adheres to best practices for the selected framework.
-        - Modify the code if necessary to improve performance and reduce resource consumption.
-        
-        **Framework Information**:
-        - All frameworks provide parallelism capabilities, but have different strengths and use cases.
-        - Choose the most appropriate one based on the hardware and task requirements.
-        """
-        
-        user_prompt_content = f"Generate optimized parallel computing code according to the task:\n\n"
-        for framework in available_frameworks:
-            if framework == "CUDA":
-                function_signature = task["function_signatures"]["CUDA"]
-                context = task["contexts"]["CUDA"]
-            else:
-                function_signature = task["function_signatures"]["other"]
-                context = task["contexts"]["other"]
-            
-            # Add headers for TBB framework option, keeping it simple
-            if framework == "TBB":
-                tbb_headers = """
-                #include <tbb/tbb.h>
-                #include <tbb/parallel_for.h>
-                #include <tbb/parallel_reduce.h>
-                """
-                context = tbb_headers + context
-            
-            user_prompt_content += f"If you choose the {framework} framework:\nIncluded header files and structure definitions:\n{context}\n\nFunction signature:\n{function_signature}\n\n"
-
-        user_prompt_content += """
-        **Optimization Instructions**:
-        - Use efficient data structures to minimize memory footprint.
-        - Ensure that the code is thread-safe and avoids race conditions.
-        - Optimize loop structures to reduce overhead.
-        - Use appropriate parallel constructs to maximize hardware utilization.
-        - Consider data structures that work well in parallel environments.
+# "compact"：固定说明在前、任务内容在后的紧凑提示（见 prompt_builder.py）；"legacy"：旧的逐框架重复的提示
+PROMPT_STYLE = "compact"
+
+def build_messages(task, available_devices_info, available_frameworks=AVAILABLE_FRAMEWORKS, style=None):
+    """构建单个任务的对话消息"""
+    if (style or PROMPT_STYLE) == "legacy":
+        return build_legacy_messages(task, available_devices_info, available_frameworks)
+    return prompt_builder.build_messages(task, available_devices_info, available_frameworks)
+
+def build_legacy_messages(task, available_devices_info, available_frameworks=AVAILABLE_FRAMEWORKS):
+    """旧的提示：每个任务重复完整的优化说明，并逐个框架列出上下文和函数签名"""
+    system_prompt = f"""You are a C++ expert. Generate optimized parallel computing code based on the following configuration:
+    - Task type: {task['type']}
+    - Hardware configuration: {available_devices_info}
+    - Available frameworks: {', '.join(available_frameworks)}
+    Please select the most suitable framework from the available ones according to the hardware information and task requirements (you must choose one). The generated code should utilize all hardware resources as much as possible while reducing memory overhead. If you choose Serial, do not use any parallel frameworks or methods.
+
+    **Optimization Goals**:
+    - Minimize memory usage.
+    - Maximize CPU/GPU utilization.
+    - Ensure thread safety and avoid race conditions.
+    - Consider parallel-friendly data structures to maximize performance.
+
+    **Code Review and Correction**:
+    - Check the logic of the generated code for correctness.
+    - Ensure that the code adheres to best practices for the selected framework.
+    - Modify the code if necessary to improve performance and reduce resource consumption.
+    
+    **Framework Information**:
+    - All frameworks provide parallelism capabilities, but have different strengths and use cases.
+    - Choose the most appropriate one based on the hardware and task requirements.
+    """
+    
+    user_prompt_content = f"Generate optimized parallel computing code according to the task:\n\n"
+    for framework in available_frameworks:
+        if framework == "CUDA":
+            function_signature = task["function_signatures"]["CUDA"]
+            context = task["contexts"]["CUDA"]
+        else:
+            function_signature = task["function_signatures"]["other"]
+            context = task["contexts"]["other"]
         
-        For each framework:
-        - Serial: Use efficient sequential algorithms
-        - OpenMP: Use pragmas for parallel loops and sections
-        - TBB: Use parallel algorithms for task parallelism
-        - CUDA: Utilize GPU cores for massively parallel computations
-        """
+        # Add headers for TBB framework option, keeping it simple
+        if framework == "TBB":
+            tbb_headers = """
+            #include <tbb/tbb.h>
+            #include <tbb/parallel_for.h>
+            #include <tbb/parallel_reduce.h>
+            """
+            context = tbb_headers + context
         
-        user_prompt = {
-            "role": "user",
-            "content": user_prompt_content
-        }
+        user_prompt_content += f"If you choose the {framework} framework:\nIncluded header files and structure definitions:\n{context}\n\nFunction signature:\n{function_signature}\n\n"
+
+    user_prompt_content += """
+    **Optimization Instructions**:
+    - Use efficient data structures to minimize memory footprint.
+    - Ensure that the code is thread-safe and avoids race conditions.
+    - Optimize loop structures to reduce overhead.
+    - Use appropriate parallel constructs to maximize hardware utilization.
+    - Consider data structures that work well in parallel environments.
+    
+    For each framework:
+    - Serial: Use efficient sequential algorithms
+    - OpenMP: Use pragmas for parallel loops and sections
+    - TBB: Use parallel algorithms for task parallelism
+    - CUDA: Utilize GPU cores for massively parallel computations
+    - MPI: The test program calls MPI_Init/MPI_Finalize itself and runs the function on every rank with the full input; do not call them, only the result on rank 0 is verified; OpenMP is enabled, so each rank may use #pragma omp threads
+    """
+    
+    return [
+        {"role": "system", "content": FORMAT_PROMPT},
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt_content}
+    ]
+
+def create_client(base_url=None):
+    # base_url 为空时依次使用 LLM_BASE_URL 和 DashScope 地址，见 llm_client.py
+    return llm_client.create_client("dashscope", base_url)
+
+def request_completion(client, model, messages, temperature=0.2):
+    """请求一次补全，返回 (模型输出文本, 调用记录)，调用记录见 llm_metrics.py
+
+    调用记录附带提示的 token 估计（prompt_tokens_est / static_prefix_tokens_est），
+    与服务端返回的 prompt_tokens、cached_tokens 一起用于比较提示长度和前缀缓存命中。
+    """
+    response_content, llm_call = timed_completion(
+        client, model, messages,
+        temperature=temperature,
+        max_tokens=2500,
+        stop=["\n```\n"]
+    )
+    llm_call.update(prompt_builder.prompt_stats(messages))
+    return response_content, llm_call
+
+def parse_response(response_content):
+    """从模型输出中提取所选框架和代码，没有代码时返回 (None, None)"""
+    response_lines = response_content.strip().split("\n")
 
-        client = OpenAI(
-            api_key=os.getenv('DASHSCOPE_API_KEY'),
-            base_url="https://dashscope.aliyuncs.com/compatible-mode/v1"
-        )
+    framework = None
+    code_lines = []
+    inside_code_block = False
+
+    # Extract framework information from the response
+    for line in response_lines:
+        if "Selected framework:" in line:
+            framework_text = line.split("Selected framework:")[1].strip()
+            # Clean up the framework name
+            if framework_text == "Intel TBB" or framework_text == "TBB":
+                framework = "TBB"
+            elif framework_text == "OpenMP":
+                framework = "OpenMP"
+            elif framework_text == "CUDA":
+                framework = "CUDA"
+            elif framework_text == "MPI":
+                framework = "MPI"
+            elif "Serial" in framework_text:
+                framework = "Serial"
         
-        messages = [
-            {"role": "system", "content": system_prompt},
-            user_prompt
-        ]
-
-        completion = client.chat.completions.create(
-            model=CONFIG["model"],
-            messages=[
-                {
-                    "role": "system",
-                    "content": f"Please output the code strictly in the following format:\n1. The code must start with\n```cpp\nand end with\n```\nThere should be no content other than C++ code in between.\n2. Only output the function implementation corresponding to the selected framework, do not output the structure definitions given in the prompt.\n3. Do not output any explanatory text or comments.\n4. Specify the selected framework before the code (e.g., Selected framework: <Framework name>).\n5. Try to reduce resource consumption according to the hardware conditions as much as possible.\n6. Check the logic of the code before giving the final result, optimize the memory usage and modify it. Check if the output format meets the requirements."
-                },
-                *messages
-            ],
-            temperature=0.2,
-            max_tokens=2500,
-            stop=["\n```\n"]
-        )
-
-        response_content = completion.choices[0].message.content
-        response_lines = response_content.strip().split("\n")
-
-        framework = None
-        code_lines = []
-        inside_code_block = False
-
-        # Extract framework information from the response
-        for line in response_lines:
-            if "Selected framework:" in line:
-                framework_text = line.split("Selected framework:")[1].strip()
-                # Clean up the framework name
-                if framework_text == "Intel TBB" or framework_text == "TBB":
-                    framework = "TBB"
-                elif framework_text == "OpenMP":
-                    framework = "OpenMP"
-                elif framework_text == "CUDA":
-                    framework = "CUDA"
-                elif framework_text == "MPI":
-                    framework = "MPI"
-                elif "Serial" in framework_text:
-                    framework = "Serial"
-            
-            if line.startswith("```cpp"):
-                inside_code_block = True
-                continue
-            elif line.startswith("```"):
-                inside_code_block = False
-                continue
-            if inside_code_block:
-                code_lines.append(line)
-
-        if not code_lines:
-            print("Warning: No code content detected, this task will be skipped.")
+        if line.startswith("```cpp"):
+            inside_code_block = True
+            continue
+        elif line.startswith("```"):
+            inside_code_block = False
             continue
+        if inside_code_block:
+            code_lines.append(line)
+
+    if not code_lines:
+        return None, None
+
+    code_content = "\n".join(code_lines).strip()
+
+    # If the framework information is not detected, try to infer the framework from the code content
+    if framework is None:
+        framework = extract_framework_from_code(code_content)
+        print(f"Framework inferred from the code content: {framework}")
+    return framework, code_content
+
+def load_config(config_path):
+    """读取 input.json；只写了 type 的任务从 driver/<type>/task.json 补全函数签名和上下文"""
+    with open(config_path, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    for task in config["tasks"]:
+        if "function_signatures" not in task:
+            with open(os.path.join(DRIVER_DIR, task["type"], "task.json"), "r", encoding="utf-8") as f:
+                spec = json.load(f)
+            task.setdefault("function_signatures", spec["function_signatures"])
+            task.setdefault("contexts", spec["contexts"])
+    return config
+
+def generate_task(client, model, task, config, available_devices_info):
+    """生成单个任务的代码，返回 (任务输出, 调用记录)；没有解析出代码时任务输出为 None"""
+    messages = build_messages(task, available_devices_info)
+    response_content, llm_call = request_completion(client, model, messages)
+    framework, code_content = parse_response(response_content)
+
+    if code_content is None:
+        print("Warning: No code content detected, this task will be skipped.")
+        if llm_call["truncated"]:
+            print("The response was truncated by max_tokens.")
+        return None, llm_call
 
-        code_content = "\n".join(code_lines).strip()
-
-        # If the framework information is not detected, try to infer the framework from the code content
-        if framework is None:
-            framework = extract_framework_from_code(code_content)
-            print(f"Framework inferred from the code content: {framework}")
-
-        print(f"Selected framework: {framework}")
-        print("*" * 60)
-        print(f"Code implementation:\n{code_content}")
-        print("*" * 60)
-
-        task_output = {
-            "metadata": {
-                "task_type": task["type"],
-                "hardware": config["hardware"],
-                "code": code_content,
-                "framework": framework
-            }
+    print(f"Selected framework: {framework}")
+    print("*" * 60)
+    print(f"Code implementation:\n{code_content}")
+    print("*" * 60)
+
+    task_output = {
+        "metadata": {
+            "task_type": task["type"],
+            "hardware": config["hardware"],
+            "resources": config.get("resources"),
+            "code": code_content,
+            "framework": framework,
+            "llm_call": llm_call
         }
-        global_output["tasks"].append(task_output)
+    }
+    return task_output, llm_call
 
-    with open("output.json", "w") as f:
+def save_output(global_output, calls, output_path):
+    """附上调用汇总后写出 output.json"""
+    global_output["llm_summary"] = summarize_calls(calls)
+    print_summary(global_output["llm_summary"])
+    with open(output_path, "w") as f:
         json.dump(global_output, f, indent=2, ensure_ascii=False)
 
-    print("Code generation for all tasks is completed. The results have been saved to output.json.")
+def generate_code(config_path, model=None, output_path="output.json", base_url=None):
+    # model 为空时使用 config.py 中的默认模型
+    model = model or CONFIG["model"]
+    config = load_config(config_path)
+
+    global_output = {
+        "tasks": [],
+        # 没有解析出代码的任务只保留调用记录
+        "skipped_tasks": []
+    }
+
+    available_devices_info = describe_devices(config["hardware"])
+    client = create_client(base_url)
+
+    calls = []
+    for task in config["tasks"]:
+        # 单个任务重试用尽或熔断时只跳过该任务，已生成的任务照常保存
+        try:
+            task_output, llm_call = generate_task(client, model, task, config, available_devices_info)
+            error = None
+        except Exception as e:
+            print(f"任务 {task['type']} 请求失败: {e}")
+            task_output, llm_call, error = None, getattr(e, "llm_call", None), str(e)
+        if llm_call is not None:
+            calls.append(llm_call)
+        if task_output is None:
+            skipped = {"task_type": task["type"], "llm_call": llm_call}
+            if error is not None:
+                skipped["error"] = error
+            global_output["skipped_tasks"].append(skipped)
+        else:
+            global_output["tasks"].append(task_output)
+
+    save_output(global_output, calls, output_path)
+    print(f"Code generation for all tasks is completed. The results have been saved to {output_path}.")
+    return global_output
 
 if __name__ == "__main__":
     generate_code("input.json")
@@ -1,8 +1,8 @@
 # https://api.siliconflow.cn/v1/chat/completions
 import json
-import os
-from openai import OpenAI
 from config import CONFIG
+from llm_client import create_client
+from llm_metrics import timed_completion, summarize_calls, print_summary
 
 def check_available_devices(hardware):
     available_devices = []
@@ -41,7 +41,9 @@ def generate_code(config_path):
         config = json.load(f)
 
     global_output = {
-        "tasks": []
+        "tasks": [],
+        # 没有解析出代码的任务只保留调用记录
+        "skipped_tasks": []
     }
 
     available_devices = check_available_devices(config["hardware"])
@@ -62,6 +64,7 @@ def generate_code(config_path):
         "CUDA",
     ]
 
+    calls = []
     for task in config["tasks"]:
         system_prompt = f"""You are a C++ expert. Generate optimized parallel computing code based on the following configuration:
         - Task type: {task['type']}
@@ -125,19 +128,17 @@ def generate_code(config_path):
             "content": user_prompt_content
         }
 
-        client = OpenAI(
-           api_key=os.getenv('O3_API_KEY'),
-           base_url="https://api.o3.fan/v1"
-        )
+        # 重试由 timed_completion 负责并计数；设置 LLM_BASE_URL 时发往该地址
+        client = create_client("o3")
         
         messages = [
             {"role": "system", "content": system_prompt},
             user_prompt
         ]
 
-        completion = client.chat.completions.create(
-            model=CONFIG["model"],
-            messages=[
+        response_content, llm_call = timed_completion(
+            client, CONFIG["model"],
+            [
                 {
                     "role": "system",
                     "content": f"Please output the code strictly in the following format:\n1. The code must start with\n```cpp\nand end with\n```\nThere should be no content other than C++ code in between.\n2. Only output the function implementation corresponding to the selected framework, do not output the structure definitions given in the prompt.\n3. Do not output any explanatory text or comments.\n4. Specify the selected framework before the code (e.g., Selected framework: <Framework name>).\n5. Try to reduce resource consumption according to the hardware conditions as much as possible.\n6. Check the logic of the code before giving the final result, optimize the memory usage and modify it. Check if the output format meets the requirements."
@@ -149,7 +150,7 @@ def generate_code(config_path):
             stop=["\n```\n"]
         )
 
-        response_content = completion.choices[0].message.content
+        calls.append(llm_call)
         response_lines = response_content.strip().split("\n")
 
         framework = None
@@ -183,6 +184,7 @@ def generate_code(config_path):
 
         if not code_lines:
             print("Warning: No code content detected, this task will be skipped.")
+            global_output["skipped_tasks"].append({"task_type": task["type"], "llm_call": llm_call})
             continue
 
         code_content = "\n".join(code_lines).strip()
@@ -202,11 +204,14 @@ def generate_code(config_path):
                 "task_type": task["type"],
                 "hardware": config["hardware"],
                 "code": code_content,
-                "framework": framework
+                "framework": framework,
+                "llm_call": llm_call
             }
         }
         global_output["tasks"].append(task_output)
 
+    global_output["llm_summary"] = summarize_calls(calls)
+    print_summary(global_output["llm_summary"])
     with open("output.json", "w") as f:
         json.dump(global_output, f, indent=2, ensure_ascii=False)
 
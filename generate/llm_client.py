@@ -0,0 +1,196 @@
+import os
+import time
+import random
+import threading
+import email.utils
+import httpx
+from openai import OpenAI
+
+# 各服务商的 OpenAI 兼容接口地址和密钥环境变量
+PROVIDERS = {
+    "dashscope": ("https://dashscope.aliyuncs.com/compatible-mode/v1", "DASHSCOPE_API_KEY"),
+    "siliconflow": ("https://api.siliconflow.cn/v1", "SILI_KEY"),
+    "o3": ("https://api.o3.fan/v1", "O3_API_KEY"),
+}
+
+# 每个服务商、每个模型的请求速率上限（令牌桶：每秒补充 rps 个，最多积累 burst 个）
+# 环境变量 LLM_RPS 设置后覆盖所有服务商的 rps，0 表示不限速
+RATE_LIMITS = {
+    "dashscope": {"rps": 5.0, "burst": 10},
+    "siliconflow": {"rps": 2.0, "burst": 4},
+    "o3": {"rps": 2.0, "burst": 4},
+}
+RPS_ENV = "LLM_RPS"
+
+# 连接池：所有线程共用一个客户端，复用 keep-alive 连接
+POOL_SIZE = 32
+KEEPALIVE_EXPIRY = 60.0
+REQUEST_TIMEOUT = httpx.Timeout(600.0, connect=10.0)
+
+# 熔断：同一接口连续失败 FAILURE_THRESHOLD 次后暂停 COOLDOWN 秒，期间的请求直接失败；
+# 冷却结束后放行一个探测请求，成功则恢复
+FAILURE_THRESHOLD = 5
+COOLDOWN = 30.0
+
+# 重试等待的上限（秒），服务端 Retry-After 更长时仍以服务端为准
+MAX_RETRY_DELAY = 60.0
+
+# 设置后所有请求都发往该地址（如 replay_server.py 启动的本地回放服务），覆盖服务商的默认地址
+BASE_URL_ENV = "LLM_BASE_URL"
+
+class CircuitOpenError(Exception):
+    """接口处于熔断状态，请求没有发出"""
+
+class TokenBucket:
+    def __init__(self, rps, burst):
+        self.rps = rps
+        self.capacity = max(burst, 1)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        # 收到 429 后整个桶暂停到该时刻，所有线程一起等待
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """取一个令牌，不足时阻塞等待，返回等待的秒数"""
+        if not self.rps:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rps)
+                self.updated = now
+                if now >= self.paused_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = max(self.paused_until - now, (1 - self.tokens) / self.rps)
+            time.sleep(delay)
+            waited += delay
+
+    def pause(self, seconds):
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+class CircuitBreaker:
+    def __init__(self, threshold=FAILURE_THRESHOLD, cooldown=COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self._lock = threading.Lock()
+
+    def allow(self, name):
+        """熔断期间抛出 CircuitOpenError；冷却结束后只放行一个探测请求，返回本次请求是否为探测请求
+
+        探测请求结束后调用方必须调用 success() 或 failure()，否则熔断器一直处于探测中。
+        """
+        with self._lock:
+            if self.opened_at is None:
+                return False
+            if time.monotonic() - self.opened_at >= self.cooldown and not self.probing:
+                self.probing = True
+                return True
+            raise CircuitOpenError(f"{name} 连续失败 {self.failures} 次，熔断中")
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.probing or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+            self.probing = False
+
+class Endpoint:
+    """一个接口地址的限速和熔断状态，由使用该地址的所有客户端共享"""
+
+    def __init__(self, name, limits):
+        self.name = name
+        self.limits = limits
+        self.breaker = CircuitBreaker()
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, model):
+        with self._lock:
+            if model not in self._buckets:
+                self._buckets[model] = TokenBucket(self.limits["rps"], self.limits["burst"])
+            return self._buckets[model]
+
+_clients = {}
+_endpoints = {}
+_lock = threading.Lock()
+
+def resolve_endpoint(provider="dashscope", base_url=None):
+    """返回 (base_url, api_key)：显式参数 > LLM_BASE_URL > 服务商默认地址
+
+    指向其它地址且没有设置密钥时使用占位密钥，本地回放服务不检查密钥。
+    """
+    default_url, key_env = PROVIDERS[provider]
+    base_url = base_url or os.getenv(BASE_URL_ENV) or default_url
+    api_key = os.getenv(key_env)
+    if api_key is None and base_url != default_url:
+        api_key = "replay"
+    return base_url, api_key
+
+def rate_limits(provider):
+    limits = dict(RATE_LIMITS.get(provider, {"rps": 0.0, "burst": 1}))
+    if os.getenv(RPS_ENV):
+        limits["rps"] = float(os.getenv(RPS_ENV))
+    return limits
+
+def endpoint_for(client):
+    """客户端对应的限速/熔断状态；不是由 create_client 创建的客户端不限速，但仍然熔断"""
+    name = str(getattr(client, "base_url", "default")).rstrip("/")
+    with _lock:
+        if name not in _endpoints:
+            _endpoints[name] = Endpoint(name, {"rps": 0.0, "burst": 1})
+        return _endpoints[name]
+
+def create_client(provider="dashscope", base_url=None):
+    """返回该服务商（地址）共享的客户端，多个线程可以同时使用"""
+    base_url, api_key = resolve_endpoint(provider, base_url)
+    with _lock:
+        key = (base_url, api_key)
+        if key not in _clients:
+            http_client = httpx.Client(
+                limits=httpx.Limits(max_connections=POOL_SIZE, max_keepalive_connections=POOL_SIZE,
+                                    keepalive_expiry=KEEPALIVE_EXPIRY),
+                timeout=REQUEST_TIMEOUT)
+            # 重试由 llm_metrics.timed_completion 按这里的策略负责并计数
+            _clients[key] = OpenAI(api_key=api_key, base_url=base_url, max_retries=0, http_client=http_client)
+            _endpoints.setdefault(base_url.rstrip("/"), Endpoint(base_url.rstrip("/"), rate_limits(provider)))
+        return _clients[key]
+
+def retry_after(error):
+    """从 429/503 响应头中取出服务端要求的等待秒数，没有时返回 None"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        date = email.utils.parsedate_to_datetime(value)
+        return max(date.timestamp() - time.time(), 0.0) if date else None
+
+def retry_delay(error, attempt, base_delay):
+    """下一次重试前的等待秒数：优先使用 Retry-After，否则为带完全随机抖动的指数退避"""
+    delay = retry_after(error)
+    if delay is not None:
+        return delay
+    return random.uniform(0, min(MAX_RETRY_DELAY, base_delay * 2 ** attempt))
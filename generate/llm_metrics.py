@@ -0,0 +1,191 @@
+import sys
+import json
+import time
+import argparse
+import statistics
+import openai
+import llm_client
+
+# 每次模型调用的记录与生成的代码一起保存（metadata["llm_call"]）：
+#   ttft_ms            成功的那次请求从发出到收到第一个内容 token 的时间（流式响应）
+#   latency_ms         成功的那次请求的总时间
+#   wall_ms            含重试和等待的总时间
+#   prompt_tokens / completion_tokens / total_tokens   服务端返回的 usage，缺失时为 None
+#   cached_tokens      命中服务端前缀缓存的提示 token 数（usage.prompt_tokens_details），不支持时为 None
+#   finish_reason      "length" 表示输出被 max_tokens 截断
+#   retries            失败后重试的次数
+#   throttle_ms        本地限速（令牌桶）和重试等待的总时间
+# 限速、退避和熔断策略见 llm_client.py
+MAX_RETRIES = 4
+RETRY_DELAY = 1.0
+
+# 可以重试的错误：连接失败、超时、限流和服务端错误
+RETRYABLE_ERRORS = (openai.APIConnectionError, openai.APITimeoutError, openai.RateLimitError,
+                    openai.InternalServerError)
+
+def new_call(model):
+    return {"model": model, "timestamp": time.time(), "ttft_ms": None, "latency_ms": None, "wall_ms": None,
+            "prompt_tokens": None, "completion_tokens": None, "total_tokens": None, "cached_tokens": None,
+            "finish_reason": None, "truncated": False, "tokens_per_s": None, "retries": 0, "throttle_ms": 0.0,
+            "error": None}
+
+def stream_completion(client, model, messages, call, **params):
+    """流式请求一次补全，边接收边记录首 token 时间、结束原因和用量，返回输出文本"""
+    start = time.perf_counter()
+    stream = client.chat.completions.create(model=model, messages=messages, stream=True,
+                                            stream_options={"include_usage": True}, **params)
+    parts = []
+    for chunk in stream:
+        if chunk.choices:
+            choice = chunk.choices[0]
+            if choice.delta is not None and choice.delta.content:
+                if call["ttft_ms"] is None:
+                    call["ttft_ms"] = (time.perf_counter() - start) * 1000
+                parts.append(choice.delta.content)
+            if choice.finish_reason:
+                call["finish_reason"] = choice.finish_reason
+        if getattr(chunk, "usage", None):
+            call["prompt_tokens"] = chunk.usage.prompt_tokens
+            call["completion_tokens"] = chunk.usage.completion_tokens
+            call["total_tokens"] = chunk.usage.total_tokens
+            details = getattr(chunk.usage, "prompt_tokens_details", None)
+            call["cached_tokens"] = getattr(details, "cached_tokens", None)
+    call["latency_ms"] = (time.perf_counter() - start) * 1000
+    return "".join(parts)
+
+def timed_completion(client, model, messages, max_retries=MAX_RETRIES, retry_delay=RETRY_DELAY, **params):
+    """带计时、用量记录、限速和重试的补全请求，返回 (输出文本, 调用记录)
+
+    重试耗尽或接口熔断时抛出异常，调用记录挂在异常的 llm_call 属性上。
+    """
+    call = new_call(model)
+    endpoint = llm_client.endpoint_for(client)
+    bucket = endpoint.bucket(model)
+    wall_start = time.perf_counter()
+
+    def fail(e):
+        call["error"] = f"{type(e).__name__}: {e}"
+        call["wall_ms"] = (time.perf_counter() - wall_start) * 1000
+        e.llm_call = call
+
+    for attempt in range(max_retries + 1):
+        call.update(ttft_ms=None, finish_reason=None, prompt_tokens=None, completion_tokens=None, total_tokens=None,
+                    cached_tokens=None)
+        try:
+            probe = endpoint.breaker.allow(endpoint.name)
+        except llm_client.CircuitOpenError as e:
+            fail(e)
+            raise
+        resolved = False
+        try:
+            call["throttle_ms"] += bucket.acquire() * 1000
+            content = stream_completion(client, model, messages, call, **params)
+            endpoint.breaker.success()
+            resolved = True
+            break
+        except RETRYABLE_ERRORS as e:
+            delay = llm_client.retry_delay(e, attempt, retry_delay)
+            # 429 说明接口正常但超出配额，不计入熔断（探测请求收到 429 视为接口已恢复）；同一模型的其它请求一起暂停
+            if isinstance(e, openai.RateLimitError):
+                bucket.pause(delay)
+                if probe:
+                    endpoint.breaker.success()
+            else:
+                endpoint.breaker.failure()
+            resolved = True
+            if attempt == max_retries:
+                fail(e)
+                raise
+            call["retries"] += 1
+            call["throttle_ms"] += delay * 1000
+            print(f"[llm] {model} 请求失败（{type(e).__name__}），{delay:.1f}s 后重试")
+            time.sleep(delay)
+        except openai.APIStatusError:
+            # 服务端有响应（如 400），接口本身可用
+            endpoint.breaker.success()
+            resolved = True
+            raise
+        finally:
+            # 其它异常（如响应解析错误、中断）时探测请求也要有结论，否则之后的请求一直被熔断
+            if probe and not resolved:
+                endpoint.breaker.failure()
+    call["wall_ms"] = (time.perf_counter() - wall_start) * 1000
+    call["truncated"] = call["finish_reason"] == "length"
+    # 生成速率按首 token 之后的解码时间计算
+    if call["completion_tokens"] and call["ttft_ms"] is not None and call["latency_ms"] > call["ttft_ms"]:
+        call["tokens_per_s"] = call["completion_tokens"] / ((call["latency_ms"] - call["ttft_ms"]) / 1000)
+    return content, call
+
+def percentile(values, q):
+    """线性插值的百分位数，values 为空时返回 None"""
+    if not values:
+        return None
+    values = sorted(values)
+    pos = (len(values) - 1) * q / 100
+    lo = int(pos)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (pos - lo)
+
+def summarize_calls(calls):
+    """按模型汇总调用记录：延迟分位数、生成速率、token 总量、截断率和失败率"""
+    groups = {}
+    for call in calls:
+        if call:
+            groups.setdefault(call["model"], []).append(call)
+    summary = {}
+    for model, group in sorted(groups.items()):
+        ok = [c for c in group if c["error"] is None]
+        latencies = [c["latency_ms"] for c in ok]
+        ttfts = [c["ttft_ms"] for c in ok if c["ttft_ms"] is not None]
+        rates = [c["tokens_per_s"] for c in ok if c["tokens_per_s"] is not None]
+        summary[model] = {
+            "calls": len(group),
+            "errors": len(group) - len(ok),
+            "retries": sum(c["retries"] for c in group),
+            "latency_p50_ms": percentile(latencies, 50),
+            "latency_p95_ms": percentile(latencies, 95),
+            "ttft_p50_ms": percentile(ttfts, 50),
+            "ttft_p95_ms": percentile(ttfts, 95),
+            "tokens_per_s": statistics.median(rates) if rates else None,
+            "prompt_tokens": sum(c["prompt_tokens"] or 0 for c in ok),
+            "prompt_tokens_p50": percentile([c["prompt_tokens"] for c in ok if c["prompt_tokens"] is not None], 50),
+            "cached_tokens": sum(c.get("cached_tokens") or 0 for c in ok),
+            "completion_tokens": sum(c["completion_tokens"] or 0 for c in ok),
+            "truncation_rate": sum(1 for c in ok if c["truncated"]) / len(ok) if ok else None,
+        }
+    return summary
+
+def calls_from_output(output):
+    """从 generate_code 的输出中取出所有调用记录（包括没有解析出代码而跳过的任务）"""
+    tasks = output.get("tasks", []) + output.get("skipped_tasks", [])
+    return [t.get("metadata", t).get("llm_call") for t in tasks if t.get("metadata", t).get("llm_call")]
+
+def print_summary(summary):
+    fmt = lambda v, spec=".0f": "-" if v is None else format(v, spec)
+    for model, s in summary.items():
+        print(f"{model}: {s['calls']} 次调用（失败 {s['errors']}，重试 {s['retries']}），"
+              f"延迟 p50/p95 {fmt(s['latency_p50_ms'])}/{fmt(s['latency_p95_ms'])}ms，"
+              f"首 token p50 {fmt(s['ttft_p50_ms'])}ms，{fmt(s['tokens_per_s'], '.1f')} tokens/s，"
+              f"token {s['prompt_tokens']}+{s['completion_tokens']}（缓存命中 {s['cached_tokens']}），截断率 {fmt(s['truncation_rate'], '.0%')}")
+
+def main():
+    parser = argparse.ArgumentParser(description="按模型汇总生成结果中的调用延迟、token 用量和截断率")
+    parser.add_argument("outputs", nargs="+", help="generate.py 输出的 output.json（可以是多个模型的）")
+    parser.add_argument("--json", help="把汇总另存为 JSON")
+    args = parser.parse_args()
+
+    calls = []
+    for path in args.outputs:
+        with open(path, "r", encoding="utf-8") as f:
+            calls.extend(calls_from_output(json.load(f)))
+    if not calls:
+        print("输出中没有调用记录")
+        sys.exit(1)
+    summary = summarize_calls(calls)
+    print_summary(summary)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+import sys
+import argparse
+
+# 紧凑、对前缀缓存友好的提示：
+#   system  固定说明（输出格式、目标、硬件、可选框架及其要点），同一次运行的所有任务完全相同，
+#           服务端的前缀缓存可以复用这一段
+#   user    只包含任务相关内容：任务类型、头文件与结构定义、函数签名；
+#           上下文和签名相同的框架只写一次，不可选的框架（如 CUDA）不输出
+# 每个框架的要点只包含可选的框架。旧的逐框架重复的提示保留为 generate.build_legacy_messages，用于对比。
+
+# 没有 tiktoken 时按字符估计 token 数：ASCII 约 4 个字符一个 token，其它字符（中文等）各算一个
+CHARS_PER_TOKEN = 4
+TOKEN_ENCODING = "cl100k_base"
+
+FRAMEWORK_NOTES = {
+    "Serial": "efficient sequential algorithm; do not use any parallel framework or threads.",
+    "OpenMP": "#pragma omp parallel for / reduction on the hot loops; avoid false sharing.",
+    "TBB": "include <tbb/tbb.h>; tbb::parallel_for / parallel_reduce over tbb::blocked_range.",
+    "CUDA": "write the __global__ kernels and the host function; use coalesced accesses and minimize transfers.",
+    "MPI": ("the harness calls MPI_Init/MPI_Finalize and runs the function on every rank with the full input; "
+            "do not call them yourself. Only the result on rank 0 is verified. "
+            "The build enables OpenMP, so #pragma omp may be used inside each rank (OMP_NUM_THREADS threads per rank)."),
+}
+
+SYSTEM_TEMPLATE = """You are a C++ expert writing optimized code for a benchmark harness.
+Output format:
+1. First line: Selected framework: <framework name>
+2. Then a single ```cpp code block with only the function implementation for that framework. Do not repeat the structure definitions given in the task, and do not add explanations or comments.
+Goals, in order: correct results; full use of the available hardware; low memory usage; no data races. Check the logic before answering.
+Hardware: {devices}
+Available frameworks (choose exactly one): {frameworks}
+{notes}"""
+
+USER_TEMPLATE = """Task: {task_type}
+{blocks}"""
+
+BLOCK_TEMPLATE = """Headers and definitions{scope}:
+{context}
+Function signature{scope}:
+{signature}"""
+
+def build_system_prompt(available_devices_info, available_frameworks):
+    notes = "\n".join(f"- {name}: {FRAMEWORK_NOTES[name]}" for name in available_frameworks if name in FRAMEWORK_NOTES)
+    return SYSTEM_TEMPLATE.format(devices=available_devices_info, frameworks=", ".join(available_frameworks),
+                                  notes=f"Framework notes:\n{notes}" if notes else "").rstrip()
+
+def build_user_prompt(task, available_frameworks):
+    """任务相关部分：上下文和签名相同的框架合并为一块（通常只有 CUDA 单独一块）"""
+    groups = {}
+    for name in available_frameworks:
+        variant = "CUDA" if name == "CUDA" else "other"
+        block = (task["contexts"][variant].strip(), task["function_signatures"][variant].strip())
+        groups.setdefault(block, []).append(name)
+    blocks = []
+    for (context, signature), names in groups.items():
+        scope = f" ({', '.join(names)})" if len(groups) > 1 else ""
+        blocks.append(BLOCK_TEMPLATE.format(scope=scope, context=context, signature=signature))
+    return USER_TEMPLATE.format(task_type=task["type"], blocks="\n\n".join(blocks))
+
+def build_messages(task, available_devices_info, available_frameworks):
+    """构建单个任务的对话消息：固定的 system 在前，任务内容在后"""
+    return [
+        {"role": "system", "content": build_system_prompt(available_devices_info, available_frameworks)},
+        {"role": "user", "content": build_user_prompt(task, available_frameworks)},
+    ]
+
+_encoder = None
+
+def count_tokens(text):
+    """提示的 token 数：安装了 tiktoken 时用 cl100k_base 编码（各家模型的分词不同，仅作比较用），否则按字符估计"""
+    global _encoder
+    if _encoder is None:
+        try:
+            import tiktoken
+            _encoder = tiktoken.get_encoding(TOKEN_ENCODING).encode
+        except ImportError:
+            _encoder = False
+    if _encoder:
+        return len(_encoder(text))
+    ascii_chars = sum(1 for c in text if ord(c) < 128)
+    return -(-ascii_chars // CHARS_PER_TOKEN) + (len(text) - ascii_chars)
+
+def prompt_stats(messages):
+    """提示的 token 数，以及第一条 user 消息之前的固定前缀的 token 数（可被前缀缓存复用的部分）"""
+    total = sum(count_tokens(m["content"]) for m in messages)
+    prefix = 0
+    for message in messages:
+        if message["role"] == "user":
+            break
+        prefix += count_tokens(message["content"])
+    return {"prompt_tokens_est": total, "static_prefix_tokens_est": prefix}
+
+def main():
+    parser = argparse.ArgumentParser(description="比较旧提示和紧凑提示的 token 数")
+    parser.add_argument("config", help="任务配置 input.json")
+    parser.add_argument("--frameworks", help="逗号分隔的可选框架（默认同 generate.py）")
+    args = parser.parse_args()
+
+    from generate import load_config, describe_devices, build_legacy_messages, AVAILABLE_FRAMEWORKS
+    config = load_config(args.config)
+    frameworks = args.frameworks.split(",") if args.frameworks else AVAILABLE_FRAMEWORKS
+    if not config["tasks"]:
+        print("配置中没有任务")
+        sys.exit(1)
+    devices_info = describe_devices(config["hardware"])
+    totals = {"legacy": 0, "compact": 0}
+    for task in config["tasks"]:
+        legacy = prompt_stats(build_legacy_messages(task, devices_info, frameworks))
+        compact = prompt_stats(build_messages(task, devices_info, frameworks))
+        totals["legacy"] += legacy["prompt_tokens_est"]
+        totals["compact"] += compact["prompt_tokens_est"]
+        print(f"{task['type']}: 旧提示 {legacy['prompt_tokens_est']} tokens，"
+              f"紧凑提示 {compact['prompt_tokens_est']} tokens（固定前缀 {compact['static_prefix_tokens_est']}）")
+    saved = 1 - totals["compact"] / totals["legacy"] if totals["legacy"] else 0
+    print(f"合计: 旧提示 {totals['legacy']} tokens，紧凑提示 {totals['compact']} tokens，减少 {saved:.0%}")
+
+if __name__ == "__main__":
+    main()
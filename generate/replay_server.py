@@ -0,0 +1,343 @@
+import os
+import sys
+import json
+import math
+import time
+import random
+import hashlib
+import argparse
+import threading
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# 本地 OpenAI 兼容的录制/回放服务，用于离线测试生成流水线的吞吐和并发上限。
+# 录制：python replay_server.py --recordings rec.jsonl --upstream https://dashscope.aliyuncs.com/compatible-mode/v1
+#       未命中的请求转发给真实接口（密钥取自 --api-key-env），响应追加到 rec.jsonl
+# 回放：python replay_server.py --recordings rec.jsonl --ttft lognormal:800,0.4 --rate 40 --rate-limit 0.05
+#       按请求哈希返回录制的响应，首 token 延迟和生成速率按给定分布模拟，可注入 429 和 5xx 错误
+# 客户端：LLM_BASE_URL=http://127.0.0.1:8800/v1 python generate.py（见 llm_client.py）
+#
+# 每个请求的随机数由 --seed、请求哈希和该哈希的第几次请求决定，与线程调度无关，同样的请求序列得到同样的延迟和错误。
+DEFAULT_PORT = 8800
+# 流式响应每个分块的 token 数；没有 usage 时按 4 个字符一个 token 估计
+TOKENS_PER_CHUNK = 8
+CHARS_PER_TOKEN = 4
+
+def request_key(body):
+    """请求哈希：模型、消息和温度相同的请求回放同一组录制"""
+    content = json.dumps({"model": body.get("model"), "messages": body.get("messages"),
+                          "temperature": body.get("temperature")}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()[:16]
+
+def parse_distribution(spec):
+    """解析延迟分布（毫秒）：fixed:MS / uniform:LO,HI / normal:MEAN,STD / lognormal:MEDIAN,SIGMA"""
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",")] if args else []
+    expected = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2}
+    if kind not in expected or len(values) != expected[kind]:
+        raise argparse.ArgumentTypeError(f"无法解析的分布: {spec}（可选 fixed:MS, uniform:LO,HI, "
+                                         f"normal:MEAN,STD, lognormal:MEDIAN,SIGMA）")
+    return kind, values
+
+def sample(distribution, rng):
+    kind, values = distribution
+    if kind == "fixed":
+        ms = values[0]
+    elif kind == "uniform":
+        ms = rng.uniform(*values)
+    elif kind == "normal":
+        ms = rng.gauss(*values)
+    else:
+        ms = rng.lognormvariate(math.log(values[0]), values[1])
+    return max(ms, 0.0)
+
+def estimate_tokens(text):
+    return max(1, math.ceil(len(text) / CHARS_PER_TOKEN))
+
+class Recordings:
+    """request_key -> 录制列表；同一请求多次录制时依次轮流返回"""
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self._lock = threading.Lock()
+        if path is None:
+            return
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.entries.setdefault(entry["key"], []).append(entry)
+        except FileNotFoundError:
+            pass
+
+    def lookup(self, key, index):
+        entries = self.entries.get(key)
+        return entries[index % len(entries)] if entries else None
+
+    def any(self, key, index):
+        """未命中时按请求哈希确定地挑选一条录制（--miss any）"""
+        if not self.entries:
+            return None
+        keys = sorted(self.entries)
+        return self.lookup(keys[int(key, 16) % len(keys)], index)
+
+    def add(self, entry):
+        with self._lock:
+            self.entries.setdefault(entry["key"], []).append(entry)
+            if self.path is not None:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+class ReplayState:
+    """服务配置和运行统计，由所有请求线程共享"""
+
+    def __init__(self, args):
+        self.recordings = Recordings(args.recordings)
+        self.ttft = args.ttft
+        self.rate = args.rate
+        self.rate_limit = args.rate_limit
+        self.error_rate = args.error_rate
+        self.retry_after = args.retry_after
+        self.max_concurrency = args.max_concurrency
+        self.miss = args.miss
+        self.upstream = args.upstream
+        self.api_key = args.api_key
+        self.seed = args.seed
+        self.stats = {"requests": 0, "replayed": 0, "recorded": 0, "misses": 0, "rate_limited": 0,
+                      "errors": 0, "in_flight": 0, "max_in_flight": 0, "completion_tokens": 0}
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def begin(self, key):
+        """登记一个请求，返回 (该哈希的第几次请求, 是否超过并发上限)"""
+        with self._lock:
+            index = self._counts.get(key, 0)
+            self._counts[key] = index + 1
+            self.stats["requests"] += 1
+            over_limit = self.max_concurrency is not None and self.stats["in_flight"] >= self.max_concurrency
+            if not over_limit:
+                self.stats["in_flight"] += 1
+                self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self.stats["in_flight"])
+            return index, over_limit
+
+    def end(self):
+        with self._lock:
+            self.stats["in_flight"] -= 1
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.stats[name] += n
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats)
+
+    def rng(self, key, index):
+        return random.Random(f"{self.seed}:{key}:{index}")
+
+def record_upstream(state, body, key):
+    """把请求以非流式方式转发给真实接口并保存响应，失败时返回 (状态码, 错误信息)"""
+    payload = dict(body, stream=False)
+    payload.pop("stream_options", None)
+    request = urllib.request.Request(state.upstream.rstrip("/") + "/chat/completions",
+                                     data=json.dumps(payload).encode("utf-8"),
+                                     headers={"Content-Type": "application/json",
+                                              "Authorization": f"Bearer {state.api_key}"})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=600) as response:
+            data = json.load(response)
+    except urllib.error.HTTPError as e:
+        return None, (e.code, e.read().decode("utf-8", "replace"))
+    except (urllib.error.URLError, OSError) as e:
+        return None, (502, str(e))
+    choice = data["choices"][0]
+    entry = {"key": key, "model": body.get("model"), "content": choice["message"].get("content") or "",
+             "finish_reason": choice.get("finish_reason"), "usage": data.get("usage"),
+             "upstream_latency_ms": (time.perf_counter() - start) * 1000}
+    state.recordings.add(entry)
+    state.count("recorded")
+    return entry, None
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    state = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, data, headers=None):
+        payload = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def send_error_json(self, status, message, error_type, headers=None):
+        self.send_json(status, {"error": {"message": message, "type": error_type, "code": status}}, headers)
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/stats"):
+            self.send_json(200, self.state.snapshot())
+        elif self.path.rstrip("/").endswith("/models"):
+            models = sorted({e["model"] for entries in self.state.recordings.entries.values() for e in entries})
+            self.send_json(200, {"object": "list", "data": [{"id": m, "object": "model"} for m in models]})
+        else:
+            self.send_error_json(404, f"未知路径: {self.path}", "not_found")
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.send_error_json(404, f"未知路径: {self.path}", "not_found")
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        state = self.state
+        key = request_key(body)
+        index, over_limit = state.begin(key)
+        retry_headers = {"Retry-After": f"{state.retry_after:g}"}
+        if over_limit:
+            state.count("rate_limited")
+            self.send_error_json(429, "并发请求数超过上限", "rate_limit_exceeded", retry_headers)
+            return
+        try:
+            self.complete(body, key, index, retry_headers)
+        finally:
+            state.end()
+
+    def complete(self, body, key, index, retry_headers):
+        state = self.state
+        rng = state.rng(key, index)
+        if rng.random() < state.rate_limit:
+            state.count("rate_limited")
+            self.send_error_json(429, "请求过于频繁（注入）", "rate_limit_exceeded", retry_headers)
+            return
+        if rng.random() < state.error_rate:
+            state.count("errors")
+            self.send_error_json(500, "服务端错误（注入）", "server_error")
+            return
+
+        entry = state.recordings.lookup(key, index)
+        if entry is not None:
+            state.count("replayed")
+        elif state.upstream:
+            entry, error = record_upstream(state, body, key)
+            if entry is None:
+                state.count("errors")
+                self.send_error_json(error[0], error[1], "upstream_error")
+                return
+            # 录制时已经付出了真实延迟，不再模拟
+            self.respond(body, entry, ttft_ms=0.0, rate=None)
+            return
+        else:
+            state.count("misses")
+            entry = state.recordings.any(key, index) if state.miss == "any" else None
+            if entry is None:
+                self.send_error_json(404, f"没有请求 {key} 的录制", "not_found")
+                return
+        self.respond(body, entry, sample(state.ttft, rng), state.rate)
+
+    def respond(self, body, entry, ttft_ms, rate):
+        content = entry["content"]
+        usage = entry.get("usage") or {}
+        completion_tokens = usage.get("completion_tokens") or estimate_tokens(content)
+        prompt_tokens = usage.get("prompt_tokens") or estimate_tokens(json.dumps(body.get("messages", [])))
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                 "total_tokens": prompt_tokens + completion_tokens}
+        self.state.count("completion_tokens", completion_tokens)
+        model = body.get("model") or entry.get("model")
+        response_id = f"chatcmpl-replay-{entry['key']}"
+        created = int(time.time())
+        time.sleep(ttft_ms / 1000)
+
+        if not body.get("stream"):
+            if rate:
+                time.sleep(completion_tokens / rate)
+            self.send_json(200, {"id": response_id, "object": "chat.completion", "created": created, "model": model,
+                                 "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                                              "finish_reason": entry.get("finish_reason") or "stop"}],
+                                 "usage": usage})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+
+        def send_chunk(choices, **extra):
+            chunk = dict({"id": response_id, "object": "chat.completion.chunk", "created": created,
+                          "model": model, "choices": choices}, **extra)
+            self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        # 按 token 数把内容切成分块，分块之间按生成速率等待
+        chunks = max(1, math.ceil(completion_tokens / TOKENS_PER_CHUNK))
+        step = max(1, math.ceil(len(content) / chunks))
+        try:
+            send_chunk([{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}])
+            for start in range(0, len(content), step):
+                send_chunk([{"index": 0, "delta": {"content": content[start:start + step]}, "finish_reason": None}])
+                if rate:
+                    time.sleep(completion_tokens / chunks / rate)
+            send_chunk([{"index": 0, "delta": {}, "finish_reason": entry.get("finish_reason") or "stop"}])
+            if (body.get("stream_options") or {}).get("include_usage"):
+                send_chunk([], usage=usage)
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        self.close_connection = True
+
+def create_server(args, host="127.0.0.1", port=DEFAULT_PORT):
+    """创建（不启动）回放服务，port 为 0 时由系统分配端口"""
+    handler = type("Handler", (ReplayHandler,), {"state": ReplayState(args)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="本地 OpenAI 兼容的录制/回放服务")
+    parser.add_argument("--recordings", help="录制文件（JSONL），录制模式下追加写入")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--upstream", help="真实接口地址；设置后进入录制模式，未命中的请求转发并保存")
+    parser.add_argument("--api-key-env", default="DASHSCOPE_API_KEY", help="录制模式下读取密钥的环境变量")
+    parser.add_argument("--ttft", type=parse_distribution, default=("fixed", [0.0]),
+                        help="首 token 延迟分布（毫秒），如 fixed:500、uniform:200,800、lognormal:600,0.5")
+    parser.add_argument("--rate", type=float, help="生成速率（tokens/s），不设置时立即返回全部内容")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="随机返回 429 的概率")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="随机返回 500 的概率")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="429 响应的 Retry-After（秒）")
+    parser.add_argument("--max-concurrency", type=int, help="同时处理的请求数上限，超过时返回 429")
+    parser.add_argument("--miss", choices=["error", "any"], default="error",
+                        help="回放模式下未命中的请求：返回 404，或按哈希挑选任意一条录制")
+    parser.add_argument("--seed", type=int, default=0, help="延迟和错误注入的随机种子")
+    return parser
+
+def main():
+    args = build_parser().parse_args()
+    args.api_key = None
+    if args.upstream:
+        args.api_key = os.getenv(args.api_key_env)
+        if not args.api_key:
+            print(f"录制模式需要设置 {args.api_key_env}")
+            sys.exit(1)
+    server = create_server(args, args.host, args.port)
+    mode = f"录制（上游 {args.upstream}）" if args.upstream else "回放"
+    print(f"{mode}服务已启动: http://{args.host}:{server.server_port}/v1，"
+          f"录制 {sum(len(v) for v in server.RequestHandlerClass.state.recordings.entries.values())} 条")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"统计: {server.RequestHandlerClass.state.snapshot()}")
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,12 @@
 import json
 import os
-from openai import OpenAI
+import sys
 from config import CONFIG
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "generate"))
+from llm_metrics import timed_completion
+from llm_client import create_client
+
 def load_data_with_validation(original_path, modifications_path):
     """带校验的数据加载：确保任务数量和标识匹配"""
     with open(original_path, "r") as f:
@@ -42,11 +46,11 @@ def generate_context_prompt(original_code, requirements, errors):
     """
 
 def process_single_task(client, orig_task, mod_task):
-    """处理单个任务的完整流程"""
+    """处理单个任务的完整流程，返回 (修改后的代码, 调用记录)"""
     # 检查修改要求是否为 none
     if mod_task["requirements"].lower() == "none":
         print(f"任务 {orig_task['metadata']['task_type']} 的修改要求为 none，跳过该任务。")
-        return orig_task["metadata"]["code"]
+        return orig_task["metadata"]["code"], None
     
     # 构建强化提示
     system_prompt = f"""你是一个资深C++工程师，需要根据问题描述修改现有并行代码。注意：
@@ -61,9 +65,9 @@ def process_single_task(client, orig_task, mod_task):
     )
     
     # API调用
-    completion = client.chat.completions.create(
-        model=CONFIG["model"],
-        messages=[
+    response, llm_call = timed_completion(
+        client, CONFIG["model"],
+        [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": user_prompt},
             {"role": "system", "content": "输出要求：\n1. 使用相同代码框架\n2. 只输出最终代码\n3. 用注释标注修改点\n4. 不要添加额外解释"}
@@ -73,7 +77,6 @@ def process_single_task(client, orig_task, mod_task):
     )
     
     # 提取并校验代码
-    response = completion.choices[0].message.content
     if "```cpp" in response:
         code = response.split("```cpp\n")[-1].split("\n```")[0].strip()
     else:
@@ -83,13 +86,12 @@ def process_single_task(client, orig_task, mod_task):
     if not any(keyword in code for keyword in ["omp parallel", "MPI_", "cuda"]):
         raise RuntimeError("生成的代码可能丢失原有并行化特征")
     
-    return code
+    return code, llm_call
 
-def generate_modified_code(original_path, modifications_path):
-    """带严格校验的多轮修改流程"""
+def generate_modified_code(original_path, modifications_path, base_url=None):
+    """带严格校验的多轮修改流程，base_url 为空时依次使用 LLM_BASE_URL 和 DashScope 地址"""
     original_data, modifications = load_data_with_validation(original_path, modifications_path)
-    client = OpenAI(api_key=os.getenv('DASHSCOPE_API_KEY'),
-                   base_url="https://dashscope.aliyuncs.com/compatible-mode/v1")
+    client = create_client("dashscope", base_url)
     
     modified_output = {"tasks": []}
     for orig_task, mod_task in zip(original_data["tasks"], modifications["tasks"]):
@@ -115,7 +117,7 @@ def generate_modified_code(original_path, modifications_path):
                 mod_task["errors"] = user_errors if user_errors else "无"
                 
                 # 处理单个任务
-                current_code = process_single_task(client, orig_task, mod_task)
+                current_code, llm_call = process_single_task(client, orig_task, mod_task)
                 
                 # 保存当前轮次的修改结果
                 modified_task = {
@@ -123,7 +125,8 @@ def generate_modified_code(original_path, modifications_path):
                     "modification_record": {
                         "round": round_count,
                         "requirements": mod_task["requirements"],
-                        "error_info": mod_task.get("errors", "")
+                        "error_info": mod_task.get("errors", ""),
+                        "llm_call": llm_call
                     }
                 }
                 modified_task["metadata"]["code"] = current_code
@@ -0,0 +1,251 @@
+import os
+import sys
+import json
+import time
+import queue
+import shutil
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+
+# 流水线执行：生成 -> 编译 -> 串行测试三级之间用有界队列连接。
+# 每个任务的代码一解析出来就进入编译池，编译好的可执行文件立即排入串行测试队列，
+# 其它任务的补全请求同时仍在进行，总耗时接近最慢的一级而不是三级之和。
+# 编译前先做语法检查（prescreen.py）：语法错误的代码不再完整编译，规范化后相同的代码（如不同模型给出的
+# 同一实现）只编译一次。
+# 工作目录、状态文件和 summary.json 与 sweep.py 相同，可以用 --resume 继续。
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT_DIR, "generate"))
+sys.path.insert(0, os.path.join(ROOT_DIR, "driver"))
+
+from config import CONFIG
+from generate import load_config, describe_devices, create_client, generate_task, save_output
+from llm_metrics import calls_from_output
+from driver import compile_candidate, BUILD_PROFILES
+from numa_placement import POLICIES
+from prescreen import check_candidate, code_key
+from sweep import (INPUT_FILE, SWEEP_ROOT, BenchmarkQueue, model_workspace, dataset_exists, write_summary)
+from regression import MIN_SAMPLES
+from sweep_state import SweepState, code_hash, RUNNING, DONE, FAILED
+
+DEFAULT_QUEUE_SIZE = 8
+
+class StageTimer:
+    """各级的累计工作时间（秒），多个工作线程的时间相加"""
+
+    def __init__(self):
+        self.busy_s = {"generate": 0.0, "prescreen": 0.0, "compile": 0.0}
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        with self._lock:
+            self.busy_s[stage] += seconds
+
+class ModelOutput:
+    """收集一个模型各任务的生成结果，全部任务完成后写出 output.json 并记录生成状态"""
+
+    def __init__(self, model, num_tasks, output_path, state):
+        self.model = model
+        self.remaining = num_tasks
+        self.output_path = output_path
+        self.state = state
+        self.output = {"tasks": [], "skipped_tasks": []}
+        self.calls = []
+        self.failed = False
+        self._lock = threading.Lock()
+
+    def add(self, task_type, task_output, llm_call, error=None):
+        with self._lock:
+            if llm_call is not None:
+                self.calls.append(llm_call)
+            if task_output is not None:
+                self.output["tasks"].append(task_output)
+            else:
+                skipped = {"task_type": task_type, "llm_call": llm_call}
+                if error is not None:
+                    skipped["error"] = error
+                self.output["skipped_tasks"].append(skipped)
+            # 请求出错的模型不标记为完成，--resume 时重新生成
+            self.failed = self.failed or error is not None
+            self.remaining -= 1
+            if self.remaining == 0:
+                save_output(self.output, self.calls, self.output_path)
+                self.state.mark_generation(self.model, FAILED if self.failed else DONE, output=self.output_path,
+                                           error="部分任务请求失败" if self.failed else None)
+
+def compile_once(metadata, profile, bin_dir):
+    """编译到 bin/<代码哈希>/main（已有时直接复用），返回 (可执行文件路径, 编译错误信息)"""
+    binary_cache = os.path.join(bin_dir, code_hash(metadata, profile))
+    cached_binary = os.path.join(binary_cache, "main")
+    if os.path.exists(cached_binary):
+        return cached_binary, None
+    temp_dir = tempfile.mkdtemp()
+    try:
+        binary_path, compile_error = compile_candidate(metadata, os.path.join(ROOT_DIR, "driver"), temp_dir, profile)
+        if binary_path is None:
+            return None, compile_error
+        os.makedirs(binary_cache, exist_ok=True)
+        shutil.copy2(binary_path, cached_binary)
+        return cached_binary, None
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+def run_pipeline(models, input_path=INPUT_FILE, sweep_root=SWEEP_ROOT, gen_workers=8, compile_workers=4,
+                 queue_size=DEFAULT_QUEUE_SIZE, monitor_mode=False, datasets=("data.txt",), profiles=("default",),
+                 resume=None, run_options=None, mpi_ranks=(None,), repeat=1):
+    """以流水线方式生成、编译并测试所有模型的所有任务，参数含义同 sweep.run_sweep
+
+    gen_workers 为同时进行的补全请求数，compile_workers 为并行编译数，
+    queue_size 为编译队列和测试队列的容量（下游积压时上游阻塞等待）。
+    """
+    sweep_dir = resume or os.path.join(sweep_root, time.strftime("%Y%m%d_%H%M%S"))
+    os.makedirs(sweep_dir, exist_ok=True)
+    state = SweepState(sweep_dir)
+    timer = StageTimer()
+    bench_queue = BenchmarkQueue(state, sweep_dir, monitor_mode, run_options, maxsize=queue_size, repeat=repeat)
+    compile_queue = queue.Queue(queue_size)
+    # (规范化代码哈希, 编译配置) -> 编译结果的 Future，规范化后相同的代码共用一个可执行文件，
+    # 同时到达的重复代码等待第一次编译完成
+    builds = {}
+    builds_lock = threading.Lock()
+    llm_calls = []
+    start = time.time()
+
+    def compile_loop():
+        while True:
+            item = compile_queue.get()
+            if item is None:
+                break
+            model, metadata, workspace = item
+            syntax_error = None
+            for profile in profiles:
+                ranks_list = mpi_ranks if metadata["framework"] == "MPI" else (None,)
+                jobs = [(dataset, ranks) for dataset in datasets if dataset_exists(metadata["task_type"], dataset)
+                        for ranks in ranks_list]
+                keys = [bench_queue.job_key(model, metadata, dataset, profile, ranks) for dataset, ranks in jobs]
+                if not any(state.needs_run(key) for key in keys):
+                    continue
+                if syntax_error is None:
+                    screen_start = time.time()
+                    syntax_ok, error = check_candidate(metadata)
+                    timer.add("prescreen", time.time() - screen_start)
+                    syntax_error = f"语法检查失败:\n{error}" if syntax_ok is False else ""
+                if syntax_error:
+                    print(f"[compile] {model} {metadata['task_type']}/{metadata['framework']}: 语法检查失败，跳过编译")
+                    for dataset, ranks in jobs:
+                        bench_queue.submit(model, metadata, workspace, dataset, profile, ranks, (None, syntax_error))
+                    continue
+                compile_start = time.time()
+                build_key = (code_key(metadata), profile)
+                with builds_lock:
+                    build = builds.get(build_key)
+                    first = build is None
+                    if first:
+                        build = builds[build_key] = Future()
+                if first:
+                    try:
+                        build.set_result(compile_once(metadata, profile, bench_queue.bin_dir))
+                    except Exception as e:
+                        build.set_result((None, f"编译出错: {e}"))
+                precompiled = build.result()
+                timer.add("compile", time.time() - compile_start)
+                print(f"[compile] {model} {metadata['task_type']}/{metadata['framework']}/{profile}: "
+                      f"{'成功' if precompiled[0] else '失败'}")
+                for dataset, ranks in jobs:
+                    bench_queue.submit(model, metadata, workspace, dataset, profile, ranks, precompiled)
+
+    compilers = [threading.Thread(target=compile_loop, daemon=True) for _ in range(compile_workers)]
+    for t in compilers:
+        t.start()
+
+    config = load_config(input_path)
+    devices_info = describe_devices(config["hardware"])
+    client = create_client()
+
+    def generate_one(model, task, collector, workspace):
+        gen_start = time.time()
+        try:
+            task_output, llm_call = generate_task(client, model, task, config, devices_info)
+            error = None
+        except Exception as e:
+            print(f"[gen] {model} {task['type']} 请求失败: {e}")
+            task_output, llm_call, error = None, getattr(e, "llm_call", None), str(e)
+        timer.add("generate", time.time() - gen_start)
+        collector.add(task["type"], task_output, llm_call, error)
+        if task_output is not None:
+            # 编译队列满时在这里等待，限制同时在途的补全请求
+            compile_queue.put((model, task_output["metadata"], workspace))
+
+    collectors = []
+    with ThreadPoolExecutor(max_workers=gen_workers) as executor:
+        for model in models:
+            workspace = model_workspace(sweep_dir, model)
+            output_path = os.path.join(workspace, "output.json")
+            if state.generation_done(model):
+                print(f"[gen] {model} 复用已有生成结果")
+                with open(output_path, "r") as f:
+                    output = json.load(f)
+                llm_calls.extend(calls_from_output(output))
+                for task_output in output["tasks"]:
+                    compile_queue.put((model, task_output["metadata"], workspace))
+                continue
+            print(f"[gen] {model} 开始生成")
+            state.mark_generation(model, RUNNING)
+            collector = ModelOutput(model, len(config["tasks"]), output_path, state)
+            collectors.append(collector)
+            for task in config["tasks"]:
+                executor.submit(generate_one, model, task, collector, workspace)
+    # 线程池退出时所有补全请求都已完成
+    for collector in collectors:
+        llm_calls.extend(collector.calls)
+
+    for _ in compilers:
+        compile_queue.put(None)
+    for t in compilers:
+        t.join()
+    bench_queue.join()
+
+    wall_s = time.time() - start
+    stages = dict(timer.busy_s, benchmark=bench_queue.busy_s)
+    print(f"流水线总耗时 {wall_s:.1f}s；各级累计工作时间: 生成 {stages['generate']:.1f}s，"
+          f"语法检查 {stages['prescreen']:.1f}s，编译 {stages['compile']:.1f}s，测试 {stages['benchmark']:.1f}s")
+    return write_summary(sweep_dir, models, state, llm_calls,
+                         pipeline={"wall_s": wall_s, "busy_s": stages, "gen_workers": gen_workers,
+                                   "compile_workers": compile_workers, "queue_size": queue_size})
+
+def main():
+    parser = argparse.ArgumentParser(description="生成 -> 编译 -> 串行测试流水线")
+    parser.add_argument("models", nargs="*", help="模型名称（为空时使用 generate/config.py 中的模型）")
+    parser.add_argument("--input", default=INPUT_FILE, help="任务配置 input.json")
+    parser.add_argument("--out", default=SWEEP_ROOT, help="结果根目录")
+    parser.add_argument("--gen-workers", type=int, default=8, help="同时进行的补全请求数")
+    parser.add_argument("--compile-workers", type=int, default=4, help="并行编译数")
+    parser.add_argument("--queue-size", type=int, default=DEFAULT_QUEUE_SIZE, help="编译队列和测试队列的容量")
+    parser.add_argument("--datasets", default="data.txt", help="逗号分隔的数据集文件名")
+    parser.add_argument("--profiles", default="default", help=f"逗号分隔的编译配置 {list(BUILD_PROFILES)}")
+    parser.add_argument("--resume", help="继续已有的结果目录，只运行缺失或失败的任务")
+    parser.add_argument("--limit-mode", choices=["rlimit", "cgroup"], default="rlimit",
+                        help="内存上限方式：RLIMIT_AS 或 cgroup v2 子组")
+    parser.add_argument("--env-policy", choices=["off", "tag", "reject"], default="tag",
+                        help="受干扰运行的处理方式：不检查 / 标记 / 拒绝")
+    parser.add_argument("--isolate", action="store_true", help="驱动、采样进程、被测程序分别固定在不同核心")
+    parser.add_argument("--numa-policy", choices=list(POLICIES), default="none", help="NUMA 放置策略")
+    parser.add_argument("--mpi-ranks", help="逗号分隔的 MPI 进程数，如 1,2,4,8（扩展性扫描）")
+    parser.add_argument("--mpi-threads", type=int, default=1, help="每个 MPI 进程的 OpenMP 线程数")
+    parser.add_argument("--repeat", type=int, default=1,
+                        help=f"每个任务的重复测量次数（regression.py 每组至少需要 {MIN_SAMPLES} 次）")
+    parser.add_argument("-m", dest="monitor_mode", action="store_true", help="记录硬件监控数据并导出 trace")
+    args = parser.parse_args()
+
+    run_pipeline(args.models or [CONFIG["model"]], args.input, args.out, args.gen_workers, args.compile_workers,
+                 args.queue_size, args.monitor_mode, datasets=args.datasets.split(","),
+                 profiles=args.profiles.split(","), resume=args.resume,
+                 mpi_ranks=[int(n) for n in args.mpi_ranks.split(",")] if args.mpi_ranks else (None,),
+                 repeat=args.repeat,
+                 run_options={"limit_mode": args.limit_mode, "env_policy": args.env_policy,
+                              "isolate": args.isolate, "numa_policy": args.numa_policy,
+                              "mpi_threads": args.mpi_threads})
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,279 @@
+import os
+import sys
+import json
+import argparse
+import numpy as np
+from scipy import sparse
+from scipy.sparse import csgraph
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "driver"))
+from task_registry import dataset_paths, load_params, SEED
+
+# 图数据预处理：
+#   convert  把任意顶点编号映射为连续序号（按原编号从小到大）
+#   reorder  对连续编号的图重新编号，生成重排后的数据集、对应的参考结果和排列，
+#            用同一个图的不同编号比较候选实现的速度中有多少来自缓存局部性
+#   restore  把测试程序在重排数据集上的输出映射回原编号
+#   partition 把图切成 P 个分片（每个 MPI 进程一个二进制 CSR 文件），测试程序用 common/shard.h 只读取本进程的分片
+# 重排方法：degree（按度从大到小）、rcm（反向 Cuthill–McKee，带宽小）、bfs（从起点出发的访问顺序）、
+# random（随机编号，作为对照）。
+REORDER_METHODS = ("degree", "rcm", "bfs", "random")
+# 测试程序固定从顶点 1 出发，重排后起点编号保持不变
+BFS_START = 1
+# 排列 perm[新编号] = 原编号，与数据集同名；不用 .txt 后缀，避免被 driver_all.py 当作数据集
+PERM_SUFFIX = ".perm.npy"
+
+# 划分方式：block（按编号分成 P 段）、hash（按编号的哈希分配）都按边的起点分配，进程保存所拥有顶点的出边；
+# 2d 把 P 个进程排成 R×C 网格，边 (u, v) 属于 (u 所在行段, v 所在列段)，顶点的所有权按 block 分配
+PARTITION_SCHEMES = ("block", "hash", "2d")
+SHARD_MAGIC = b"CSRSHRD1"
+SHARD_VERSION = 1
+# 32 位 Fibonacci 哈希，打散编号连续的高度数顶点
+HASH_MULTIPLIER = 0x9E3779B1
+
+def load_edges(path):
+    """读取边列表 "u v"，返回 (src, dst) 两个 int64 数组"""
+    pairs = np.fromfile(path, dtype=np.int64, sep=" ")
+    if pairs.size % 2:
+        raise ValueError(f"{path} 中的顶点编号个数为奇数，不是边列表")
+    return pairs[0::2], pairs[1::2]
+
+def save_edges(path, src, dst):
+    np.savetxt(path, np.column_stack([src, dst]), fmt="%d")
+
 def convert_edge_list(input_file, output_file):
-    with open(input_file, 'r') as f:
-        edges = [line.strip().split() for line in f if line.strip()]
-
-    # 提取所有唯一节点并排序
-    nodes = set()
-    for u, v in edges:
-        nodes.add(int(u))
-        nodes.add(int(v))
-    sorted_nodes = sorted(nodes)
-
-    # 创建节点到连续序号的映射
-    node_to_id = {node: idx for idx, node in enumerate(sorted_nodes)}
-
-    # 转换边列表
-    with open(output_file, 'w') as f:
-        for u, v in edges:
-            new_u = node_to_id[int(u)]
-            new_v = node_to_id[int(v)]
-            f.write(f"{new_u} {new_v}\n")
-
-# 使用示例
-convert_edge_list('input.txt', 'output.txt')
\ No newline at end of file
+    """把顶点编号按原编号排序后映射为连续序号，返回顶点数"""
+    src, dst = load_edges(input_file)
+    nodes, ids = np.unique(np.concatenate([src, dst]), return_inverse=True)
+    save_edges(output_file, ids[:len(src)], ids[len(src):])
+    return len(nodes)
+
+def to_csr(src, dst, num_vertices):
+    """有向图的邻接矩阵（重边合并）"""
+    return sparse.csr_matrix((np.ones(len(src), dtype=np.int32), (src, dst)), shape=(num_vertices, num_vertices))
+
+def degree_order(src, dst, num_vertices, start, rng):
+    """按出度 + 入度从大到小，度相同时保持原顺序：高度数顶点的数据集中在一起"""
+    degree = np.bincount(src, minlength=num_vertices) + np.bincount(dst, minlength=num_vertices)
+    return np.argsort(-degree, kind="stable")
+
+def rcm_order(src, dst, num_vertices, start, rng):
+    """对称化后的反向 Cuthill–McKee 顺序：相邻顶点的编号接近"""
+    graph = to_csr(src, dst, num_vertices)
+    return csgraph.reverse_cuthill_mckee((graph + graph.T).tocsr(), symmetric_mode=True).astype(np.int64)
+
+def bfs_order(src, dst, num_vertices, start, rng):
+    """从起点出发的 BFS 访问顺序，未到达的顶点按原编号排在后面"""
+    reached = csgraph.breadth_first_order(to_csr(src, dst, num_vertices), start, directed=True,
+                                          return_predecessors=False).astype(np.int64)
+    unreached = np.ones(num_vertices, dtype=bool)
+    unreached[reached] = False
+    return np.concatenate([reached, np.flatnonzero(unreached)])
+
+def random_order(src, dst, num_vertices, start, rng):
+    return rng.permutation(num_vertices)
+
+ORDERINGS = {"degree": degree_order, "rcm": rcm_order, "bfs": bfs_order, "random": random_order}
+
+def reorder(src, dst, method, start=BFS_START, seed=SEED):
+    """重新编号，返回 (new_src, new_dst, perm)
+
+    perm[新编号] = 原编号；边按 (新起点, 新终点) 排序，即 CSR 顺序。要求顶点编号连续（先用 convert），
+    否则测试程序按最大编号推算的顶点数在重排前后不同。
+    """
+    num_vertices = int(max(src.max(), dst.max())) + 1
+    present = np.zeros(num_vertices, dtype=bool)
+    present[src] = True
+    present[dst] = True
+    if not present.all():
+        raise ValueError(f"顶点编号不连续（{num_vertices - present.sum()} 个编号没有出现在边中），请先执行 convert")
+
+    perm = ORDERINGS[method](src, dst, num_vertices, start, np.random.default_rng(seed))
+    # 交换两个位置，使起点的新编号仍为 start
+    position = int(np.flatnonzero(perm == start)[0])
+    perm[[position, start]] = perm[[start, position]]
+    rank = np.empty(num_vertices, dtype=np.int64)
+    rank[perm] = np.arange(num_vertices)
+    new_src, new_dst = rank[src], rank[dst]
+    edge_order = np.lexsort((new_dst, new_src))
+    return new_src[edge_order], new_dst[edge_order], perm
+
+def permute_result(values, perm):
+    """按原编号排列的结果 -> 按新编号排列：new[i] = old[perm[i]]（测试程序的结果多出的末项保持不变）"""
+    values = np.asarray(values)
+    return np.concatenate([values[:len(perm)][perm], values[len(perm):]])
+
+def restore_result(values, perm):
+    """按新编号排列的结果 -> 按原编号排列：old[perm[i]] = new[i]"""
+    values = np.asarray(values)
+    restored = values.copy()
+    restored[perm] = values[:len(perm)]
+    return restored
+
+def edge_gap(src, dst):
+    """边两端编号差的平均值（对数），越小访问邻居时的局部性越好"""
+    return float(np.mean(np.log2(1 + np.abs(src - dst)))) if len(src) else 0.0
+
+def reorder_dataset(task_type, dataset, method, seed=SEED, output=None):
+    """为 dataset/<任务>/<数据集> 生成重排后的数据集（默认名 <数据集>_<方法>.txt）、排列和参考结果
+
+    参考结果由原数据集的参考结果按排列映射得到，要求结果为按顶点编号排列的值（如 BFS 层数）。
+    返回重排统计。
+    """
+    data_path, result_path, _ = dataset_paths(task_type, dataset)
+    output = output or f"{os.path.splitext(dataset)[0]}_{method}.txt"
+    out_data, out_result, out_params = dataset_paths(task_type, output)
+
+    src, dst = load_edges(data_path)
+    new_src, new_dst, perm = reorder(src, dst, method, seed=seed)
+    save_edges(out_data, new_src, new_dst)
+    np.save(os.path.splitext(out_data)[0] + PERM_SUFFIX, perm)
+
+    stats = {"method": method, "source": dataset, "seed": seed, "vertices": len(perm), "edges": len(src),
+             "source_edge_gap": edge_gap(src, dst), "edge_gap": edge_gap(new_src, new_dst)}
+    if os.path.exists(result_path):
+        expected = np.fromfile(result_path, dtype=np.int64, sep=" ")
+        np.savetxt(out_result, permute_result(expected, perm), fmt="%d")
+    else:
+        print(f"没有参考结果 {result_path}，只生成了数据集")
+    params = load_params(task_type, dataset)
+    if params is not None:
+        with open(out_params, "w") as f:
+            json.dump(dict(params, reorder=stats), f)
+    return stats
+
+def vertex_owner(num_vertices, parts, scheme):
+    """每个顶点所属的进程"""
+    vertices = np.arange(num_vertices, dtype=np.int64)
+    if scheme == "hash":
+        return ((vertices * HASH_MULTIPLIER) & 0xFFFFFFFF) % parts
+    return vertices * parts // num_vertices
+
+def process_grid(parts):
+    """2d 划分的网格 (行数, 列数)：行数取不超过 sqrt(P) 的最大因子"""
+    rows = max(r for r in range(1, int(np.sqrt(parts)) + 1) if parts % r == 0)
+    return rows, parts // rows
+
+def group_by(keys, parts):
+    """按键（进程号）分组，返回 (排序后的下标, 各组在其中的起止位置)"""
+    order = np.argsort(keys, kind="stable")
+    return order, np.searchsorted(keys[order], np.arange(parts + 1))
+
+def write_shard(path, header, offset, local_to_global, ghost_owner, edges):
+    """二进制分片（小端）：魔数 8 字节，int64 文件头 9 项，int64 offset，int32 本地→全局编号、幽灵顶点所属进程、邻居"""
+    with open(path, "wb") as f:
+        f.write(SHARD_MAGIC)
+        np.asarray(header, dtype="<i8").tofile(f)
+        offset.astype("<i8").tofile(f)
+        for array in (local_to_global, ghost_owner, edges):
+            array.astype("<i4").tofile(f)
+
+def partition_graph(src, dst, parts, scheme, output_dir):
+    """把边列表切成 parts 个分片写入 output_dir/shard_<进程号>.bin，返回划分统计
+
+    每个分片的本地编号为：本进程拥有的顶点（按全局编号排序）在前，边中出现的其它顶点（幽灵顶点）在后；
+    CSR 的行覆盖全部本地顶点，邻居为本地编号。边割为终点不属于保存该边的进程的边数（需要通信的边）。
+    """
+    num_vertices = int(max(src.max(), dst.max())) + 1
+    owner = vertex_owner(num_vertices, parts, scheme)
+    if scheme == "2d":
+        rows, cols = process_grid(parts)
+        edge_rank = (src * rows // num_vertices) * cols + dst * cols // num_vertices
+    else:
+        edge_rank = owner[src]
+    edge_order, edge_bounds = group_by(edge_rank, parts)
+    vertex_order, vertex_bounds = group_by(owner, parts)
+    os.makedirs(output_dir, exist_ok=True)
+
+    shards = []
+    cut = 0
+    for rank in range(parts):
+        edge_index = edge_order[edge_bounds[rank]:edge_bounds[rank + 1]]
+        s, d = src[edge_index], dst[edge_index]
+        owned = np.sort(vertex_order[vertex_bounds[rank]:vertex_bounds[rank + 1]])
+        ghosts = np.setdiff1d(np.concatenate([s, d]), owned)
+        local_to_global = np.concatenate([owned, ghosts])
+        # 全局编号 -> 本地编号：两段各自有序，分别二分查找
+        is_owned = owner[s] == rank
+        local_src = np.where(is_owned, np.searchsorted(owned, s), len(owned) + np.searchsorted(ghosts, s))
+        is_owned = owner[d] == rank
+        local_dst = np.where(is_owned, np.searchsorted(owned, d), len(owned) + np.searchsorted(ghosts, d))
+        cut += int(np.count_nonzero(~is_owned))
+
+        local_order = np.lexsort((local_dst, local_src))
+        offset = np.zeros(len(local_to_global) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(local_src, minlength=len(local_to_global)), out=offset[1:])
+        path = os.path.join(output_dir, f"shard_{rank}.bin")
+        header = [SHARD_VERSION, rank, parts, PARTITION_SCHEMES.index(scheme), num_vertices, len(src),
+                  len(owned), len(ghosts), len(edge_index)]
+        write_shard(path, header, offset, local_to_global, owner[ghosts], local_dst[local_order])
+        shards.append({"rank": rank, "owned": len(owned), "ghosts": len(ghosts), "edges": len(edge_index),
+                       "bytes": os.path.getsize(path)})
+
+    edges = np.array([shard["edges"] for shard in shards])
+    owned = np.array([shard["owned"] for shard in shards])
+    stats = {"scheme": scheme, "parts": parts, "vertices": num_vertices, "edges": len(src),
+             "grid": list(process_grid(parts)) if scheme == "2d" else None,
+             "edge_cut": cut, "edge_cut_ratio": cut / len(src) if len(src) else 0.0,
+             "ghosts": int(sum(shard["ghosts"] for shard in shards)),
+             # 最大值 / 平均值，1.0 为完全均衡
+             "edge_balance": float(edges.max() / edges.mean()) if edges.mean() else 1.0,
+             "vertex_balance": float(owned.max() / owned.mean()) if owned.mean() else 1.0,
+             "shards": shards}
+    with open(os.path.join(output_dir, "partition.json"), "w") as f:
+        json.dump(stats, f, indent=2)
+    return stats
+
+def partition_dataset(task_type, dataset, parts, scheme, output_dir=None):
+    """划分 dataset/<任务>/<数据集>，默认写入同目录下的 <数据集>_<方式>_p<P>/"""
+    data_path = dataset_paths(task_type, dataset)[0]
+    output_dir = output_dir or f"{os.path.splitext(data_path)[0]}_{scheme}_p{parts}"
+    src, dst = load_edges(data_path)
+    return partition_graph(src, dst, parts, scheme, output_dir), output_dir
+
+def main():
+    parser = argparse.ArgumentParser(description="图数据预处理：编号连续化、重排和结果映射")
+    sub = parser.add_subparsers(dest="command", required=True)
+    conv = sub.add_parser("convert", help="把顶点编号映射为连续序号")
+    conv.add_argument("input")
+    conv.add_argument("output")
+    reo = sub.add_parser("reorder", help="生成重排后的数据集、排列和参考结果")
+    reo.add_argument("dataset", help="dataset/<任务>/ 中的数据集文件名")
+    reo.add_argument("--task", default="graph_bfs")
+    reo.add_argument("--method", default="all", choices=REORDER_METHODS + ("all",))
+    reo.add_argument("--seed", type=int, default=SEED, help="random 方法的随机种子")
+    reo.add_argument("--output", help="输出数据集文件名（默认 <数据集>_<方法>.txt，--method all 时忽略）")
+    res = sub.add_parser("restore", help="把重排数据集上的结果映射回原编号")
+    res.add_argument("result", help="测试程序的输出（如 bfs_result_*.txt）")
+    res.add_argument("--perm", required=True, help=f"重排时生成的 {PERM_SUFFIX}")
+    res.add_argument("--output", help="输出文件（默认覆盖原文件）")
+    part = sub.add_parser("partition", help="把图切成每个进程一个的二进制 CSR 分片")
+    part.add_argument("dataset", help="dataset/<任务>/ 中的数据集文件名")
+    part.add_argument("--task", default="graph_bfs")
+    part.add_argument("--parts", type=int, required=True, help="分片数（MPI 进程数）")
+    part.add_argument("--scheme", default="block", choices=PARTITION_SCHEMES + ("all",))
+    part.add_argument("--output", help="输出目录（默认 dataset/<任务>/<数据集>_<方式>_p<P>/，--scheme all 时忽略）")
+    args = parser.parse_args()
+
+    if args.command == "convert":
+        print(f"共 {convert_edge_list(args.input, args.output)} 个顶点，已写入 {args.output}")
+    elif args.command == "reorder":
+        methods = REORDER_METHODS if args.method == "all" else (args.method,)
+        for method in methods:
+            stats = reorder_dataset(args.task, args.dataset, method, args.seed,
+                                    args.output if args.method != "all" else None)
+            print(f"{method}: {stats['vertices']} 个顶点，{stats['edges']} 条边，"
+                  f"边两端编号差 log2 均值 {stats['source_edge_gap']:.2f} -> {stats['edge_gap']:.2f}")
+    elif args.command == "partition":
+        schemes = PARTITION_SCHEMES if args.scheme == "all" else (args.scheme,)
+        for scheme in schemes:
+            stats, output_dir = partition_dataset(args.task, args.dataset, args.parts, scheme,
+                                                  args.output if args.scheme != "all" else None)
+            print(f"{scheme}: 边割 {stats['edge_cut']}（{stats['edge_cut_ratio']:.1%}），幽灵顶点 {stats['ghosts']}，"
+                  f"边均衡 {stats['edge_balance']:.2f}，顶点均衡 {stats['vertex_balance']:.2f}，已写入 {output_dir}")
+    else:
+        values = np.fromfile(args.result, dtype=np.int64, sep=" ")
+        np.savetxt(args.output or args.result, restore_result(values, np.load(args.perm)), fmt="%d")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+import os
+import sys
+import json
+import math
+import time
+import argparse
+import statistics
+
+# 历史记录由 driver.py 追加；基线保存每组运行条件（任务、框架、数据集、编译配置、NUMA 策略、MPI 布局）的运行时间分布
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+HISTORY_FILE = os.path.join(ROOT_DIR, "driver", "history.jsonl")
+BASELINE_FILE = os.path.join(ROOT_DIR, "regression_baseline.json")
+
+# 两组各 3 个样本时双侧检验的最小 p 值为 0.1，达不到常用的显著性水平；每组至少 4 个样本（最小 p 约 0.029）
+MIN_SAMPLES = 4
+# 两组样本数之和不超过该值且没有并列值时使用精确分布，否则使用正态近似
+EXACT_MAX_N = 20
+
+def run_condition(record):
+    """运行条件：(编译配置, NUMA 策略, MPI 进程数 × 线程数)，非 MPI 运行的最后一项为 None"""
+    mpi = f"np{record['mpi_ranks']}x{record.get('mpi_threads') or 1}" if record.get("mpi_ranks") else None
+    return record.get("profile") or "default", record.get("numa_policy") or "none", mpi
+
+def result_key(record):
+    """运行条件不同的结果不可比较：编译配置、NUMA 策略和 MPI 进程数 × 线程数都计入分组"""
+    parts = [record["task_type"], record["framework"], record["dataset"]]
+    parts.extend(p for p in run_condition(record) if p is not None)
+    return "|".join(parts)
+
+def load_runs(history_file=HISTORY_FILE, since=0.0, until=None, model=None, profile=None):
+    """按运行条件（见 result_key）分组读取验证通过且未受干扰的运行时间"""
+    groups = {}
+    if not os.path.exists(history_file):
+        return groups
+    with open(history_file, "r") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            r = json.loads(line)
+            if r["status"] != "success" or not r["verified"] or r["time_ms"] is None or r.get("noisy"):
+                continue
+            if r["timestamp"] < since or (until is not None and r["timestamp"] >= until):
+                continue
+            if (model and r.get("model") != model) or (profile and r.get("profile") != profile):
+                continue
+            groups.setdefault(result_key(r), []).append(r["time_ms"])
+    return groups
+
+def exact_u_distribution(n1, n2):
+    """无并列值时 U 统计量的精确分布：counts[u] 为 U = u 的排列数"""
+    # f(m, n, u) = f(m - 1, n, u - n) + f(m, n - 1, u)，按 m 逐行递推
+    table = [[[1] for _ in range(n2 + 1)]]
+    for m in range(1, n1 + 1):
+        row = [[1]]
+        for n in range(1, n2 + 1):
+            counts = [0] * (m * n + 1)
+            for u, c in enumerate(table[m - 1][n]):
+                counts[u + n] += c
+            for u, c in enumerate(row[n - 1]):
+                counts[u] += c
+            row.append(counts)
+        table.append(row)
+    return table[n1][n2]
+
+def mann_whitney_u(x, y):
+    """双侧 Mann-Whitney U 检验，返回 (U, p)
+
+    样本较少且没有并列值时使用精确分布，否则使用正态近似（含并列秩修正和连续性修正）。
+    """
+    n1, n2 = len(x), len(y)
+    combined = sorted([(v, 0) for v in x] + [(v, 1) for v in y])
+    ranks = [0.0] * len(combined)
+    tie_term = 0
+    i = 0
+    while i < len(combined):
+        j = i
+        while j + 1 < len(combined) and combined[j + 1][0] == combined[i][0]:
+            j += 1
+        for k in range(i, j + 1):
+            ranks[k] = (i + j) / 2 + 1
+        t = j - i + 1
+        tie_term += t ** 3 - t
+        i = j + 1
+    r1 = sum(rank for rank, (_, group) in zip(ranks, combined) if group == 0)
+    u1 = r1 - n1 * (n1 + 1) / 2
+    n = n1 + n2
+    if n <= EXACT_MAX_N and tie_term == 0:
+        counts = exact_u_distribution(n1, n2)
+        total = sum(counts)
+        u = int(u1)
+        tail = min(sum(counts[:u + 1]), sum(counts[u:]))
+        return u1, min(1.0, 2 * tail / total)
+    mean = n1 * n2 / 2
+    variance = n1 * n2 / 12 * ((n + 1) - tie_term / (n * (n - 1)))
+    if variance <= 0:
+        return u1, 1.0
+    z = (abs(u1 - mean) - 0.5) / math.sqrt(variance)
+    return u1, math.erfc(max(z, 0.0) / math.sqrt(2))
+
+def compare(baseline, current, alpha=0.05, threshold=0.1):
+    """逐组比较基线和当前结果，返回报告列表"""
+    report = []
+    for key in sorted(set(baseline) | set(current)):
+        base, new = baseline.get(key, []), current.get(key, [])
+        entry = {"key": key, "baseline_n": len(base), "current_n": len(new)}
+        if len(base) < MIN_SAMPLES or len(new) < MIN_SAMPLES:
+            entry["verdict"] = "insufficient"
+            report.append(entry)
+            continue
+        base_median, new_median = statistics.median(base), statistics.median(new)
+        change = (new_median - base_median) / base_median if base_median else 0.0
+        _, p_value = mann_whitney_u(base, new)
+        entry.update(baseline_median_ms=base_median, current_median_ms=new_median,
+                     change=change, p_value=p_value)
+        if p_value < alpha and change > threshold:
+            entry["verdict"] = "regression"
+        elif p_value < alpha and change < -threshold:
+            entry["verdict"] = "improvement"
+        else:
+            entry["verdict"] = "unchanged"
+        report.append(entry)
+    return report
+
+def print_report(report):
+    labels = {"regression": "变慢", "improvement": "变快", "unchanged": "无显著变化", "insufficient": "样本不足"}
+    for e in report:
+        if e["verdict"] == "insufficient":
+            print(f"{e['key']}: {labels[e['verdict']]} (基线 {e['baseline_n']} 次, 当前 {e['current_n']} 次)")
+        else:
+            print(f"{e['key']}: {labels[e['verdict']]} {e['baseline_median_ms']}ms -> {e['current_median_ms']}ms "
+                  f"({e['change']:+.1%}, p={e['p_value']:.4f}, n={e['baseline_n']}/{e['current_n']})")
+
+def save_baseline(args):
+    runs = load_runs(args.history, since=args.since, model=args.model, profile=args.profile)
+    baseline = {"created": time.time(), "model": args.model, "profile": args.profile, "runs": runs}
+    with open(args.baseline, "w") as f:
+        json.dump(baseline, f, indent=2, ensure_ascii=False)
+    print(f"已保存 {len(runs)} 组基线到 {args.baseline}")
+
+def check(args):
+    with open(args.baseline, "r") as f:
+        baseline = json.load(f)
+    # 默认只比较基线建立之后的运行
+    since = args.since if args.since else baseline["created"]
+    current = load_runs(args.history, since=since, model=args.model, profile=args.profile)
+    report = compare(baseline["runs"], current, args.alpha, args.threshold)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    regressions = [e for e in report if e["verdict"] == "regression"]
+    if regressions:
+        print(f"检测到 {len(regressions)} 项性能回退")
+        sys.exit(1)
+
+def main():
+    parser = argparse.ArgumentParser(description="基准测试性能回退检测")
+    parser.add_argument("command", choices=["baseline", "check"], help="baseline: 记录基线；check: 与基线比较")
+    parser.add_argument("--history", default=HISTORY_FILE)
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--since", type=float, default=0.0, help="只使用该时间戳之后的运行")
+    parser.add_argument("--model", help="只比较该模型的结果")
+    parser.add_argument("--profile", help="只比较该编译配置的结果")
+    parser.add_argument("--alpha", type=float, default=0.05, help="显著性水平")
+    parser.add_argument("--threshold", type=float, default=0.1, help="中位数变化超过该比例才算回退/改进")
+    parser.add_argument("--output", help="把报告另存为 JSON")
+    args = parser.parse_args()
+
+    if args.command == "baseline":
+        save_baseline(args)
+    else:
+        check(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+import os
+import sys
+import json
+import time
+import queue
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# 项目根目录，generate/ 和 driver/ 以模块方式导入，不再 chdir
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+GENERATE_DIR = os.path.join(ROOT_DIR, "generate")
+DRIVER_DIR = os.path.join(ROOT_DIR, "driver")
+sys.path.insert(0, GENERATE_DIR)
+sys.path.insert(0, DRIVER_DIR)
+
+from generate import generate_code
+from llm_metrics import calls_from_output, summarize_calls, print_summary
+from driver import extract_and_compile_repeated, BUILD_PROFILES
+from numa_placement import POLICIES
+from regression import MIN_SAMPLES
+from sweep_state import SweepState, job_key, code_hash, PENDING, RUNNING, DONE, FAILED
+
+# 默认模型列表与扫描结果目录
+MODELS_FILE = os.path.join(ROOT_DIR, "models.txt")
+INPUT_FILE = os.path.join(GENERATE_DIR, "input.json")
+SWEEP_ROOT = os.path.join(ROOT_DIR, "sweeps")
+
+def load_models(models_file):
+    """读取模型列表，忽略空行和 # 注释"""
+    with open(models_file, "r") as f:
+        return [line.strip() for line in f if line.strip() and not line.strip().startswith("#")]
+
+def model_workspace(sweep_dir, model):
+    """为每个模型创建独立的工作目录（模型名中的 / 替换为 _）"""
+    workspace = os.path.join(sweep_dir, model.replace("/", "_"))
+    os.makedirs(workspace, exist_ok=True)
+    return workspace
+
+def dataset_exists(task_type, dataset):
+    return os.path.exists(os.path.join(ROOT_DIR, "dataset", task_type, dataset))
+
+class BenchmarkQueue:
+    """串行基准测试队列：同一时刻只运行一个测试程序，避免生成线程之外的测试互相干扰计时
+
+    maxsize 大于 0 时队列有界，队列满时 submit 阻塞，使上游（编译、生成）随之等待。
+    repeat 为每个任务的重复测量次数，每次都写入历史记录，供 regression.py 检验。
+    """
+
+    def __init__(self, state, sweep_dir, monitor_mode=False, run_options=None, maxsize=0, repeat=1):
+        self.state = state
+        self.repeat = repeat
+        # 透传给 extract_and_compile 的运行参数（如 limit_mode）
+        self.run_options = run_options or {}
+        self.bin_dir = os.path.join(sweep_dir, "bin")
+        self.monitor_mode = monitor_mode
+        self.results = []
+        # 工作线程实际运行测试的累计时间（秒）
+        self.busy_s = 0.0
+        self._queue = queue.Queue(maxsize)
+        self._worker = threading.Thread(target=self._run_loop, daemon=True)
+        self._worker.start()
+
+    def job_key(self, model, metadata, dataset, profile, mpi_ranks=None):
+        """任务键，包含运行参数中的 NUMA 策略和每个 MPI 进程的线程数"""
+        return job_key(model, metadata["task_type"], metadata["framework"], dataset, profile, mpi_ranks,
+                       self.run_options.get("numa_policy", "none"), self.run_options.get("mpi_threads", 1))
+
+    def submit(self, model, metadata, workspace, dataset="data.txt", profile="default", mpi_ranks=None,
+               precompiled=None):
+        """提交一个测试任务并登记为 pending；已完成的任务直接跳过。precompiled 见 extract_and_compile"""
+        key = self.job_key(model, metadata, dataset, profile, mpi_ranks)
+        if not self.state.needs_run(key):
+            print(f"[bench] 跳过已完成任务: {key}")
+            return
+        self.state.mark_job(key, PENDING)
+        self._queue.put((key, model, metadata, workspace, dataset, profile, mpi_ranks, precompiled))
+
+    def join(self):
+        """等待队列中所有任务完成并停止工作线程"""
+        self._queue.put(None)
+        self._worker.join()
+        return self.results
+
+    def _run_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            key, model, metadata, workspace, dataset, profile, mpi_ranks, precompiled = item
+            print(f"[bench] {key}")
+            start = time.time()
+            binary_cache = os.path.join(self.bin_dir, code_hash(metadata, profile))
+            self.state.mark_job(key, RUNNING, binary_cache=binary_cache)
+            try:
+                result = extract_and_compile_repeated(dict(metadata, model=model), DRIVER_DIR, self.monitor_mode,
+                                                      self.repeat, log_file=os.path.join(workspace, "log.txt"),
+                                                      dataset=dataset, profile=profile, binary_cache=binary_cache,
+                                                      trace_dir=os.path.join(workspace, "traces") if self.monitor_mode else None,
+                                                      mpi_ranks=mpi_ranks, precompiled=precompiled,
+                                                      **self.run_options)
+            except Exception as e:
+                print(f"[bench] {key} 运行出错: {e}")
+                result = {"task_type": metadata["task_type"], "framework": metadata["framework"],
+                          "dataset": dataset, "profile": profile, "status": "error", "stderr": str(e)}
+            result.pop("report", None)
+            result.pop("stdout", None)
+            result["model"] = model
+            self.busy_s += time.time() - start
+            self.results.append(result)
+            self.state.mark_job(key, DONE if result["status"] == "success" else FAILED, result=result)
+
+def rank_results(results):
+    """按任务对验证通过且有计时的结果排名：运行时间和峰值内存各一份"""
+    rankings = {}
+    for task_type in sorted({r["task_type"] for r in results}):
+        passed = [r for r in results if r["task_type"] == task_type and r["status"] == "success" and r["verified"]
+                  and r.get("time_ms") is not None]
+        entry = lambda r: {"model": r["model"], "framework": r["framework"], "dataset": r["dataset"],
+                           "profile": r["profile"], "numa_policy": r.get("numa_policy", "none"),
+                           "mpi_ranks": r.get("mpi_ranks"), "mpi_threads": r.get("mpi_threads"),
+                           "time_ms": r["time_ms"], "peak_rss_kb": r["peak_rss_kb"]}
+        rankings[task_type] = {
+            "by_time": [entry(r) for r in sorted(passed, key=lambda r: r["time_ms"])],
+            "by_memory": [entry(r) for r in sorted((r for r in passed if r.get("peak_rss_kb") is not None),
+                                                   key=lambda r: r["peak_rss_kb"])],
+        }
+    return rankings
+
+def scaling_results(results):
+    """MPI 进程数扩展性：每个 (模型, 任务, 数据集, 编译配置) 以最少进程数为基准计算加速比和并行效率"""
+    groups = {}
+    for r in results:
+        if r.get("mpi_ranks") and r["status"] == "success" and r["verified"] and r["time_ms"]:
+            key = f"{r['model']}|{r['task_type']}|{r['dataset']}|{r['profile']}"
+            groups.setdefault(key, []).append(r)
+    scaling = {}
+    for key, runs in groups.items():
+        runs.sort(key=lambda r: r["mpi_ranks"])
+        base = runs[0]
+        scaling[key] = [{"mpi_ranks": r["mpi_ranks"], "mpi_threads": r["mpi_threads"], "time_ms": r["time_ms"],
+                         "speedup": base["time_ms"] / r["time_ms"],
+                         "efficiency": base["time_ms"] * base["mpi_ranks"] / (r["time_ms"] * r["mpi_ranks"])}
+                        for r in runs]
+    return scaling
+
+def write_summary(sweep_dir, models, state, llm_calls, **extra):
+    """写出 summary.json（包含之前运行中已完成的任务），返回全部结果"""
+    results = [entry["result"] for entry in state.data["jobs"].values() if "result" in entry]
+    # 各模型的调用延迟、生成速率和截断率，用于比较服务商
+    llm_summary = summarize_calls(llm_calls)
+    print_summary(llm_summary)
+    summary_path = os.path.join(sweep_dir, "summary.json")
+    with open(summary_path, "w") as f:
+        json.dump(dict({"models": models, "results": results, "rankings": rank_results(results),
+                        "scaling": scaling_results(results), "llm": llm_summary, "jobs": state.summary()}, **extra),
+                  f, indent=2, ensure_ascii=False)
+    print(f"扫描完成，任务状态: {state.summary()}，结果已保存到 {summary_path}")
+    return results
+
+def generate_for_model(model, input_path, workspace, state):
+    """在模型自己的工作目录中生成代码，已有生成结果时直接复用"""
+    output_path = os.path.join(workspace, "output.json")
+    if state.generation_done(model):
+        print(f"[gen] {model} 复用已有生成结果")
+        with open(output_path, "r") as f:
+            return json.load(f)
+    print(f"[gen] {model} 开始生成")
+    state.mark_generation(model, RUNNING)
+    try:
+        output = generate_code(input_path, model=model, output_path=output_path)
+    except Exception as e:
+        state.mark_generation(model, FAILED, error=str(e))
+        raise
+    # 有任务请求失败时不标记为完成，--resume 时重新生成
+    failed = any("error" in t for t in output["skipped_tasks"])
+    state.mark_generation(model, FAILED if failed else DONE, output=output_path,
+                          error="部分任务请求失败" if failed else None)
+    return output
+
+def run_sweep(models, input_path=INPUT_FILE, sweep_root=SWEEP_ROOT, max_workers=4, monitor_mode=False,
+              datasets=("data.txt",), profiles=("default",), resume=None, run_options=None, mpi_ranks=(None,),
+              repeat=1):
+    """并发生成所有模型的代码，生成完成的模型立即进入串行测试队列
+
+    resume 为已有扫描目录时，只执行其中缺失或失败的任务，并复用已生成的代码和可执行文件。
+    mpi_ranks 为 MPI 任务依次使用的进程数（扩展性扫描），None 表示使用默认进程数。
+    repeat 为每个任务的重复测量次数。
+    """
+    sweep_dir = resume or os.path.join(sweep_root, time.strftime("%Y%m%d_%H%M%S"))
+    os.makedirs(sweep_dir, exist_ok=True)
+    state = SweepState(sweep_dir)
+    bench_queue = BenchmarkQueue(state, sweep_dir, monitor_mode, run_options, repeat=repeat)
+    llm_calls = []
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(generate_for_model, model, input_path, model_workspace(sweep_dir, model), state): model
+            for model in models
+        }
+        for future in as_completed(futures):
+            model = futures[future]
+            try:
+                output = future.result()
+            except Exception as e:
+                print(f"[gen] {model} 生成失败: {e}")
+                continue
+            llm_calls.extend(calls_from_output(output))
+            workspace = model_workspace(sweep_dir, model)
+            for task in output["tasks"]:
+                metadata = task["metadata"]
+                for dataset in datasets:
+                    if not dataset_exists(metadata["task_type"], dataset):
+                        continue
+                    for profile in profiles:
+                        for ranks in (mpi_ranks if metadata["framework"] == "MPI" else (None,)):
+                            bench_queue.submit(model, metadata, workspace, dataset, profile, ranks)
+
+    bench_queue.join()
+    return write_summary(sweep_dir, models, state, llm_calls)
+
+def main():
+    parser = argparse.ArgumentParser(description="多模型并发生成 + 串行基准测试")
+    parser.add_argument("models", nargs="*", help="模型名称（为空时读取 --models-file）")
+    parser.add_argument("--models-file", default=MODELS_FILE)
+    parser.add_argument("--input", default=INPUT_FILE, help="任务配置 input.json")
+    parser.add_argument("--out", default=SWEEP_ROOT, help="扫描结果根目录")
+    parser.add_argument("--workers", type=int, default=4, help="并发生成的模型数")
+    parser.add_argument("--datasets", default="data.txt", help="逗号分隔的数据集文件名")
+    parser.add_argument("--profiles", default="default", help=f"逗号分隔的编译配置 {list(BUILD_PROFILES)}")
+    parser.add_argument("--resume", help="继续已有的扫描目录，只运行缺失或失败的任务")
+    parser.add_argument("--limit-mode", choices=["rlimit", "cgroup"], default="rlimit",
+                        help="内存上限方式：RLIMIT_AS 或 cgroup v2 子组")
+    parser.add_argument("--env-policy", choices=["off", "tag", "reject"], default="tag",
+                        help="受干扰运行的处理方式：不检查 / 标记 / 拒绝（拒绝的任务在 --resume 时重跑）")
+    parser.add_argument("--isolate", action="store_true", help="驱动、采样进程、被测程序分别固定在不同核心")
+    parser.add_argument("--numa-policy", choices=list(POLICIES), default="none",
+                        help="NUMA 放置策略：绑定单节点 / 交错分配内存 / 线程分散到各节点")
+    parser.add_argument("--mpi-ranks", help="逗号分隔的 MPI 进程数，如 1,2,4,8（扩展性扫描）")
+    parser.add_argument("--mpi-threads", type=int, default=1, help="每个 MPI 进程的 OpenMP 线程数")
+    parser.add_argument("--repeat", type=int, default=1,
+                        help=f"每个任务的重复测量次数（regression.py 每组至少需要 {MIN_SAMPLES} 次）")
+    parser.add_argument("-m", dest="monitor_mode", action="store_true", help="记录硬件监控数据并导出 trace")
+    args = parser.parse_args()
+
+    models = args.models or load_models(args.models_file)
+    if not models:
+        print("Error: no models given.")
+        sys.exit(1)
+    run_sweep(models, args.input, args.out, args.workers, args.monitor_mode,
+              datasets=args.datasets.split(","), profiles=args.profiles.split(","), resume=args.resume,
+              mpi_ranks=[int(n) for n in args.mpi_ranks.split(",")] if args.mpi_ranks else (None,), repeat=args.repeat,
+              run_options={"limit_mode": args.limit_mode, "env_policy": args.env_policy, "isolate": args.isolate,
+                           "numa_policy": args.numa_policy, "mpi_threads": args.mpi_threads})
+
+if __name__ == "__main__":
+    main()
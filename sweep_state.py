@@ -0,0 +1,83 @@
+import os
+import json
+import time
+import hashlib
+import threading
+
+# 任务状态
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+STATE_FILE = "sweep_state.json"
+
+def job_key(model, task_type, framework, dataset, profile, mpi_ranks=None, numa_policy="none", mpi_threads=1):
+    """一个测试任务由 (模型, 任务, 框架, 数据集, 编译配置) 唯一确定，再加上非默认的 NUMA 策略和 MPI 进程数 × 线程数
+
+    默认条件下的键与旧版本一致，已有扫描目录仍可 --resume。
+    """
+    parts = [model, task_type, framework, dataset, profile]
+    if numa_policy and numa_policy != "none":
+        parts.append(f"numa-{numa_policy}")
+    if framework == "MPI" and (mpi_ranks or mpi_threads > 1):
+        parts.append(f"np{mpi_ranks or 'default'}" + (f"x{mpi_threads}" if mpi_threads > 1 else ""))
+    return "|".join(parts)
+
+def code_hash(metadata, profile):
+    """生成代码 + 框架 + 编译配置的哈希，用作可执行文件缓存目录名"""
+    content = f"{metadata['task_type']}\n{metadata['framework']}\n{profile}\n{metadata['code']}"
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()[:16]
+
+class SweepState:
+    """持久化的扫描状态，每次状态变化都原子写入 sweep_state.json，中断后可从断点继续"""
+
+    def __init__(self, sweep_dir):
+        self.path = os.path.join(sweep_dir, STATE_FILE)
+        self._lock = threading.Lock()
+        if os.path.exists(self.path):
+            with open(self.path, "r") as f:
+                self.data = json.load(f)
+        else:
+            self.data = {"generations": {}, "jobs": {}}
+
+    def _save(self):
+        # 先写临时文件再替换，避免 Ctrl-C 时留下损坏的状态文件
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.data, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def generation_done(self, model):
+        entry = self.data["generations"].get(model)
+        return bool(entry) and entry["status"] == DONE and os.path.exists(entry["output"])
+
+    def mark_generation(self, model, status, output=None, error=None):
+        with self._lock:
+            self.data["generations"][model] = {
+                "status": status, "output": output, "error": error,
+                "updated": time.strftime("%Y-%m-%d %H:%M:%S"),
+            }
+            self._save()
+
+    def job_status(self, key):
+        entry = self.data["jobs"].get(key)
+        return entry["status"] if entry else PENDING
+
+    def needs_run(self, key):
+        """只有已完成的任务会被跳过；失败或中断（running）的任务重新执行"""
+        return self.job_status(key) != DONE
+
+    def mark_job(self, key, status, **artifacts):
+        with self._lock:
+            entry = self.data["jobs"].setdefault(key, {})
+            entry.update(artifacts)
+            entry["status"] = status
+            entry["updated"] = time.strftime("%Y-%m-%d %H:%M:%S")
+            self._save()
+
+    def summary(self):
+        counts = {PENDING: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        for entry in self.data["jobs"].values():
+            counts[entry["status"]] += 1
+        return counts